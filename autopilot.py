@@ -0,0 +1,567 @@
+import time
+import random
+from collections import deque
+from typing import Deque, Dict, Iterable, List, Optional, Set
+
+from config import TickResult
+from cycles import load_cycle
+from engine import SnakeEngine, MOVES, OPPOSITE, EMPTY, FOOD
+from lookahead import rollout_pool
+from transposition import TranspositionTable, shared_table
+
+
+# distance of cells from which no food can be reached
+INF = 1 << 30
+
+
+def safe_moves(state: SnakeEngine) -> List[int]:
+    """ Returns the directions which do not end the game in the next tick """
+    moves = []
+    for direction, (d_y, d_x) in enumerate(MOVES):
+        if direction == OPPOSITE[state.direction]:
+            continue
+
+        cell = (state.head_pos[0] + d_y, state.head_pos[1] + d_x)
+        if state.cell(cell) in (EMPTY, FOOD):
+            moves.append(direction)
+
+    return moves
+
+
+class Policy:
+
+    # policies which use up the time of a tick (see set_interval)
+    deadline_bound = False
+
+    def __init__(self, rng=None, history: int = 10000) -> None:
+        """ Base class of the autopilots
+
+        A policy gets the engine of the running game and returns the
+        direction of the next tick (or None to keep the direction).
+        Calling the policy instead of `decide` records the latency.
+
+        :param rng: random generator to use (defaults to the random module)
+        :param history: number of latencies which are kept
+        """
+        self.rng = rng if rng is not None else random
+        self.latencies = deque(maxlen=history)
+
+
+    def decide(self, state: SnakeEngine) -> Optional[int]:
+        """ Returns the next direction: right: 0, left: 1, up: 2, down: 3 """
+        raise NotImplementedError
+
+
+    def set_interval(self, interval: float) -> None:
+        """ Tells the policy the seconds between two ticks of the game """
+        pass
+
+
+    def __call__(self, state: SnakeEngine) -> Optional[int]:
+        start = time.perf_counter()
+        direction = self.decide(state)
+        self.latencies.append(time.perf_counter() - start)
+
+        return direction
+
+
+    def latency_percentiles(self, fractions: Iterable[float] = (0.5, 0.9, 0.99, 1.0)) -> Dict[float, float]:
+        """ Returns the decision latency in seconds per percentile """
+        latencies = sorted(self.latencies)
+        if not latencies:
+            return {fraction: 0.0 for fraction in fractions}
+
+        return {
+            fraction: latencies[min(int(fraction * len(latencies)), len(latencies) - 1)]
+            for fraction in fractions
+        }
+
+
+class RandomPolicy(Policy):
+    def decide(self, state: SnakeEngine) -> Optional[int]:
+        """ Picks a random direction which does not end the game directly """
+        moves = safe_moves(state)
+        return self.rng.choice(moves) if moves else None
+
+
+class GreedyPolicy(Policy):
+    def decide(self, state: SnakeEngine) -> Optional[int]:
+        """ Moves towards the closest food without looking further ahead """
+        moves = safe_moves(state)
+        if not moves or not state.food:
+            return moves[0] if moves else None
+
+        head_y, head_x = state.head_pos
+        target = min(state.food, key=lambda cell: abs(cell[0] - head_y) + abs(cell[1] - head_x))
+
+        def distance(direction: int) -> int:
+            d_y, d_x = MOVES[direction]
+            return abs(target[0] - head_y - d_y) + abs(target[1] - head_x - d_x)
+
+        return min(moves, key=distance)
+
+
+class BFSPolicy(Policy):
+    def __init__(self, rng=None, history: int = 10000, budget: int = 2048) -> None:
+        """ Follows the shortest path to the closest food
+
+        Keeps a field with the distance of every cell to the closest food
+        (walls and the body block the way). Between two ticks only the
+        cells whose distance changed are recomputed: the cells behind the
+        new head (or the eaten food) get larger distances, the freed tail
+        and new food can only make distances smaller.
+
+        When the field has to be built again (a new game or the only food
+        was eaten) the BFS runs over several decisions with at most
+        `budget` cells each, so no decision pays for the whole board.
+        Meanwhile the snake follows the part of the field which is done
+        or heads for the closest food, and the ticks of that time are
+        applied together once the field is complete.
+
+        :param budget: cells the BFS visits per decision while it builds
+        """
+        super().__init__(rng, history)
+        self.budget = budget
+        self.greedy = GreedyPolicy(rng, history=1)
+
+        self.state: Optional[SnakeEngine] = None
+        self.round = 0
+        self.tick = -1
+
+        # cells the running BFS still has to visit (None once the field
+        # is complete) and the tick results which arrived meanwhile
+        self.queue: Optional[Deque[int]] = None
+        self.pending: List[TickResult] = []
+
+
+    def decide(self, state: SnakeEngine) -> Optional[int]:
+        self.sync(state)
+
+        moves = safe_moves(state)
+        if not moves:
+            return None
+
+        head = state.index(state.head_pos)
+        best = min(moves, key=lambda direction: self.dist[head + self.offsets[direction]])
+
+        if self.dist[head + self.offsets[best]] < INF:
+            return best
+
+        # the BFS has not reached the head yet
+        if self.queue is not None:
+            return self.greedy.decide(state)
+
+        # no food can be reached → keep as much space as possible
+        return max(moves, key=lambda direction: self._open_neighbours(head + self.offsets[direction]))
+
+
+    def sync(self, state: SnakeEngine) -> None:
+        """ Brings the distance field up to date with the engine (or
+        advances the BFS which builds it)
+        """
+        same_round = state is self.state and state.round == self.round
+        if same_round and state.ticks == self.tick:
+            return
+
+        if same_round and state.ticks == self.tick + 1:
+            if self.queue is not None:
+                self.pending.append(state.last_result)
+            else:
+                self._update(state.last_result)
+        else:
+            self.rebuild(state)
+
+        self.state = state
+        self.round = state.round
+        self.tick = state.ticks
+
+        if self.queue is not None:
+            self._advance()
+
+
+    def _is_open(self, index: int) -> bool:
+        code = self.grid[index]
+        return code == EMPTY or code == FOOD
+
+
+    def _open_neighbours(self, index: int) -> int:
+        return sum(1 for offset in self.offsets if self._is_open(index + offset))
+
+
+    def rebuild(self, state: SnakeEngine) -> None:
+        """ Starts to build the whole distance field with a BFS from all
+        food (see _advance)
+        """
+        self.grid = state.grid
+        self.offsets = (1, -1, -state.max_x, state.max_x)
+        self.dist = [INF] * len(self.grid)
+
+        # above this number of affected cells a rebuild is cheaper
+        self.rebuild_limit = max(len(self.grid) // 64, 64)
+
+        self.queue = deque()
+        self.pending = []
+        for cell in state.food:
+            index = state.index(cell)
+            self.dist[index] = 0
+            self.queue.append(index)
+
+
+    def _advance(self) -> None:
+        """ Visits up to `budget` cells of the running BFS, once it is done
+        applies the ticks which happened while it ran
+
+        The BFS reads the grid as it is when a cell is visited, the ticks
+        are applied on top (see _catch_up).
+        """
+        dist = self.dist
+        grid = self.grid
+        queue = self.queue
+
+        for _ in range(self.budget):
+            if not queue:
+                break
+
+            index = queue.popleft()
+            current = dist[index] + 1
+
+            for offset in self.offsets:
+                neighbour = index + offset
+                if current < dist[neighbour] and (grid[neighbour] == EMPTY or grid[neighbour] == FOOD):
+                    dist[neighbour] = current
+                    queue.append(neighbour)
+
+        if queue:
+            return
+
+        self.queue = None
+        pending, self.pending = self.pending, []
+        if pending:
+            self._catch_up(pending)
+
+
+    def _catch_up(self, pending: List[TickResult]) -> None:
+        """ Applies the ticks which happened while the BFS ran at once
+
+        The cells the head took are removed from the field, then the
+        distances spread from the freed cells and the new food in one pass
+        instead of once per tick. A cell can be taken and freed again
+        meanwhile, so only the grid as it is now counts.
+        """
+        index = self.state.index
+        dist = self.dist
+
+        heads = {index(result["head"]) for result in pending}
+        opened = {index(result["tail"]) for result in pending if result["tail"] is not None}
+        food = {index(cell) for result in pending for cell in result["new_food"]}
+
+        # a taken cell may be open again but still hold the distance of
+        # eaten food, so all of them are removed first
+        for cell in heads:
+            if not self._block(cell):
+                self.rebuild(self.state)
+                return
+
+        seeds = []
+        for cell in heads | opened | food:
+            if not self._is_open(cell):
+                continue
+
+            value = 0 if self.grid[cell] == FOOD else min(
+                dist[cell + offset] for offset in self.offsets
+            ) + 1
+
+            if value < dist[cell]:
+                dist[cell] = value
+                seeds.append((value, cell))
+
+        self._spread(seeds)
+
+
+    def _update(self, result) -> None:
+        """ Applies the changes of one tick to the distance field """
+        index = self.state.index
+
+        if not self._block(index(result["head"])):
+            self.rebuild(self.state)
+            return
+
+        # cells which became open or new sources
+        seeds = []
+        if result["tail"] is not None:
+            tail = index(result["tail"])
+            dist = 0 if self.grid[tail] == FOOD else min(
+                self.dist[tail + offset] for offset in self.offsets
+            ) + 1
+
+            if dist < self.dist[tail]:
+                self.dist[tail] = dist
+                seeds.append((dist, tail))
+
+        for cell in result["new_food"]:
+            food = index(cell)
+            self.dist[food] = 0
+            seeds.append((0, food))
+
+        self._spread(seeds)
+
+
+    def _block(self, blocked: int) -> bool:
+        """ Removes a cell (the new head) from the field and recomputes
+        the cells whose shortest path led through it
+
+        :returns False if so many cells are affected that rebuilding 
+            the whole field is cheaper
+        """
+        dist = self.dist
+        offsets = self.offsets
+
+        old = dist[blocked]
+        dist[blocked] = INF
+        if old >= INF:
+            return True
+
+        # collect the cells which lost every neighbour one step closer,
+        # the queue holds the cells layer by layer of their distance
+        queue = deque(blocked + offset for offset in offsets if dist[blocked + offset] == old + 1)
+        affected: Set[int] = set()
+
+        while queue:
+            cell = queue.popleft()
+            if cell in affected or self.grid[cell] == FOOD:
+                continue
+
+            closer = dist[cell] - 1
+            for offset in offsets:
+                if dist[cell + offset] == closer and cell + offset not in affected:
+                    break
+            else:
+                affected.add(cell)
+                if len(affected) > self.rebuild_limit:
+                    return False
+
+                for offset in offsets:
+                    if dist[cell + offset] == closer + 2:
+                        queue.append(cell + offset)
+
+        for cell in affected:
+            dist[cell] = INF
+
+        # fill the affected cells again from their border
+        seeds = []
+        for cell in affected:
+            best = INF
+            for offset in offsets:
+                if cell + offset not in affected and dist[cell + offset] < best:
+                    best = dist[cell + offset]
+
+            if best < INF:
+                dist[cell] = best + 1
+                seeds.append((best + 1, cell))
+
+        self._spread(seeds)
+        return True
+
+
+    def _spread(self, seeds: list) -> None:
+        """ Spreads smaller distances from the given (distance, cell) seeds
+
+        Merges the sorted seeds with a FIFO queue of the reached cells,
+        which keeps the order of a BFS without a heap.
+        """
+        dist = self.dist
+        grid = self.grid
+
+        seeds = deque(sorted(seeds))
+        queue = deque()
+
+        while seeds or queue:
+            if queue and (not seeds or queue[0][0] <= seeds[0][0]):
+                current, cell = queue.popleft()
+            else:
+                current, cell = seeds.popleft()
+
+            if current != dist[cell]:
+                continue
+
+            for offset in self.offsets:
+                neighbour = cell + offset
+                if current + 1 < dist[neighbour] and (grid[neighbour] == EMPTY or grid[neighbour] == FOOD):
+                    dist[neighbour] = current + 1
+                    queue.append((current + 1, neighbour))
+
+
+class HamiltonPolicy(Policy):
+    def __init__(self, rng=None, history: int = 10000) -> None:
+        """ Follows a Hamiltonian cycle over the board and therefore 
+        survives until the board is full
+
+        While the snake is short it takes shortcuts towards the food,
+        but only forward along the cycle, never past the next food and 
+        only when the gap in front of the tail stays large enough. Boards
+        without a cycle (odd number of cells) fall back to the BFS policy.
+        """
+        super().__init__(rng, history)
+        self.fallback = BFSPolicy(rng, history=1)
+
+        self.state: Optional[SnakeEngine] = None
+        self.round = 0
+        self.sign = 1
+
+
+    def decide(self, state: SnakeEngine) -> Optional[int]:
+        cycle = load_cycle(state.max_y, state.max_x)
+        if cycle is None:
+            return self.fallback.decide(state)
+
+        size = len(cycle)
+        position = cycle.position
+        offsets = (1, -1, -state.max_x, state.max_x)
+        head = state.index(state.head_pos)
+        head_step = position[head]
+
+        # a new round picks the way around the cycle which does not
+        # require to reverse the snake
+        if state is not self.state or state.round != self.round:
+            self.state = state
+            self.round = state.round
+
+            next_cell = cycle.order[(head_step + 1) % size]
+            reverse = offsets.index(next_cell - head) == OPPOSITE[state.direction]
+            self.sign = -1 if reverse else 1
+
+        sign = self.sign
+        next_cell = cycle.order[(head_step + sign) % size]
+
+        # room the snake may need for growing before the skipped cells
+        # are behind its tail again (every food may be eaten on the way)
+        length = len(state) + state.growth_size * len(state.food)
+
+        # the snake fills a quarter of the board → only follow the cycle
+        if length * 4 < size:
+            tail_gap = sign * (position[state.index(state.body[-1])] - head_step) % size
+            food_gap = min(
+                (sign * (position[state.index(cell)] - head_step) % size for cell in state.food),
+                default=size
+            )
+
+            best_jump = 1
+            for offset in offsets:
+                neighbour = head + offset
+                if state.grid[neighbour] not in (EMPTY, FOOD):
+                    continue
+
+                jump = sign * (position[neighbour] - head_step) % size
+                if best_jump < jump <= food_gap and tail_gap - jump > 2 * length:
+                    best_jump = jump
+                    next_cell = neighbour
+
+        return offsets.index(next_cell - head)
+
+
+class MonteCarloPolicy(Policy):
+
+    deadline_bound = True
+
+    def __init__(
+        self, 
+        rng=None, 
+        history: int = 10000, 
+        workers: Optional[int] = None, 
+        budget: float = 0.5, 
+        horizon: int = 40, 
+        greedy: float = 0.9,
+        min_rollouts: int = 200,
+        table: Optional[TranspositionTable] = None) -> None:
+        """ Evaluates every safe move with random continuations of the game
+
+        The rollouts run on a pool of worker processes which stays warm
+        between ticks. The search is anytime: when the deadline of the tick
+        expires the move with the best average rollout is returned.
+
+        :param workers: number of worker processes (default: cpu count,
+            0 runs the rollouts within this process)
+        :param budget: fraction of the tick interval used for the search
+        :param horizon: maximal number of simulated ticks per rollout
+        :param greedy: fraction of the rollout moves which head for the food
+        :param min_rollouts: results of the transposition table with at least
+            this many rollouts are reused without searching again
+        :param table: transposition table (default: the shared table)
+        """
+        super().__init__(rng, history)
+        self.pool = rollout_pool(workers)
+        self.table = table if table is not None else shared_table()
+        self.fallback = GreedyPolicy(rng, history=1)
+
+        self.budget = budget
+        self.horizon = horizon
+        self.greedy = greedy
+        self.min_rollouts = min_rollouts
+        self.interval = 0.05
+
+        # statistics
+        self.rollouts = 0
+        self.search_time = 0.0
+
+
+    def set_interval(self, interval: float) -> None:
+        self.interval = interval
+
+
+    @property
+    def time_budget(self) -> float:
+        """ Returns the seconds a decision may take """
+        return self.interval * self.budget
+
+
+    @property
+    def rollout_rate(self) -> float:
+        """ Returns the rollouts per second over all decisions """
+        return self.rollouts / self.search_time if self.search_time else 0.0
+
+
+    def decide(self, state: SnakeEngine) -> Optional[int]:
+        start = time.perf_counter()
+
+        # every move which handle_move accepts and does not end the game
+        moves = safe_moves(state)
+        if len(moves) <= 1:
+            return moves[0] if moves else None
+
+        # entries of earlier decisions give way to the ones of this one
+        self.table.new_search()
+
+        entry = self.table.probe(state.hash, self.min_rollouts)
+        if entry is not None and entry.move in moves:
+            return entry.move
+
+        stats = self.pool.evaluate(
+            state.snapshot(), 
+            moves, 
+            start + self.time_budget, 
+            self.horizon, 
+            self.rng.getrandbits(32), 
+            self.greedy
+        )
+
+        self.rollouts += sum(count for count, _ in stats.values())
+        self.search_time += time.perf_counter() - start
+
+        visited = [move for move in moves if stats[move][0]]
+        if not visited:
+            return self.fallback.decide(state)
+
+        best = max(visited, key=lambda move: stats[move][1] / stats[move][0])
+        rollouts = sum(stats[move][0] for move in visited)
+        self.table.store(state.hash, rollouts, stats[best][1] / stats[best][0], best)
+
+        return best
+
+
+policies = {
+    "random": RandomPolicy,
+    "greedy": GreedyPolicy,
+    "bfs": BFSPolicy,
+    "hamilton": HamiltonPolicy,
+    "montecarlo": MonteCarloPolicy,
+}
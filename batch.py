@@ -0,0 +1,214 @@
+from typing import Optional
+
+import numpy as np
+
+from config import GameSettings
+from engine import EMPTY, WALL, BODY, FOOD, OPPOSITE
+
+
+class BatchEngine:
+    def __init__(self, n_games: int, max_y: int, max_x: int, settings: GameSettings, seed: Optional[int] = None) -> None:
+        """ Runs many independent snake games in lockstep with numpy
+
+        Follows the rules of the SnakeEngine (walls on the border, the
+        tail stays in place while the snake grows, food never spawns on
+        the cell the tail is just leaving). All boards are one (N, H * W)
+        int8 array, the bodies are ring buffers with one row per game and
+        games which end are reset automatically within `step`.
+
+        :param n_games: number of parallel games
+        :param max_y: number of rows of a board (including the walls)
+        :param max_x: number of columns of a board (including the walls)
+        :param settings: game settings (see config.GameSettings)
+        :param seed: seed of the random generator
+        """
+        self.n_games = n_games
+        self.max_y = max_y
+        self.max_x = max_x
+        self.settings = settings
+        self.rng = np.random.default_rng(seed)
+
+        self.interior = (max_y - 2) * (max_x - 2)
+        self.games = np.arange(n_games)
+
+        # offsets within the flat board → right: 0, left: 1, up: 2, down: 3
+        self.moves = np.array([1, -1, -max_x, max_x], dtype=np.int32)
+        self.opposite = np.array(OPPOSITE, dtype=np.int8)
+
+        template = np.full((max_y, max_x), EMPTY, dtype=np.int8)
+        template[[0, -1], :] = WALL
+        template[:, [0, -1]] = WALL
+        self.template = template.reshape(-1)
+
+        self.board = np.empty((n_games, max_y * max_x), dtype=np.int8)
+
+        # ring buffers of the bodies, head_ptr points to the head cell
+        self.body = np.zeros((n_games, self.interior), dtype=np.int32)
+        self.head_ptr = np.zeros(n_games, dtype=np.int32)
+        self.tail_ptr = np.zeros(n_games, dtype=np.int32)
+        self.length = np.zeros(n_games, dtype=np.int32)
+        self.pending_growth = np.zeros(n_games, dtype=np.int32)
+
+        self.head = np.zeros(n_games, dtype=np.int32)
+        self.direction = np.zeros(n_games, dtype=np.int8)
+        self.scores = np.zeros(n_games, dtype=np.int32)
+        self.ticks = np.zeros(n_games, dtype=np.int64)
+        self.food = np.zeros(n_games, dtype=np.int32)
+        self.missing_food = np.zeros(n_games, dtype=np.int32)
+
+        self.reset(self.games)
+
+
+    @property
+    def boards(self) -> np.ndarray:
+        """ Returns the boards as a (N, H, W) view """
+        return self.board.reshape(self.n_games, self.max_y, self.max_x)
+
+
+    def reset(self, games: np.ndarray) -> None:
+        """ Starts new rounds for the given games
+
+        :param games: indices of the games to reset
+        """
+        count = len(games)
+        if not count:
+            return
+
+        self.board[games] = self.template
+
+        y = self.rng.integers(1, self.max_y - 1, count)
+        x = self.rng.integers(1, self.max_x - 1, count)
+        head = (y * self.max_x + x).astype(np.int32)
+
+        # orient the snake away from the closest borders
+        vertical_dir = np.where(self.max_y - y >= self.max_y // 2, 3, 2)
+        horizontal_dir = np.where(self.max_x - x >= self.max_x // 2, 0, 1)
+        vertical = self.rng.random(count) < 0.5
+        self.direction[games] = np.where(vertical, vertical_dir, horizontal_dir)
+
+        self.board[games, head] = BODY
+        self.head[games] = head
+        self.body[games, 0] = head
+        self.head_ptr[games] = 0
+        self.tail_ptr[games] = 0
+        self.length[games] = 1
+        self.pending_growth[games] = self.settings["init_length"] - 1
+
+        self.scores[games] = 0
+        self.ticks[games] = 0
+        self.food[games] = 0
+        self.missing_food[games] = self.settings["food_count"]
+
+        for _ in range(self.settings["food_count"]):
+            self._spawn_food(games)
+
+
+    def free_cells(self, games: np.ndarray) -> np.ndarray:
+        """ Returns the number of empty cells of the given games """
+        return self.interior - self.length[games] - self.food[games]
+
+
+    def _spawn_food(self, games: np.ndarray, tries: int = 8) -> None:
+        """ Places one apple on a random empty cell for each of the games
+        which still miss food and have an empty cell
+
+        Samples random cells for all games at once and only retries the
+        games which hit an occupied cell. Games which are still left after
+        a few tries (crowded boards) choose among their empty cells.
+
+        :param games: indices of the games
+        :param tries: number of sampling rounds
+        """
+        games = games[(self.missing_food[games] > 0) & (self.free_cells(games) > 0)]
+
+        for _ in range(tries):
+            if not len(games):
+                return
+
+            y = self.rng.integers(1, self.max_y - 1, len(games))
+            x = self.rng.integers(1, self.max_x - 1, len(games))
+            cells = y * self.max_x + x
+
+            empty = self.board[games, cells] == EMPTY
+            self._place_food(games[empty], cells[empty])
+            games = games[~empty]
+
+        if len(games):
+            weights = self.rng.random((len(games), self.board.shape[1]))
+            weights *= self.board[games] == EMPTY
+            self._place_food(games, weights.argmax(axis=1))
+
+
+    def _place_food(self, games: np.ndarray, cells: np.ndarray) -> None:
+        """ Marks the cells as food """
+        self.board[games, cells] = FOOD
+        self.food[games] += 1
+        self.missing_food[games] -= 1
+
+
+    def step(self, actions: Optional[np.ndarray] = None) -> dict:
+        """ Advances every game by one tick
+
+        :param actions: new direction per game (-1 keeps the direction),
+            reversing the snake is ignored like in SnakeEngine.turn
+        :returns dict with the boolean arrays "ate", "won" and "done" and
+            the "score" of every game before games which ended were reset
+        """
+        if actions is not None:
+            actions = np.asarray(actions)
+            turn = (actions >= 0) & (actions != self.opposite[self.direction])
+            self.direction = np.where(turn, actions, self.direction).astype(np.int8)
+
+        new_head = self.head + self.moves[self.direction]
+        hit = self.board[self.games, new_head]
+
+        alive = (hit != WALL) & (hit != BODY)
+        live = self.games[alive]
+        head = new_head[alive]
+
+        # move the heads
+        self.board[live, head] = BODY
+        self.head[live] = head
+        self.head_ptr[live] = (self.head_ptr[live] + 1) % self.interior
+        self.body[live, self.head_ptr[live]] = head
+        self.length[live] += 1
+        self.ticks[live] += 1
+
+        # the tail stays in place while the snake is still growing
+        growing = self.pending_growth[live] > 0
+        self.pending_growth[live[growing]] -= 1
+
+        ate = alive & (hit == FOOD)
+        eating = self.games[ate]
+        self.scores[eating] += 1
+        self.pending_growth[eating] += self.settings["growth_size"]
+        self.food[eating] -= 1
+        self.missing_food[eating] += 1
+
+        # the freed tail is still marked so no food spawns on it
+        self._spawn_food(eating)
+
+        moving = live[~growing]
+        tails = self.body[moving, self.tail_ptr[moving]]
+        self.board[moving, tails] = EMPTY
+        self.tail_ptr[moving] = (self.tail_ptr[moving] + 1) % self.interior
+        self.length[moving] -= 1
+
+        # food which had no space before
+        hungry = self.games[self.missing_food > 0]
+        while len(hungry):
+            self._spawn_food(hungry)
+            hungry = hungry[(self.missing_food[hungry] > 0) & (self.free_cells(hungry) > 0)]
+
+        won = alive & (self.length == self.interior)
+        done = ~alive | won
+
+        result = {
+            "ate": ate,
+            "won": won,
+            "done": done,
+            "score": self.scores.copy(),
+        }
+
+        self.reset(self.games[done])
+        return result
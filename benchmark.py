@@ -0,0 +1,757 @@
+import sys
+import json
+import random
+import pathlib
+import time
+from collections import deque
+from typing import Deque, List, Tuple
+
+from autopilot import BFSPolicy
+from config import default_settings
+from engine import SnakeEngine, BODY
+from scheduler import TickScheduler
+
+
+def _serpentine(width: int, count: int) -> List[Tuple[int, int]]:
+    """ Returns `count` cells which snake through the rows of a board
+    with the given interior width (starting in the top left corner)
+    """
+    cells = []
+    for i in range(count):
+        row, col = divmod(i, width)
+        col = col if row % 2 == 0 else width - 1 - col
+        cells.append((row + 1, col + 1))
+
+    return cells
+
+
+def _direction(a: Tuple[int, int], b: Tuple[int, int]) -> int:
+    """ Returns the direction which moves from cell a to cell b """
+    if b[0] == a[0]:
+        return 0 if b[1] > a[1] else 1
+
+    return 3 if b[0] > a[0] else 2
+
+
+def long_snake(length: int, ticks: int, width: int = 500, food_count: int = 0):
+    """ Creates an engine with a snake of the given length which is laid out
+    in rows and returns it with the directions for the following ticks
+
+    :param length: length of the snake
+    :param ticks: number of free cells the snake can follow afterwards
+    :param width: interior width of the board
+    :param food_count: number of food items on the board
+    """
+    rows = (length + ticks) // width + 2
+    settings = dict(default_settings, food_count=0)
+    engine = SnakeEngine(rows + 2, width + 2, settings)
+
+    engine._release(engine.index(engine.head_pos))
+    path = _serpentine(width, length + ticks + 1)
+
+    engine.body = deque(reversed(path[:length]))
+    engine.pending_growth = 0
+    for cell in engine.body:
+        engine._occupy(engine.index(cell), BODY)
+
+    engine.head_pos = path[length - 1]
+    engine.direction = _direction(path[length - 2], path[length - 1]) if length > 1 else 0
+    directions = [
+        _direction(path[i], path[i + 1]) for i in range(length - 1, length + ticks - 1)
+    ]
+
+    engine.rehash()
+
+    # place the food once the body is on the board
+    settings["food_count"] = food_count
+    engine.missing_food = food_count
+    engine._fill_food()
+
+    return engine, directions
+
+
+def bench_snake_length(ticks: int = 20000) -> None:
+    """ Per tick cost of the engine for different snake lengths """
+    print(f"{'length':>10} {'us/tick':>10}")
+
+    for length in (5, 100, 1_000, 10_000, 100_000):
+        engine, directions = long_snake(length, ticks)
+
+        start = time.perf_counter()
+        for direction in directions:
+            engine.step(direction)
+        elapsed = time.perf_counter() - start
+
+        print(f"{length:>10} {elapsed / ticks * 1e6:>10.3f}")
+
+
+def bench_food_count(ticks: int = 20000) -> None:
+    """ Stress test of the per tick cost with thousands of food items """
+    print(f"{'food':>10} {'eaten':>10} {'us/tick':>10}")
+
+    for food_count in (1, 10, 100, 1_000, 10_000):
+        engine, directions = long_snake(100, ticks, width=1000, food_count=food_count)
+
+        start = time.perf_counter()
+        for direction in directions:
+            engine.step(direction)
+        elapsed = time.perf_counter() - start
+
+        print(f"{food_count:>10} {engine.score:>10} {elapsed / ticks * 1e6:>10.3f}")
+
+
+def bench_scheduler(seconds: float = 2.0) -> None:
+    """ Actual against target tick rate of the scheduler (with a fake 
+    frame workload of 0.1ms per loop), as reported by the scheduler
+    """
+    print(f"{'target':>10} {'actual':>10} {'skipped':>10}")
+
+    for rate in (10, 100, 1_000, 5_000):
+        scheduler = TickScheduler(rate)
+        end = time.perf_counter() + seconds
+
+        while time.perf_counter() < end:
+            scheduler.due()
+
+            work = time.perf_counter() + 0.0001
+            while time.perf_counter() < work:
+                pass
+
+            scheduler.wait()
+
+        stats = scheduler.stats()
+        print(f"{stats['target_rate']:>10.1f} {stats['actual_rate']:>10.1f} {stats['skipped_frames']:>10}")
+
+
+def bench_batch(ticks: int = 200) -> None:
+    """ Game ticks per second of the numpy batch engine """
+    from batch import BatchEngine
+    import numpy as np
+
+    print(f"{'games':>10} {'ticks/s':>14} {'ended':>10}")
+
+    for n_games in (100, 1_000, 10_000):
+        engine = BatchEngine(n_games, 24, 80, dict(default_settings), seed=0)
+        actions = engine.rng.integers(-1, 4, (ticks, n_games))
+
+        # mostly keep the direction such that games live a while
+        actions[engine.rng.random((ticks, n_games)) < 0.8] = -1
+
+        ended = 0
+        start = time.perf_counter()
+        for tick_actions in actions:
+            ended += int(np.count_nonzero(engine.step(tick_actions)["done"]))
+        elapsed = time.perf_counter() - start
+
+        print(f"{n_games:>10} {n_games * ticks / elapsed:>14,.0f} {ended:>10}")
+
+
+def bench_autopilot(ticks: int = 5000, limit: float = 0.005) -> None:
+    """ Decision latency of the BFS autopilot on a 300x100 terminal, 
+    fails if the p99 is above the limit (in seconds)
+    """
+    print(f"{'food':>10} {'p50 ms':>10} {'p90 ms':>10} {'p99 ms':>10} {'max ms':>10}")
+
+    slow = []
+    for food_count in (1, 10, 100, 1_000):
+        engine = SnakeEngine(100, 300, dict(default_settings, food_count=food_count))
+        policy = BFSPolicy()
+
+        for _ in range(ticks):
+            result = engine.step(policy(engine))
+            if not result["alive"] or result["won"]:
+                engine.reset()
+
+        latency = policy.latency_percentiles((0.5, 0.9, 0.99, 1.0))
+        print(f"{food_count:>10}", *(f"{value * 1000:>10.3f}" for value in latency.values()))
+
+        if latency[0.99] > limit:
+            slow.append(food_count)
+
+    if slow:
+        raise RuntimeError(f"p99 decision latency above {limit * 1000:.0f}ms with {slow} food")
+
+
+def bench_transposition(probes: int = 200_000) -> None:
+    """ Hit rate and memory of the transposition tables with a skewed
+    workload (few states are probed often, like in a search tree)
+    """
+    import random
+    from transposition import eviction_policies
+
+    rng = random.Random(0)
+    states = [rng.getrandbits(64) for _ in range(100_000)]
+    workload = [
+        (states[min(int(rng.paretovariate(0.5)) - 1, len(states) - 1)], rng.randrange(8))
+        for _ in range(probes)
+    ]
+
+    # probes of one decision (a new search begins after them)
+    search_size = 1_000
+
+    print(f"{'eviction':>10} {'capacity':>10} {'hit rate':>10} {'MB':>10} {'us/probe':>10}")
+
+    for capacity in (1_000, 10_000, 100_000):
+        for name, table_class in eviction_policies.items():
+            table = table_class(capacity)
+
+            start = time.perf_counter()
+            for index, (key, depth) in enumerate(workload):
+                if index % search_size == 0:
+                    table.new_search()
+
+                if table.probe(key, depth) is None:
+                    table.store(key, depth, 0.0)
+            elapsed = time.perf_counter() - start
+
+            stats = table.stats()
+            print(
+                f"{name:>10} {capacity:>10} {stats['hit_rate']:>10.3f} "
+                f"{stats['memory_bytes'] / 1e6:>10.2f} {elapsed / probes * 1e6:>10.3f}"
+            )
+
+
+def bench_hash(games: int = 100, max_ticks: int = 2000) -> None:
+    """ Checks the incremental zobrist hash of the engine against a full
+    rehash after every tick of greedy games and compares their cost
+    """
+    from autopilot import GreedyPolicy
+
+    ticks = 0
+    incremental = 0.0
+    full = 0.0
+
+    for game in range(games):
+        engine = SnakeEngine(24, 80, dict(default_settings), random.Random(game))
+        policy = GreedyPolicy(random.Random(game))
+
+        while engine.ticks < max_ticks:
+            direction = policy(engine)
+
+            start = time.perf_counter()
+            result = engine.step(direction)
+            incremental += time.perf_counter() - start
+
+            if not result["alive"] or result["won"]:
+                break
+
+            expected = engine.hash
+            start = time.perf_counter()
+            value = engine.rehash()
+            full += time.perf_counter() - start
+
+            if value != expected:
+                raise RuntimeError(f"hash of game {game} differs from a rehash after tick {engine.ticks}")
+
+            ticks += 1
+
+    # the same cells, head and tail in a different order
+    rows = [(1, 1), (1, 2), (1, 3), (2, 3), (2, 2), (2, 1), (3, 1), (3, 2), (3, 3)]
+    columns = [(1, 1), (2, 1), (3, 1), (3, 2), (2, 2), (1, 2), (1, 3), (2, 3), (3, 3)]
+    hashes = set()
+    for body in (rows, columns):
+        engine = SnakeEngine(24, 80, dict(default_settings, food_count=0), random.Random(0))
+        snapshot = dict(engine.snapshot(), body=body, food=[], direction=2, pending_growth=0)
+        hashes.add(SnakeEngine.restore(snapshot).hash)
+
+    if len(hashes) != 2:
+        raise RuntimeError("bodies in a different order have the same hash")
+
+    print(f"{'ticks':>10} {'us/step':>10} {'us/rehash':>10}")
+    print(f"{ticks:>10} {incremental / ticks * 1e6:>10.3f} {full / ticks * 1e6:>10.3f}")
+
+
+def bench_lookahead(games: int = 5, max_ticks: int = 300) -> None:
+    """ Rollouts per second and decision quality of the Monte Carlo 
+    autopilot for different time budgets per tick (a budget of zero
+    falls back to the greedy policy)
+    """
+    import random
+    from autopilot import MonteCarloPolicy
+    from transposition import DepthTable
+
+    print(f"{'budget ms':>10} {'rollouts/s':>12} {'mean score':>12} {'deaths':>8} {'p99 ms':>8}")
+
+    settings = dict(default_settings, food_count=3)
+    for budget in (0.0, 0.002, 0.01, 0.05):
+        rng = random.Random(0)
+        policy = MonteCarloPolicy(rng, budget=1.0, table=DepthTable(1 << 16))
+        policy.set_interval(budget)
+
+        scores = []
+        deaths = 0
+        for _ in range(games):
+            engine = SnakeEngine(16, 32, settings, rng)
+
+            for _ in range(max_ticks):
+                result = engine.step(policy(engine))
+                if not result["alive"] or result["won"]:
+                    break
+
+            scores.append(engine.score)
+            deaths += not engine.alive
+
+        latency = policy.latency_percentiles((0.99,))[0.99]
+        print(
+            f"{budget * 1000:>10.1f} {policy.rollout_rate:>12,.0f} "
+            f"{sum(scores) / games:>12.2f} {deaths:>8} {latency * 1000:>8.2f}"
+        )
+
+
+def bench_history(ticks: int = 20000, repeats: int = 5) -> None:
+    """ Per tick cost of the engine and of recording the tick in the
+    history of the death screen (best of `repeats` runs)
+    """
+    from history import TickHistory
+
+    step_times = []
+    record_times = []
+
+    for _ in range(repeats):
+        engine, directions = long_snake(100, ticks, food_count=10)
+        history = TickHistory()
+        history.start(engine)
+
+        start = time.perf_counter()
+        results = [engine.step(direction) for direction in directions]
+        step_times.append(time.perf_counter() - start)
+
+        start = time.perf_counter()
+        for result in results:
+            history.record(result)
+        record_times.append(time.perf_counter() - start)
+
+    step = min(step_times) / ticks * 1e6
+    record = min(record_times) / ticks * 1e6
+
+    print(f"{'us/step':>10} {'us/record':>10} {'overhead':>10}")
+    print(f"{step:>10.3f} {record:>10.3f} {record / step:>10.1%}")
+
+
+def bench_rank(games: int = 200_000, queries: int = 20_000) -> None:
+    """ Cost of the rank index of the leaderboard for a growing number
+    of recorded games
+    """
+    from rankindex import RankIndex
+
+    rng = random.Random(0)
+    index = RankIndex()
+
+    print(f"{'games':>10} {'us/insert':>10} {'us/rank':>10} {'us/kth':>10}")
+
+    inserted = 0
+    size = 1000
+    while size <= games:
+        start = time.perf_counter()
+        for _ in range(size - inserted):
+            index.add(int(rng.expovariate(1 / 30)))
+        insert = (time.perf_counter() - start) / (size - inserted)
+        inserted = size
+
+        start = time.perf_counter()
+        for score in range(queries):
+            index.rank(score % 200)
+        rank = (time.perf_counter() - start) / queries
+
+        start = time.perf_counter()
+        for k in range(queries):
+            index.kth(k % size + 1)
+        kth = (time.perf_counter() - start) / queries
+
+        print(f"{size:>10} {insert * 1e6:>10.3f} {rank * 1e6:>10.3f} {kth * 1e6:>10.3f}")
+        size *= 10
+
+
+def _stress_writer(directory: str, writer: int, scores: int, compact_after: int) -> int:
+    """ Adds scores and rewrites the settings as one of many game instances
+
+    :returns number of broken settings reads
+    """
+    import os
+    import common
+    from leaderboard import Leaderboard
+
+    os.chdir(directory)
+    leaderboard = Leaderboard(compact_after=compact_after)
+
+    broken = 0
+    for score in range(scores):
+        leaderboard.add({"time": f"{writer}-{score}", "score": (writer * 7 + score) % 100})
+
+        common.write_settings({**default_settings, "speed": writer})
+        common.flush_writes()
+        try:
+            json.loads(pathlib.Path("settings.json").read_text())
+        except ValueError:
+            broken += 1
+
+    common.flush_writes()
+    if leaderboard.compaction is not None:
+        leaderboard.compaction.join()
+
+    return broken
+
+
+def bench_concurrency(writers: int = 128, scores: int = 20, compact_after: int = 50) -> None:
+    """ Stress test of many game instances which share the leaderboard
+    and the settings of one directory, checks that no score is lost
+    """
+    import tempfile
+    import multiprocessing
+    from leaderboard import Leaderboard
+
+    with tempfile.TemporaryDirectory() as directory:
+        context = multiprocessing.get_context("fork")
+
+        start = time.perf_counter()
+        with context.Pool(writers) as pool:
+            broken = sum(pool.starmap(
+                _stress_writer, [(directory, writer, scores, compact_after) for writer in range(writers)]
+            ))
+        elapsed = time.perf_counter() - start
+
+        expected = {f"{writer}-{score}" for writer in range(writers) for score in range(scores)}
+
+        leaderboard = Leaderboard(directory)
+        found = [item["time"] for item in leaderboard.page(0, len(leaderboard))]
+        lost = len(expected - set(found))
+        duplicated = len(found) - len(set(found))
+
+        leaderboard.compact()
+        merged = {item["time"] for item in leaderboard.page(0, len(leaderboard))}
+        lost_merged = len(expected - merged)
+
+        print(f"{'writers':>10} {'scores':>10} {'lost':>10} {'duplicated':>10} {'lost after merge':>17} {'broken reads':>13} {'scores/s':>10}")
+        print(
+            f"{writers:>10} {len(found):>10} {lost:>10} {duplicated:>10} {lost_merged:>17} {broken:>13} "
+            f"{len(expected) / elapsed:>10.0f}"
+        )
+
+        if lost or duplicated or lost_merged or broken:
+            raise RuntimeError("scores were lost or settings were read partially")
+
+
+def bench_persistence(games: int = 200) -> None:
+    """ Time from a collision to the death screen with synchronous writes 
+    and with the persistence worker, while the disk is busy
+    """
+    import os
+    import tempfile
+    import common
+    from replay import ReplayRecorder
+
+    cwd = os.getcwd()
+    with tempfile.TemporaryDirectory() as directory:
+        os.chdir(directory)
+        try:
+            leaderboard = common.get_leaderboard()
+            worker = common.get_worker()
+
+            print(f"{'writes':>12} {'us/death':>10} {'max us':>10}")
+
+            for background in (False, True):
+                latencies = []
+                for game in range(games):
+                    recorder = ReplayRecorder(game, 20, 60, default_settings)
+                    for tick in range(0, 400, 4):
+                        recorder.turn(tick, tick % 4)
+
+                    # a slow write of something else is running
+                    worker.submit(lambda: time.sleep(0.002))
+
+                    start = time.perf_counter()
+                    if background:
+                        common.write_score({"score": game})
+                        common.save_replay(recorder, 400, game)
+                    else:
+                        leaderboard.add({"time": "now", "score": game})
+                        recorder.save(400, game)
+                    latencies.append(time.perf_counter() - start)
+
+                    worker.flush()
+
+                label = "worker" if background else "synchronous"
+                print(f"{label:>12} {sum(latencies) / games * 1e6:>10.1f} {max(latencies) * 1e6:>10.1f}")
+
+            stats = worker.stats()
+            print(
+                f"worker: {stats['written']} writes, {stats['coalesced']} coalesced, "
+                f"{stats['mean_latency'] * 1e6:.0f} us mean, {stats['max_latency'] * 1e6:.0f} us max"
+            )
+        finally:
+            common.flush_writes()
+            os.chdir(cwd)
+
+
+def bench_input(seconds: float = 600.0, rate: float = 3.0) -> None:
+    """ Latency from a key to its turn and lost turns at a low tick rate,
+    with one key read per tick against the turn queue (simulated time)
+    """
+    from engine import OPPOSITE
+    from turns import TurnQueue
+
+    rng = random.Random(0)
+    interval = 1 / rate
+
+    # the player turns every second, often twice within 50 ms (e.g. up
+    # and then left) and sometimes presses the same key several times
+    keys: List[Tuple[float, int]] = []
+    direction = 0
+    moment = 0.0
+    while moment < seconds:
+        moment += rng.uniform(0.5, 1.5)
+        for _ in range(2 if rng.random() < 0.5 else 1):
+            direction = rng.choice([turn for turn in range(4) if turn not in (direction, OPPOSITE[direction])])
+            for _ in range(rng.choice((1, 1, 1, 3))):
+                keys.append((moment, direction))
+                moment += rng.uniform(0.01, 0.05)
+
+    intended = sum(1 for index, (_, key) in enumerate(keys) if index == 0 or key != keys[index - 1][1])
+
+    print(f"{'input':>12} {'turns':>8} {'lost':>8} {'mean ms':>8} {'max ms':>8}")
+
+    for mode in ("one per tick", "turn queue"):
+        buffer: Deque[Tuple[float, int]] = deque()
+        queue = TurnQueue()
+        current = 0
+        applied = 0
+        latencies = []
+
+        position = 0
+        tick = 0.0
+        while tick < seconds + 5:
+            tick += interval
+            while position < len(keys) and keys[position][0] <= tick:
+                buffer.append(keys[position])
+                position += 1
+
+            if mode == "one per tick":
+                if buffer:
+                    pressed, key = buffer.popleft()
+                    if key not in (current, OPPOSITE[current]):
+                        current = key
+                        applied += 1
+                        latencies.append(tick - pressed)
+            else:
+                while buffer:
+                    pressed, key = buffer.popleft()
+                    queue.push(key, current, pressed)
+
+                turn = queue.pop(tick)
+                if turn is not None:
+                    current = turn
+                    applied += 1
+                    latencies.append(queue.last_latency)
+
+        mean = sum(latencies) / len(latencies) * 1000
+        print(f"{mode:>12} {applied:>8} {intended - applied:>8} {mean:>8.0f} {max(latencies) * 1000:>8.0f}")
+
+
+
+def _render_frames(mode: str, frames: int, stats_path: str) -> None:
+    """ Draws the ticks of a greedy game on the terminal (run in a pty)
+
+    :param mode: "full" redraws the border, all food and the score and
+        refreshes every frame (like the game before the renderers),
+        otherwise the name of the renderer ("curses" or "ansi")
+    :param frames: number of ticks which are drawn
+    :param stats_path: file which receives the bytes per frame the
+        ANSI renderer counted itself
+    """
+    import curses
+    from autopilot import GreedyPolicy
+    from config import color_pairs
+    from renderer import AnsiRenderer, CursesRenderer
+
+    screen = curses.initscr()
+    curses.start_color()
+    for pair, (foreground, background) in color_pairs.items():
+        curses.init_pair(pair, getattr(curses, f"COLOR_{foreground}"), getattr(curses, f"COLOR_{background}"))
+
+    max_y, max_x = screen.getmaxyx()
+    engine = SnakeEngine(max_y, max_x, dict(default_settings), random.Random(0))
+    policy = GreedyPolicy(random.Random(0))
+
+    renderer = None
+    if mode != "full":
+        renderer = AnsiRenderer(screen) if mode == "ansi" else CursesRenderer(screen)
+
+    def put(y: int, x: int, glyph: str, attr: int = 0) -> None:
+        if renderer is not None:
+            renderer.put(y, x, glyph, attr)
+        else:
+            screen.addch(y, x, glyph, attr)
+
+    for _ in range(frames):
+        result = engine.step(policy(engine))
+        if not result["alive"] or result["won"]:
+            break
+
+        if result["tail"] is not None:
+            put(result["tail"][0], result["tail"][1], " ")
+        put(result["head"][0], result["head"][1], "\u25B9", curses.A_BOLD | curses.color_pair(3))
+        put(engine.body[1][0], engine.body[1][1], "\u25AA", curses.color_pair(4))
+
+        food = engine.food if renderer is None else result["new_food"]
+        for cell in food:
+            put(cell[0], cell[1], "@", curses.A_BOLD | curses.color_pair(2))
+
+        if renderer is not None:
+            renderer.set_score(engine.score)
+            renderer.flush()
+        else:
+            screen.border()
+            screen.addstr(0, 1, f" Score: {engine.score} ")
+            screen.refresh()
+
+    curses.endwin()
+    counted = renderer.bytes_per_frame if mode == "ansi" else 0.0
+    pathlib.Path(stats_path).write_text(str(counted))
+
+
+def bench_render(frames: int = 500) -> None:
+    """ Bytes per frame which actually reach an 80x24 terminal (read
+    from a pty) against the bytes the ANSI renderer counts itself
+
+    curses optimizes the writes on its own, so only the pty knows what
+    the curses renderer sends.
+    """
+    import os
+    import pty
+    import tempfile
+
+    def measure(mode: str, count: int) -> Tuple[int, float]:
+        """ Returns the bytes written for `count` frames and the count of the ANSI renderer """
+        stats_path = tempfile.mktemp()
+        pid, fd = pty.fork()
+        if pid == 0:
+            os.environ["TERM"] = "xterm-256color"
+            os.environ["LINES"], os.environ["COLUMNS"] = "24", "80"
+            try:
+                _render_frames(mode, count, stats_path)
+            finally:
+                os._exit(0)
+
+        written = 0
+        while True:
+            try:
+                data = os.read(fd, 65536)
+            except OSError:
+                break
+            if not data:
+                break
+            written += len(data)
+
+        os.waitpid(pid, 0)
+        os.close(fd)
+        counted = float(pathlib.Path(stats_path).read_text())
+        os.unlink(stats_path)
+
+        return written, counted
+
+    print(f"{'renderer':>10} {'bytes/frame':>12} {'counted':>10}")
+
+    for mode in ("full", "curses", "ansi"):
+        # the setup and the first frame are measured separately and subtracted
+        setup, _ = measure(mode, 1)
+        written, counted = measure(mode, frames + 1)
+        counted_text = f"{counted:.1f}" if mode == "ansi" else "-"
+        print(f"{mode:>10} {(written - setup) / frames:>12.1f} {counted_text:>10}")
+
+
+def _play_until_death(directory: str) -> None:
+    """ Runs a session which starts in the game (run in a pty) and plays
+    without input until the snake runs into the wall
+    """
+    import os
+    import curses
+    from window import Window
+
+    os.chdir(directory)
+    pathlib.Path("settings.json").write_text(json.dumps(dict(default_settings, speed=20)))
+
+    window = Window()
+    window.window_state["active_window"] = "GAME"
+    curses.wrapper(window.run)
+
+
+def bench_death(timeout: float = 10.0) -> None:
+    """ Checks that the death screen (and the death screen after a replay
+    of the last ticks) is on the terminal before any key is pressed
+    """
+    import os
+    import pty
+    import select
+    import signal
+    import tempfile
+
+    # last line of the death screen
+    marker = b"Press R to replay the last moves"
+
+    def read_until(fd: int, text: bytes) -> float:
+        """ Returns the seconds until the text was written (raises if it is not) """
+        start = time.perf_counter()
+        output = b""
+        while text not in output:
+            left = start + timeout - time.perf_counter()
+            if left <= 0 or not select.select([fd], [], [], left)[0]:
+                raise RuntimeError(f"{text.decode()!r} was not drawn within {timeout:.0f}s without a key")
+            output += os.read(fd, 65536)
+
+        return time.perf_counter() - start
+
+    with tempfile.TemporaryDirectory() as directory:
+        pid, fd = pty.fork()
+        if pid == 0:
+            os.environ["TERM"] = "xterm-256color"
+            os.environ["LINES"], os.environ["COLUMNS"] = "24", "80"
+            try:
+                _play_until_death(directory)
+            finally:
+                os._exit(0)
+
+        try:
+            death = read_until(fd, marker)
+
+            # the replay ends on its own and draws the death screen again
+            os.write(fd, b"r")
+            replay = read_until(fd, marker)
+
+            os.write(fd, b"q")
+        except RuntimeError:
+            # the session still waits for a key
+            os.kill(pid, signal.SIGKILL)
+            raise
+        finally:
+            os.waitpid(pid, 0)
+            os.close(fd)
+
+    print(f"{'game s':>10} {'replay s':>10}")
+    print(f"{death:>10.2f} {replay:>10.2f}")
+
+benchmarks = {
+    "length": bench_snake_length,
+    "food": bench_food_count,
+    "scheduler": bench_scheduler,
+    "batch": bench_batch,
+    "autopilot": bench_autopilot,
+    "transposition": bench_transposition,
+    "hash": bench_hash,
+    "lookahead": bench_lookahead,
+    "history": bench_history,
+    "rank": bench_rank,
+    "concurrency": bench_concurrency,
+    "persistence": bench_persistence,
+    "input": bench_input,
+    "render": bench_render,
+    "death": bench_death,
+}
+
+
+if __name__ == "__main__":
+
+    # run the given benchmarks (or all of them)
+    names = sys.argv[1:] or list(benchmarks)
+    for name in names:
+        print(f"== {name}")
+        benchmarks[name]()
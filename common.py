@@ -1,88 +1,110 @@
-import json
-import pathlib
-from typing import List
+import atexit
+from typing import List, Optional, Tuple
 from datetime import datetime
 
-from config import LeaderboardItem
+from config import GameSettings, LeaderboardItem
+from leaderboard import Leaderboard
+from persistence import PersistenceWorker
+from replay import ReplayRecorder
+from settings_store import SettingsStore
 
 
-def load_settings() -> dict:
-    """ Loads the settings from the respective file
-    
-    :returns the settings as a dict
-    """
-    settings_path = pathlib.Path("settings.json").absolute()
+# worker which does the writes of this process (started on first use)
+_worker: Optional[PersistenceWorker] = None
 
-    # default value for the data
-    data: dict = {}
+# settings of this process (read on first use)
+_settings: Optional[SettingsStore] = None
 
-    # check if file exists and is not empty
-    if settings_path.exists() and settings_path.stat().st_size > 0:
-        try:
-            with open(settings_path, "r") as source:
-                data = json.load(source)
-        except:
-            # It can happen that the write process fails 
-            return {}
 
-    return data
+def get_worker() -> PersistenceWorker:
+    """ Returns the persistence worker, whose writes are flushed at exit """
+    global _worker
 
+    if _worker is None:
+        _worker = PersistenceWorker()
+        atexit.register(_worker.close)
 
-def write_settings(new_data: dict) -> None:
-    """ Wirte the given data to the settings file
-    
-    :param new_data: new setting values for the game 
+    return _worker
+
+
+def flush_writes() -> None:
+    """ Returns once all changed settings and queued writes are on the disk """
+    if _settings is not None:
+        _settings.flush()
+
+    if _worker is not None:
+        _worker.flush()
+
+
+def get_settings() -> SettingsStore:
+    """ Returns the settings of the working directory
+
+    Changes are written by the persistence worker after a short idle
+    time, by flush_writes and at exit.
     """
+    global _settings
+
+    if _settings is None:
+        _settings = SettingsStore("settings.json", get_worker().submit)
 
-    with open("settings.json", "w") as source:
-        json.dump(new_data, source, indent=3)
+        # registered after the worker, so it runs before the worker stops
+        atexit.register(_settings.flush)
 
+    return _settings
 
-def read_leaderboard() -> dict:
-    """Reads and returns the data contained in the leaderboard file
+
+def load_settings() -> GameSettings:
+    """ Returns the validated settings
     
-    Additionally checks if the file exists and returns an empty list
-    if it does not or doen't contain any information
+    The file is only read again if it changed.
 
-    :returns list containing the leaderboard items
+    :returns the settings as a dict
     """
-    file_path = pathlib.Path("leaderboard.json")
+    return get_settings().get()
+
+
+def write_settings(new_data: dict) -> None:
+    """ Changes the settings, the file is written after a short idle time 
+    (see SettingsStore)
     
-    if file_path.exists() and file_path.stat().st_size > 1:
-        with open("leaderboard.json", "r") as source:
-            score_data = json.load(source)
-            return score_data
+    :param new_data: new setting values for the game 
+    """
+    get_settings().update(new_data)
 
-    return []
 
+# leaderboard of this process (loaded on first use)
+_leaderboard: Optional[Leaderboard] = None
 
-def add_score(
-    leaderboard_list: List[LeaderboardItem], 
-    leaderboard_item: LeaderboardItem) -> List[LeaderboardItem]:
-    """ Takes a new Leaderboard entry, adds it to the leaderboard 
-    and additionally sorts the scores according to their score values
-    
-    :param leaderboard_list: liset of leaderboard items
-    :param leaderboard_item: leaderboard item
 
-    :returns sorted leaderboard with new item
+def get_leaderboard() -> Leaderboard:
+    """ Returns the leaderboard of the working directory
+
+    An existing leaderboard.json is migrated on first use.
     """
+    global _leaderboard
 
-    expanded_leaderboard = leaderboard_list
-    expanded_leaderboard.append(leaderboard_item)
+    if _leaderboard is None:
+        _leaderboard = Leaderboard()
 
-    # sort the leaderboard items based on the score
-    sorted_scores = sorted(
-        expanded_leaderboard, 
-        key=lambda item: item["score"]
-    )
+    return _leaderboard
 
-    return sorted_scores[::-1]
+
+def read_leaderboard() -> List[LeaderboardItem]:
+    """ Returns the best scores of the leaderboard
     
+    The scores are kept in memory, so this does not touch the disk
+
+    :returns list containing the leaderboard items (best first)
+    """
+    return get_leaderboard().top()
+
 
 def write_score(game_score: dict) -> None:
-    """ Given a new score item adds the item to the leaderboard
-    on its respecitve position and writes the updated leaderboard
+    """ Given a new score item appends it to the leaderboard log
+
+    The leaderboard in memory is updated directly, the log is written by
+    the persistence worker (scores of one burst with one write). The
+    cost does not depend on the number of recorded scores.
     
     :param game_score: dict containing the score of the snake game
     """
@@ -95,8 +117,30 @@ def write_score(game_score: dict) -> None:
         "score": game_score["score"]
     }
 
-    leaderboard: List[LeaderboardItem] = read_leaderboard()
-    updated_leaderboard = add_score(leaderboard, new_item)
+    leaderboard = get_leaderboard()
+    leaderboard.add(new_item, commit=False)
+    get_worker().submit(leaderboard.commit, key="leaderboard.log")
+
+
+def save_replay(recorder: ReplayRecorder, ticks: int, score: int) -> None:
+    """ Writes the replay of a finished game in the background
+
+    :param recorder: recorder of the game (not used afterwards)
+    :param ticks: number of ticks the game lasted
+    :param score: final score
+    """
+    get_worker().submit(lambda: recorder.save(ticks, score))
+
 
-    with open("leaderboard.json", "w") as source:
-        json.dump(updated_leaderboard, source, indent=3)
+def score_rank(score: int, leaderboard: Optional[Leaderboard] = None) -> Tuple[int, int, float]:
+    """ Returns the place of a score among all recorded games
+
+    :param score: score of a recorded game
+    :param leaderboard: leaderboard to look at (default: the one of the
+        working directory)
+    :returns place (1 is the best), number of games and the percentage
+        of the games with a lower score
+    """
+    if leaderboard is None:
+        leaderboard = get_leaderboard()
+    return leaderboard.rank(score), len(leaderboard), leaderboard.percentile(score)
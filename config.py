@@ -1,5 +1,5 @@
 from enum import Enum
-from typing import TypedDict
+from typing import List, Optional, Tuple, TypedDict
 
 class GameSettings(TypedDict):
     init_length: int
@@ -12,6 +12,15 @@ class LeaderboardItem(TypedDict):
     time: str
     score: int
 
+class TickResult(TypedDict):
+    alive: bool
+    won: bool
+    ate: bool
+    head: Tuple[int, int]
+    tail: Optional[Tuple[int, int]]
+    new_food: List[Tuple[int, int]]
+    score: int
+
 
 # default settings
 default_settings: GameSettings = {
@@ -23,6 +32,15 @@ default_settings: GameSettings = {
 }
 
 
+# color pairs as (foreground, background): Default: 1, Food: 2, Head: 3, Body: 4
+color_pairs = {
+    1: ("WHITE", "BLACK"),
+    2: ("YELLOW", "BLACK"),
+    3: ("RED", "BLACK"),
+    4: ("GREEN", "BLACK"),
+}
+
+
 # Enums for easier value setting
 class Modes(Enum):
     MENU = 0
@@ -0,0 +1,151 @@
+import os
+import mmap
+import struct
+import pathlib
+from array import array
+from typing import Dict, List, Optional, Tuple
+
+
+# directory of the cached cycles (next to the settings and leaderboard)
+cycle_dir = pathlib.Path("cycles")
+
+# header of a cycle file: magic, max_y, max_x, length of the cycle
+header = struct.Struct("<4siii")
+magic = b"SNKC"
+
+
+class Cycle:
+    def __init__(self, max_y: int, max_x: int, order, position, source=None) -> None:
+        """ Hamiltonian cycle over the interior cells of a board
+
+        :param max_y: number of rows of the board (including the walls)
+        :param max_x: number of columns of the board (including the walls)
+        :param order: grid index (y * max_x + x) of the cell at each step
+        :param position: step of each grid index within the cycle (-1 for walls)
+        :param source: memory map which backs the arrays (kept open)
+        """
+        self.max_y = max_y
+        self.max_x = max_x
+        self.order = order
+        self.position = position
+        self.source = source
+
+
+    def __len__(self) -> int:
+        return len(self.order)
+
+
+def build_cycle(max_y: int, max_x: int) -> Optional[List[int]]:
+    """ Builds a Hamiltonian cycle through the interior of the board
+
+    Snakes through the rows (or the columns) and returns along the first
+    column (or row). A cycle only exists if the number of interior cells
+    is even, otherwise None is returned.
+
+    :returns grid indices in the order of the cycle
+    """
+    height = max_y - 2
+    width = max_x - 2
+
+    if height < 2 or width < 2 or (height * width) % 2:
+        return None
+
+    transpose = height % 2 == 1
+    if transpose:
+        height, width = width, height
+
+    cells: List[Tuple[int, int]] = [(0, x) for x in range(width)]
+    for row in range(1, height):
+        columns = range(width - 1, 0, -1) if row % 2 else range(1, width)
+        cells.extend((row, x) for x in columns)
+
+    # back up along the first column
+    cells.extend((row, 0) for row in range(height - 1, 0, -1))
+
+    if transpose:
+        cells = [(x, y) for y, x in cells]
+
+    return [(y + 1) * max_x + x + 1 for y, x in cells]
+
+
+def _path(max_y: int, max_x: int) -> pathlib.Path:
+    return cycle_dir / f"{max_y}x{max_x}.cycle"
+
+
+def _write(path: pathlib.Path, max_y: int, max_x: int, order: array, position: array) -> None:
+    """ Writes the cycle atomically (temporary file and rename) """
+    path.parent.mkdir(parents=True, exist_ok=True)
+    temp_path = path.with_suffix(f".{os.getpid()}.tmp")
+
+    with open(temp_path, "wb") as target:
+        target.write(header.pack(magic, max_y, max_x, len(order)))
+        target.write(order.tobytes())
+        target.write(position.tobytes())
+
+    os.replace(temp_path, path)
+
+
+def _read(path: pathlib.Path, max_y: int, max_x: int) -> Optional[Cycle]:
+    """ Memory maps a cached cycle (None if it is missing or broken) """
+    try:
+        with open(path, "rb") as source:
+            mapped = mmap.mmap(source.fileno(), 0, access=mmap.ACCESS_READ)
+    except (OSError, ValueError):
+        return None
+
+    if len(mapped) < header.size:
+        mapped.close()
+        return None
+
+    file_magic, file_y, file_x, length = header.unpack_from(mapped)
+    expected = header.size + 4 * (length + max_y * max_x)
+
+    if (file_magic, file_y, file_x) != (magic, max_y, max_x) or len(mapped) != expected:
+        mapped.close()
+        return None
+
+    view = memoryview(mapped)
+    order = view[header.size:header.size + 4 * length].cast("i")
+    position = view[header.size + 4 * length:].cast("i")
+
+    return Cycle(max_y, max_x, order, position, mapped)
+
+
+# cycles which were already loaded by this process
+_loaded: Dict[Tuple[int, int], Optional[Cycle]] = {}
+
+
+def load_cycle(max_y: int, max_x: int) -> Optional[Cycle]:
+    """ Returns the cycle for the board size
+
+    Cycles are cached on disk per (max_y, max_x) as raw int32 arrays
+    which are memory mapped, and in memory for the running process.
+
+    :returns the cycle or None if the board has no Hamiltonian cycle
+    """
+    key = (max_y, max_x)
+    if key in _loaded:
+        return _loaded[key]
+
+    path = _path(max_y, max_x)
+    cycle = _read(path, max_y, max_x)
+
+    if cycle is None:
+        cells = build_cycle(max_y, max_x)
+
+        if cells is not None:
+            order = array("i", cells)
+            position = array("i", [-1]) * (max_y * max_x)
+            for step, index in enumerate(order):
+                position[index] = step
+
+            try:
+                _write(path, max_y, max_x, order, position)
+            except OSError:
+                # the cache is optional
+                pass
+
+            cycle = Cycle(max_y, max_x, order, position)
+
+    _loaded[key] = cycle
+    return cycle
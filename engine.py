@@ -0,0 +1,434 @@
+import copy
+import random
+from collections import deque
+from typing import Deque, List, Optional, Set, Tuple
+
+from config import GameSettings
+from config import TickResult
+from zobrist import zobrist_keys, growth_limit
+
+
+# offsets per direction → right: 0, left: 1, up: 2, down: 3
+MOVES = ((0, 1), (0, -1), (-1, 0), (1, 0))
+
+# the direction that would turn the snake into itself
+OPPOSITE = (1, 0, 3, 2)
+
+# direction of an offset between neighbouring cells
+DIRECTIONS = {offset: direction for direction, offset in enumerate(MOVES)}
+
+# codes of the occupancy grid
+EMPTY = 0
+WALL = 1
+BODY = 2
+FOOD = 3
+
+
+class SnakeEngine:
+    def __init__(self, max_y: int, max_x: int, settings: GameSettings, rng=None) -> None:
+        """ Headless version of the snake rules
+
+        The engine owns the body, the food and the score and does not
+        know anything about curses. The outer rows and columns of the
+        given size are the walls, exactly like `screen.border()` draws them.
+        The zobrist `hash` of the state is updated incrementally.
+
+        :param max_y: number of rows of the board (including the walls)
+        :param max_x: number of columns of the board (including the walls)
+        :param settings: game settings (see config.GameSettings)
+        :param rng: random generator to use (defaults to the random module)
+        """
+        self.max_y = max_y
+        self.max_x = max_x
+        self.settings = settings
+        self.rng = rng if rng is not None else random
+
+        # receives every change of the direction (see replay.ReplayRecorder)
+        self.recorder = None
+
+        # number of the current round (counts the resets)
+        self.round = 0
+        self.reset()
+
+
+    def reset(self) -> None:
+        """ Starts a new round with a new position and new food """
+        self.round += 1
+        self.score = 0
+        self.ticks = 0
+        self.alive = True
+        self.won = False
+
+        self._read_settings()
+        self._init_grid()
+        self._init_free()
+
+        self._start_position()
+
+        # the snake starts on a single cell and grows out of it
+        self.body: Deque[Tuple[int, int]] = deque([self.head_pos])
+        self.pending_growth = self.settings["init_length"] - 1
+        self._occupy(self.index(self.head_pos), BODY)
+
+        # registry of the food cells (lookup and replacement in O(1))
+        self.food: Set[Tuple[int, int]] = set()
+        self.missing_food = self.settings["food_count"]
+
+        self.keys = zobrist_keys(len(self.grid))
+        self.rehash()
+        self._fill_food()
+
+        # changes of the last tick (e.g. for incremental policies)
+        self.last_result: Optional[TickResult] = None
+
+
+    def _read_settings(self) -> None:
+        """ Copies the settings which are used per tick into attributes,
+        changes of `settings` apply from the next reset on
+        """
+        self.growth_size = self.settings["growth_size"]
+
+        # ticks per second of vertical moves (for the renderers)
+        self.speed = self.settings["speed"] * self.settings["acceleration"]
+
+
+    def _init_grid(self) -> None:
+        """ Creates the occupancy grid (one byte per cell, indexed 
+        by y * max_x + x) with the walls on the border 
+        """
+        self.grid = bytearray(self.max_y * self.max_x)
+
+        wall_row = bytes([WALL]) * self.max_x
+        self.grid[:self.max_x] = wall_row
+        self.grid[-self.max_x:] = wall_row
+        self.grid[::self.max_x] = bytes([WALL]) * self.max_y
+        self.grid[self.max_x - 1::self.max_x] = bytes([WALL]) * self.max_y
+
+
+    def _init_free(self) -> None:
+        """ Creates the index of the free cells
+        
+        `free` is a dense list of the grid indices of all empty cells
+        and `free_slot` maps a grid index to its position within `free`
+        (or -1) such that cells can be added and removed in O(1).
+        """
+        self.free: List[int] = []
+        self.free_slot: List[int] = [-1] * len(self.grid)
+
+        for index, code in enumerate(self.grid):
+            if code == EMPTY:
+                self.free_slot[index] = len(self.free)
+                self.free.append(index)
+
+
+    def _occupy(self, index: int, code: int) -> None:
+        """ Marks an empty cell with the given code and removes it 
+        from the free cells by swapping in the last free cell
+        """
+        slot = self.free_slot[index]
+        last = self.free.pop()
+
+        if last != index:
+            self.free[slot] = last
+            self.free_slot[last] = slot
+
+        self.free_slot[index] = -1
+        self.grid[index] = code
+
+
+    def _release(self, index: int) -> None:
+        """ Marks the cell as empty and adds it to the free cells """
+        self.free_slot[index] = len(self.free)
+        self.free.append(index)
+        self.grid[index] = EMPTY
+
+
+    def rehash(self) -> int:
+        """ Computes the zobrist hash of the state from scratch
+
+        The hash covers the body cells, the head, the tail, the direction,
+        the pending growth and the food. Every body cell but the head also
+        adds the direction to its neighbour towards the head, so two snakes
+        on the same cells with the same ends but a different order (and
+        different futures) hash differently. The engine keeps `hash` up to
+        date with every change, a rehash is only needed after the state 
+        was modified from the outside.
+
+        :returns the hash of the state
+        """
+        keys = self.keys
+        value = keys.direction[self.direction] ^ keys.growth[min(self.pending_growth, growth_limit)]
+
+        for cell in self.body:
+            value ^= keys.body[self.index(cell)]
+
+        for cell, towards in zip(list(self.body)[1:], self.body):
+            offset = (towards[0] - cell[0], towards[1] - cell[1])
+            value ^= keys.link[self.index(cell) * 4 + DIRECTIONS[offset]]
+
+        value ^= keys.head[self.index(self.body[0])] ^ keys.tail[self.index(self.body[-1])]
+
+        for cell in self.food:
+            value ^= keys.food[self.index(cell)]
+
+        self.hash = value
+        return value
+
+
+    def copy(self, rng=None) -> "SnakeEngine":
+        """ Returns an independent copy of the running game (e.g. to
+        simulate moves without changing this game)
+
+        :param rng: random generator of the copy (defaults to the same one)
+        """
+        clone = copy.copy(self)
+        clone.grid = bytearray(self.grid)
+        clone.free = self.free.copy()
+        clone.free_slot = self.free_slot.copy()
+        clone.body = self.body.copy()
+        clone.food = self.food.copy()
+        clone.recorder = None
+
+        if rng is not None:
+            clone.rng = rng
+
+        return clone
+
+
+    def snapshot(self) -> dict:
+        """ Returns the state of the game as plain data which can be
+        sent to another process and loaded with `restore`
+        """
+        return {
+            "max_y": self.max_y,
+            "max_x": self.max_x,
+            "settings": dict(self.settings),
+            "body": list(self.body),
+            "food": list(self.food),
+            "direction": self.direction,
+            "pending_growth": self.pending_growth,
+            "missing_food": self.missing_food,
+            "score": self.score,
+            "ticks": self.ticks,
+        }
+
+
+    @classmethod
+    def restore(cls, snapshot: dict, rng=None) -> "SnakeEngine":
+        """ Creates an engine which continues the game of a snapshot
+
+        :param snapshot: state returned by `snapshot`
+        :param rng: random generator to use (defaults to the random module)
+        """
+        engine = cls.__new__(cls)
+        engine.max_y = snapshot["max_y"]
+        engine.max_x = snapshot["max_x"]
+        engine.settings = snapshot["settings"]
+        engine.rng = rng if rng is not None else random
+
+        engine.recorder = None
+        engine.round = 1
+        engine.score = snapshot["score"]
+        engine.ticks = snapshot["ticks"]
+        engine.alive = True
+        engine.won = False
+
+        engine._read_settings()
+        engine._init_grid()
+        engine._init_free()
+
+        engine.body = deque(tuple(cell) for cell in snapshot["body"])
+        engine.head_pos = engine.body[0]
+        engine.direction = snapshot["direction"]
+        engine.pending_growth = snapshot["pending_growth"]
+        for cell in engine.body:
+            engine._occupy(engine.index(cell), BODY)
+
+        engine.food = set()
+        for cell in snapshot["food"]:
+            engine.food.add(tuple(cell))
+            engine._occupy(engine.index(cell), FOOD)
+        engine.missing_food = snapshot["missing_food"]
+
+        engine.keys = zobrist_keys(len(engine.grid))
+        engine.rehash()
+        engine.last_result = None
+
+        return engine
+
+
+    def index(self, cell: Tuple[int, int]) -> int:
+        """ Returns the position of the cell within the grid """
+        return cell[0] * self.max_x + cell[1]
+
+
+    def cell(self, cell: Tuple[int, int]) -> int:
+        """ Returns the grid code (EMPTY, WALL, BODY, FOOD) of the cell """
+        return self.grid[self.index(cell)]
+
+
+    def _start_position(self) -> None:
+        """ Given the random start location of the snake orient the
+        snake in a way such that it does not collide directly into the wall.
+        """
+        self.head_pos: Tuple[int, int] = (
+            self.rng.randrange(1, self.max_y - 1),
+            self.rng.randrange(1, self.max_x - 1)
+        )
+
+        # select up: 2 if pos is closes to the bottom and vice versa
+        vertical_dist = self.max_y - self.head_pos[0]
+        vertical_dir = 3 if vertical_dist >= self.max_y // 2 else 2
+
+        # select left: 1 if pos is closes to the right and vice versa
+        horizontal_dist = self.max_x - self.head_pos[1]
+        horizontal_dir = 0 if horizontal_dist >= self.max_x // 2 else 1
+
+        self.direction: int = self.rng.choice([vertical_dir, horizontal_dir])
+
+
+    def _new_food(self) -> Optional[Tuple[int, int]]:
+        """ Places a new apple on a random free cell
+
+        :returns the position of the apple or None if the board is full
+        """
+        if not self.free:
+            return None
+
+        index = self.free[self.rng.randrange(len(self.free))]
+        self._occupy(index, FOOD)
+        self.hash ^= self.keys.food[index]
+
+        return divmod(index, self.max_x)
+
+
+    def _fill_food(self) -> List[Tuple[int, int]]:
+        """ Places the apples which could not be placed so far
+        
+        :returns the positions of the new apples
+        """
+        new_food = []
+        while self.missing_food and self.free:
+            new_pos = self._new_food()
+            self.food.add(new_pos)
+            new_food.append(new_pos)
+            self.missing_food -= 1
+
+        return new_food
+
+
+    def __len__(self) -> int:
+        """ Returns the length of the snake including pending growth """
+        return len(self.body) + self.pending_growth
+
+
+    def turn(self, direction: int) -> None:
+        """ Changes the direction unless it would reverse the snake
+
+        :param direction: right: 0, left: 1, up: 2, down: 3
+        """
+        if direction != OPPOSITE[self.direction] and direction != self.direction:
+            self.hash ^= self.keys.direction[self.direction] ^ self.keys.direction[direction]
+            self.direction = direction
+
+            if self.recorder is not None:
+                self.recorder.turn(self.ticks, direction)
+
+
+    def step(self, direction: Optional[int] = None) -> TickResult:
+        """ Advances the game by one tick
+
+        The new head is checked against the cells that are occupied
+        before the tail moves, so running into the cell the tail is
+        just leaving ends the game (as it always did on screen).
+
+        :param direction: optional new direction (see `turn`)
+        :returns the changes of this tick
+        """
+        if direction is not None:
+            self.turn(direction)
+
+        d_y, d_x = MOVES[self.direction]
+        old_head = self.head_pos[0] * self.max_x + self.head_pos[1]
+        head = (self.head_pos[0] + d_y, self.head_pos[1] + d_x)
+        self.head_pos = head
+        self.ticks += 1
+
+        result: TickResult = {
+            "alive": True,
+            "won": False,
+            "ate": False,
+            "head": head,
+            "tail": None,
+            "new_food": [],
+            "score": self.score
+        }
+        self.last_result = result
+
+        head_index = self.index(head)
+        hit = self.grid[head_index]
+
+        if hit == WALL or hit == BODY:
+            self.alive = False
+            result["alive"] = False
+            return result
+
+        keys = self.keys
+        old_growth = self.pending_growth
+
+        # changes of the zobrist hash are collected and applied at once
+        change = keys.head[old_head] ^ keys.enter[head_index] ^ keys.link[old_head * 4 + self.direction]
+
+        self.body.appendleft(head)
+        if hit == FOOD:
+            self.grid[head_index] = BODY
+            change ^= keys.food[head_index]
+        else:
+            self._occupy(head_index, BODY)
+
+        # the tail stays in place while the snake is still growing
+        deadcell = None
+        if self.pending_growth > 0:
+            self.pending_growth -= 1
+        else:
+            deadcell = self.body.pop()
+
+        if hit == FOOD:
+            self.score += 1
+            self.pending_growth += self.growth_size
+
+            # the freed tail is still marked so no food spawns on it
+            new_pos = self._new_food()
+            self.food.discard(head)
+
+            if new_pos is not None:
+                self.food.add(new_pos)
+                result["new_food"].append(new_pos)
+            else:
+                self.missing_food += 1
+
+            result["ate"] = True
+            result["score"] = self.score
+
+        if deadcell is not None:
+            tail_index = self.index(deadcell)
+            self._release(tail_index)
+            tail_y, tail_x = self.body[-1]
+            link = tail_index * 4 + DIRECTIONS[(tail_y - deadcell[0], tail_x - deadcell[1])]
+            change ^= keys.leave[tail_index] ^ keys.tail[tail_y * self.max_x + tail_x] ^ keys.link[link]
+            result["tail"] = deadcell
+
+        if self.pending_growth != old_growth:
+            change ^= keys.growth[min(old_growth, growth_limit)] ^ keys.growth[min(self.pending_growth, growth_limit)]
+
+        self.hash ^= change
+
+        if self.missing_food:
+            result["new_food"].extend(self._fill_food())
+
+        # the snake covers the whole board
+        if not self.free and not self.food:
+            self.won = True
+            result["won"] = True
+
+        return result
@@ -1,27 +1,57 @@
-import time
 import curses
 import random
-from typing import List, Tuple
+import secrets
+from typing import Optional, Tuple
 
 import config
 import common
 
+from autopilot import policies
 from config import Defaults
+from config import TickResult
+from engine import SnakeEngine, BODY, FOOD
+from history import TickHistory
+from leaderboard import Leaderboard
+from renderer import AnsiRenderer
+from renderer import CursesRenderer
+from replay import ReplayRecorder
+from runtime import Runtime, KEY_CONTINUE, KEY_FOCUS_OUT, KEY_SUSPEND
+from scheduler import TickScheduler
+from turns import TurnQueue, default_depth
 
 
 class Game:
-    def __init__(self, screen, _window: dict) -> None:
+    def __init__(
+        self, screen, _window: dict, backend: str = "curses", autopilot: Optional[str] = None,
+        runtime: Optional[Runtime] = None, turn_depth: int = default_depth,
+        history: Optional[TickHistory] = None, leaderboard: Optional[Leaderboard] = None) -> None:
         """ Initialize basic variables
         
         param: screen (_CursesWindow): The screen instance of curses
         param: _window: Information on which winodw is active (e.g. GAME or MENU)
+        param: backend: how the game is rendered ("curses" or "ansi")
+        param: autopilot: name of the policy which steers the snake (see autopilot.policies)
+        param: runtime: event loop of the session which reads the keys
+        param: turn_depth: turns which can wait for their tick (see turns.TurnQueue)
+        param: history: ring buffer of the game (the screens of a game get the one of the game)
+        param: leaderboard: leaderboard of the game (loaded if not given)
         """
         self.screen = screen
         self.window_state = _window
+        self.backend = backend
+        self.autopilot = autopilot
+        self.runtime = runtime
+        self.turn_depth = turn_depth
         
         self.game_state = {"current_state": "GAME"}
         self.game_score = {"score": 0}
 
+        # changes of the last ticks which the death screen can replay
+        self.history = history if history is not None else TickHistory()
+
+        # load the leaderboard now, so the death screen does not wait for it
+        self.leaderboard = leaderboard if leaderboard is not None else common.get_leaderboard()
+
         self.max_y: int
         self.max_x: int
         self.max_y, self.max_x = self.screen.getmaxyx()
@@ -63,20 +93,27 @@ class Game:
         self.status["score"] = value
 
 
-    def __call__(self):
+    async def __call__(self):
 
-        state_death = GameDeath(self.screen, self.game_state, self.window_state, self.game_score)
-        state_game = GameWindow(self.screen, self.game_state, self.window_state, self.game_score)
+        state_death = GameDeath(
+            self.screen, self.game_state, self.window_state, self.game_score, 
+            self.history, self.runtime, self.leaderboard
+        )
+        state_game = GameWindow(
+            self.screen, self.game_state, self.window_state, self.game_score, 
+            self.backend, self.autopilot, self.history, self.runtime, self.turn_depth, self.leaderboard
+        )
         state_game.reset()
 
         while True:
             if self.game_state["current_state"] == "GAME":
-                self.screen.nodelay(1)
-                state_game()
+                await state_game()
+
+            elif self.game_state["current_state"] == "PAUSE":
+                await state_game.paused()
 
             elif self.game_state["current_state"] == "DEATH":
-                self.screen.nodelay(0)
-                state_death()   
+                await state_death()   
                 state_game.reset()
                 self.screen.clear()
 
@@ -103,131 +140,125 @@ class GameWindow(Game):
     char = "\u25AA" #"\u25A0"
     heads = ("\u25B9", "\u25C3", "\u25B5", "\u25BF")
 
-    def __init__(self, screen, _state: dict, _window: dict, _status: dict) -> None:
+    # keys which pause and resume the game, the game is paused as well
+    # when the terminal loses the focus or is suspended
+    pause_keys = (ord("p"), ord("P"))
+    pause_events = (KEY_FOCUS_OUT, KEY_SUSPEND)
+
+    def __init__(
+        self, screen, _state: dict, _window: dict, _status: dict, 
+        backend: str = "curses", autopilot: Optional[str] = None,
+        history: Optional[TickHistory] = None, runtime: Optional[Runtime] = None,
+        turn_depth: int = default_depth, leaderboard: Optional[Leaderboard] = None) -> None:
         """ Initalize class variables
         
         :param screen (_CursesScreen): cureses screen instance
         :param _state: which game subwindow is active
         :param _window: which main window is active (currently: GAME)
         :param _status: information about score
+        :param backend: how the game is rendered ("curses" or "ansi")
+        :param autopilot: name of the policy which steers the snake instead 
+            of the arrow keys
+        :param history: ring buffer which records the last ticks
+        :param runtime: event loop of the session which reads the keys
+        :param turn_depth: turns which can wait for their tick
+        :param leaderboard: leaderboard of the game
         """
-        super().__init__(screen, _window)
+        super().__init__(screen, _window, backend, autopilot, runtime, turn_depth, history, leaderboard)
 
         self.screen = screen
 
         self.state = _state
         self.status = _status
 
+        self.policy = policies[autopilot]() if autopilot else None
+
+        # turns of the arrow keys, one is applied per tick
+        self.turns = TurnQueue(turn_depth)
+
         
     def reset(self):
-        self.settings = common.load_settings()
+        # parsed again only if the file changed
+        settings = common.get_settings()
+        self.settings = settings.get()
         self._update_score(0)
 
         self.is_paused = False
 
-        # initalize starting position and direction
-        self._start_position()
-        self.body = [self.head_pos] * self.settings["init_length"]
-        self.deadcell = self.body[-1][:]
+        # the engine owns the rules, this window only renders it, every
+        # game gets its own seed such that it can be replayed
+        self.seed = secrets.randbits(64)
+        self.engine = SnakeEngine(self.max_y, self.max_x, self.settings, random.Random(self.seed))
 
-        self.snake_speed = self.settings["speed"] * self.settings["acceleration"]
-        self.__init_food()
+        self.recorder = ReplayRecorder(self.seed, self.max_y, self.max_x, self.settings)
+        self.engine.recorder = self.recorder
+        self.history.start(self.engine)
+        self.turns.clear()
 
+        if self.backend == "ansi":
+            self.renderer = AnsiRenderer(self.screen)
+        else:
+            self.renderer = CursesRenderer(self.screen)
+        self.draw_food(self.engine.food)
 
+        self.snake_speed = settings.speed * settings.acceleration
+        self.scheduler = TickScheduler(self.tick_rate())
+        if self.policy:
+            self.policy.set_interval(self.scheduler.interval)
 
-    def _start_position(self) -> None:
-        """ Given the random start location of the snake orient the 
-        snake in a way such that it does not collide directly into the wall.
-        
-        Looks up which borders are closest and orients the snake into the 
-        opposite direction.
-        """
-        self.head_pos : List[int]
-        self.head_pos = [
-            random.randrange(1, self.max_y - 1), 
-            random.randrange(1, self.max_x - 1)
-        ]
-
-        # select up: 2 if pos is closes to the bottom and vice versa 
-        vertical_dist = self.max_y - self.head_pos[0] 
-        vertical_dir = 3 if vertical_dist >= self.max_y // 2 else 2
-
-        # select left: 1 if pos is closes to the right and vice versa 
-        horizontal_dist = self.max_x - self.head_pos[1]
-        horizontal_dir = 0 if horizontal_dist >= self.max_x // 2 else 1
-        
-        # choose either one 
-        self.direction: int
-        self.direction = random.choice([vertical_dir, horizontal_dir])
 
+    def tick_rate(self) -> float:
+        """ Returns the ticks per second for the current direction
 
-    def __init_food(self):
-        self.food = []
-        
-        for _ in range(self.settings["food_count"]):
-            new_pos = self._new_food()
-            self.food.append(new_pos)
+        Horizontal moves run twice as fast since the size of the 
+        rows is double the size of the columns
+        """
+        if self.engine.direction in [0,1]:
+            return self.snake_speed * 2
 
+        return self.snake_speed
 
-    def _new_food(self):
-        """ Searches a freee space and then places a new apple there """
+
+    def draw_game(self, result: TickResult) -> None:
+        """ Hands the changed cells of the last tick to the renderer
         
-        while True:
-            new_pos = [
-                random.randrange(1, self.max_y - 1), 
-                random.randrange(1, self.max_x - 1)
-            ]
-
-            if (
-                new_pos not in self.food and 
-                self.screen.inch(*new_pos) == config.Keys.SPACE.value
-            ):
-                return new_pos
-
-    def update_food(self, food_pos: List[int]):
-        """ Given the coordinates of the eaten food create new
-        food to replace the eaten one
+        :param result: changes of the last engine tick
         """
         
-        # index the food
-        food_index = self.food.index(food_pos)
-        self.food[food_index] = self._new_food()
-
-
-    def draw_game(self) -> None:
-        """ Draws the differenct components of the game"""
-        
         # overwrites the old (dead) cells by replacing the chars by empty strings
-        if self.deadcell not in self.body:
-            self.screen.addch(
-                self.deadcell[0],
-                self.deadcell[1],
-                " "
-            )
+        if result["tail"] is not None:
+            self.renderer.put(result["tail"][0], result["tail"][1], " ")
 
         # Draws the head of the snake according to the direction it looks
-        headchar = self.heads[self.direction]
-        self.screen.addch(
-            self.head_pos[0], 
-            self.head_pos[1], 
+        headchar = self.heads[self.engine.direction]
+        self.renderer.put(
+            result["head"][0], 
+            result["head"][1], 
             headchar, 
             curses.A_BOLD|curses.color_pair(3)
         )
 
         # Draws the body 
-        self.screen.addch(
-            self.body[1][0], 
-            self.body[1][1], 
+        self.renderer.put(
+            self.engine.body[1][0], 
+            self.engine.body[1][1], 
             self.char, 
             curses.color_pair(4)
         )
 
-        # draws the food
-        for food_item in self.food:
-            self.screen.addch(
+        self.draw_food(result["new_food"])
+
+
+    def draw_food(self, food) -> None:
+        """ Draws the given food items
+        
+        :param food: cells of the food items
+        """
+        for food_item in food:
+            self.renderer.put(
                 food_item[0],
                 food_item[1],
-                ord(self.food_char),
+                self.food_char,
                 curses.A_BOLD| curses.color_pair(2)
             )
 
@@ -248,143 +279,204 @@ class GameWindow(Game):
         """
         
         if action == ord("q") or action == ord("Q"):
+            common.save_replay(self.recorder, self.engine.ticks, self.engine.score)
             self._update_state("QUIT")
             self.screen.refresh()
 
             return True
 
 
-    def handle_move(self, action: int) -> None:
-        """ Handles the direction of the snake given a arrow key
-        
-        Addtionally prevents the snake to go into the opposite direction.
-        Which is not a valid move since this would terminate the snake.
+    def redraw(self) -> None:
+        """ Draws the whole frame again (e.g. after the process was
+        continued, when the terminal may show anything)
+        """
+        self.renderer.reset()
 
-        :param action: ascii value of pressed key
+        for cell in list(self.engine.body)[1:]:
+            self.renderer.put(cell[0], cell[1], self.char, curses.color_pair(4))
+
+        head = self.engine.body[0]
+        self.renderer.put(
+            head[0], head[1], self.heads[self.engine.direction], 
+            curses.A_BOLD|curses.color_pair(3)
+        )
+        self.draw_food(self.engine.food)
+
+        if self.is_paused:
+            self.renderer.set_banner(" Paused - press P to resume ")
+
+        self.renderer.set_score(self.status['score'])
+        self.renderer.flush()
+
+
+    def pause(self, at: Optional[float] = None) -> None:
+        """ Switches to the PAUSE state
+
+        The scheduler keeps its phase, so the next tick comes as late after
+        resuming as it would have come after the pause began.
+
+        :param at: time.perf_counter() of the pause (e.g. when the key was read)
         """
-        if action == curses.KEY_UP and self.direction != 3:
-            self.direction = 2
+        self.is_paused = True
+        self.scheduler.pause(at)
 
-        elif action == curses.KEY_DOWN and self.direction != 2:
-            self.direction = 3
-        
-        elif action == curses.KEY_RIGHT and self.direction != 1:
-            self.direction = 0
-        
-        elif action == curses.KEY_LEFT and self.direction != 0:
-            self.direction = 1
+        # keys from before the pause are outdated afterwards
+        self.turns.clear()
 
-        return 
+        self.renderer.set_banner(" Paused - press P to resume ")
+        self.renderer.flush()
+        self._update_state("PAUSE")
 
 
-    def move_head(self):
-        """ Moves the head position and adjusts the body """
-        
-        # right: 0, left: 1, up: 2, down: 3 
-        if self.direction == 0:
-            self.head_pos[1] += 1
+    async def paused(self) -> None:
+        """ Waits for the key which resumes the game
 
-        elif self.direction == 1:
-            self.head_pos[1] -= 1
+        Only waits for input (no timer runs), so a paused game uses no CPU.
+        """
+        while True:
+            action = await self.runtime.getch()
+            if self.handle_menu(action):
+                return
 
-        elif self.direction == 2:
-            self.head_pos[0] -= 1
+            if action == KEY_CONTINUE:
+                self.redraw()
 
-        elif self.direction == 3:
-            self.head_pos[0] += 1
+            elif action in self.pause_keys:
+                break
 
-        # sets the last body element to deadcell and
-        # shifts the body elements by one 
-        self.deadcell = self.body[-1][:]
-        for i in range(len(self.body) -1, 0, -1):
-            self.body[i] = self.body[i -1]
+        self.renderer.set_banner()
+        self.renderer.flush()
 
-        # sets the new body item to the head pos
-        self.body[0] = self.head_pos[:]
+        self.scheduler.resume()
+        self.is_paused = False
+        self._update_state("GAME")
 
 
-    def check_collision(self):
-        """ Chks if the new position of the snake head is valid
+    def handle_move(self, action: int, pressed: Optional[float] = None) -> None:
+        """ Handles the direction of the snake given a arrow key
         
-        Given the new head position gets the char the new position
-        has and compares it to the wall and food chars. Additionally 
-        the method retuns a bool if the snake hit a wall which allows
-        to break the game instantly instead of waitin for a complete tick
+        The turn is queued for the next free tick. Addtionally prevents 
+        the snake to go into the opposite direction (of the direction it
+        has when the turn runs), which would terminate the snake.
 
-        :returns boolean: If the snake collided with a wall
+        :param action: ascii value of pressed key
+        :param pressed: time.perf_counter() when the key was read
         """
+        if action == curses.KEY_UP:
+            self.turns.push(2, self.engine.direction, pressed)
+
+        elif action == curses.KEY_DOWN:
+            self.turns.push(3, self.engine.direction, pressed)
         
-        n_char = self.screen.inch(*self.head_pos)
+        elif action == curses.KEY_RIGHT:
+            self.turns.push(0, self.engine.direction, pressed)
         
-        # n_char value for @ sign (linux and windows)
-        if n_char == 2097728 or n_char == 41943104:
-            self._update_score(self.status['score'] +1)
-            
-            for _ in range(self.settings["growth_size"]):
-                self.body.append(self.body[-1])
-
-            self.update_food(self.head_pos)
+        elif action == curses.KEY_LEFT:
+            self.turns.push(1, self.engine.direction, pressed)
+
+        return 
+
+
+    def check_collision(self, result: TickResult) -> bool:
+        """ Checks if the last engine tick was valid
         
-        elif n_char == config.Keys.SPACE.value:
-            pass
+        Updates the score and when the snake hit a wall or itself (or
+        filled the whole board) writes the score and switches to the 
+        death screen. Retuns a bool which allows to break the game 
+        instantly instead of waitin for a complete tick
+
+        :param result: changes of the last engine tick
+        :returns boolean: If the move was valid
+        """
         
-        else:
+        self.status["won"] = result["won"]
+
+        if not result["alive"] or result["won"]:
+            if result["won"]:
+                self._update_score(result["score"])
+
+            # both are written by the persistence worker
             common.write_score(self.status)
+            common.save_replay(self.recorder, self.engine.ticks, result["score"])
             self._update_state("DEATH")
             return False
 
+        self._update_score(result["score"])
         return True
 
 
-    def __call__(self) -> None:
+    async def __call__(self) -> None:
         """ Main Loop of Snake Game instance"""
-        
-        # draw the border
-        self.screen.border()
 
-        # handle the key inputs
-        action = self.screen.getch()
-        self.handle_menu(action)
+        # handle every key which was read since the last frame
+        keys = self.runtime.drain()
+        for index, (action, pressed) in enumerate(keys):
+            if self.handle_menu(action):
+                return
 
-        # allows to skip the sleep timer
-        if self.handle_move(action):
-            return
+            if action in self.pause_keys or action in self.pause_events:
+                self.pause(pressed)
 
-        # move the snake head
-        self.move_head()
+                # a suspended process is continued before its keys are read
+                if any(key == KEY_CONTINUE for key, _ in keys[index + 1:]):
+                    self.redraw()
+                return
 
-        valid_move = self.check_collision()
+            if action == KEY_CONTINUE:
+                self.redraw()
 
-        if not valid_move:
-            # break the game without sleeping
-            return 
+            self.handle_move(action, pressed)
 
-        self.draw_game()
+        # advance the rules by every tick which is due, when the loop 
+        # fell behind the frames in between are not refreshed
+        for _ in range(self.scheduler.due()):
+            direction = self.policy(self.engine) if self.policy else self.turns.pop()
+            result = self.engine.step(direction)
 
-        # draw score
-        self.screen.addstr(0, 1, f" Score: {self.status['score']} ")
-        self.screen.move(self.max_y - 1, self.max_x - 1)
-        self.screen.refresh()
+            # the last tick (a crash or the full board) is replayed as well
+            self.history.record(result)
+            valid_move = self.check_collision(result)
 
-        # reduce the sleep time when moving vertically since the  
-        # size of the columns is double the amount
-        sleep_time = 1 / self.snake_speed  
-        sleep_time = sleep_time / 2 if self.direction in [0,1] else sleep_time
-        
-        time.sleep(sleep_time)
+            if not valid_move:
+                # break the game without sleeping
+                return 
+
+            self.draw_game(result)
+            self.scheduler.set_rate(self.tick_rate())
+
+            if self.policy:
+                self.policy.set_interval(self.scheduler.interval)
+
+        # draw score and write the changed cells
+        self.renderer.set_score(self.status['score'])
+        self.renderer.flush()
+
+        # a key ends the wait, so a pause or quit is handled right away
+        await self.scheduler.sleep(self.runtime.key_ready)
 
 
 
 class GameDeath(Game):
-    def __init__(self, screen, _state: dict, _window: dict, _status: dict):
+
+    # keys which change the speed of the replay
+    faster = (ord("+"), ord("="))
+    slower = (ord("-"),)
+
+    def __init__(
+        self, screen, _state: dict, _window: dict, _status: dict, 
+        history: Optional[TickHistory] = None, runtime: Optional[Runtime] = None,
+        leaderboard: Optional[Leaderboard] = None):
         """ Initalize class variables
         
         :param screen (_CursesScreen): cureses screen instance
         :param _state: which game subwindow is active
         :param _window: which main window is active (currently: GAME)
         :param _status: information about score
+        :param history: ring buffer with the last ticks of the game
+        :param runtime: event loop of the session which reads the keys
+        :param leaderboard: leaderboard with the place of the score
         """
-        super().__init__(screen, _window)
+        super().__init__(screen, _window, runtime=runtime, history=history, leaderboard=leaderboard)
 
         self.screen = screen
 
@@ -392,7 +484,7 @@ class GameDeath(Game):
         self.status = _status
 
 
-    def handle_menu_keys(self, action: int):
+    async def handle_menu_keys(self, action: int):
         """ Handles the menu keys
         todo: change into switch case when python 3.10 is used instead
 
@@ -411,18 +503,105 @@ class GameDeath(Game):
             self._update_state("QUIT")
             self.screen.refresh()
 
+        elif action == ord('r') or action == ord("R"):
+            await self.replay_ticks()
+            self.draw_screen()
+            return False
+
         else: 
             return False
         
         return True
 
+
+    async def replay_ticks(self) -> None:
+        """ Replays the last ticks of the game from the history
+
+        The board before the oldest kept tick is restored and the ticks
+        are drawn again at the speed of the game.
+            - (+/-): doubles or halves the speed
+            - any other key stops the replay
+        """
+        if not len(self.history):
+            return
+
+        engine = self.history.engine
+        max_x = engine.max_x
+        grid, head = self.history.rewind()
+
+        self.screen.clear()
+        renderer = CursesRenderer(self.screen)
+
+        for index, code in enumerate(grid):
+            if code == BODY:
+                renderer.put(index // max_x, index % max_x, GameWindow.char, curses.color_pair(4))
+            elif code == FOOD:
+                renderer.put(index // max_x, index % max_x, GameWindow.food_char, curses.A_BOLD | curses.color_pair(2))
+
+        changes = list(self.history.changes())
+        score = engine.score - sum(ate for _, _, _, ate, _ in changes)
+
+        snake_speed = engine.speed
+        speed = 1.0
+
+        def tick_rate(direction: int) -> float:
+            return snake_speed * speed * (2 if direction in (0, 1) else 1)
+
+        scheduler = TickScheduler(tick_rate(changes[0][1]))
+
+        tick = 0
+        while tick < len(changes):
+            action = self.runtime.poll()
+            if action in self.faster:
+                speed *= 2
+            elif action in self.slower:
+                speed /= 2
+            elif action != -1:
+                break
+
+            for _ in range(scheduler.due()):
+                if tick == len(changes):
+                    break
+
+                new_head, direction, tail, ate, food = changes[tick]
+                tick += 1
+
+                if tail >= 0:
+                    renderer.put(tail // max_x, tail % max_x, " ")
+
+                renderer.put(head // max_x, head % max_x, GameWindow.char, curses.color_pair(4))
+                renderer.put(
+                    new_head // max_x, new_head % max_x, GameWindow.heads[direction], 
+                    curses.A_BOLD | curses.color_pair(3)
+                )
+
+                for cell in food:
+                    renderer.put(cell // max_x, cell % max_x, GameWindow.food_char, curses.A_BOLD | curses.color_pair(2))
+
+                head = new_head
+                score += ate
+                scheduler.set_rate(tick_rate(direction))
+
+            renderer.set_score(score)
+            renderer.flush()
+            await scheduler.sleep()
+
     def draw_end(self):
         """ Drawing the end screen """
+        if self.status.get("won"):
+            headline = f"You filled the board with {self.status['score']} points"
+        else:
+            headline = f"You got {self.status['score']} points"
+
+        rank, games, percentile = common.score_rank(self.status["score"], self.leaderboard)
+
         elements: Tuple[str] = (
-            f"You got {self.status['score']} points",
+            headline,
+            f"You placed #{rank} of {games} (better than {percentile:.0f}% of all games)",
             "Press Enter to play again",
             "Press Q to quit",
             "Press M to go to main menu",
+            "Press R to replay the last moves",
         )
 
         max_y: int
@@ -441,19 +620,27 @@ class GameDeath(Game):
             )
 
 
-    def __call__(self):
-        """ Main window of death screen"""
-
+    def draw_screen(self) -> None:
+        """ Draws the border and the end screen """
         self.screen.clear()
 
         self.screen.border()
         self.draw_end()
 
-        
+        # the keys are no longer read with getch (which refreshed the
+        # screen), so the death screen is shown right away
+        self.screen.refresh()
+
+
+    async def __call__(self):
+        """ Main window of death screen"""
+
+        self.draw_screen()
+
         # handles non menu input
         while True:
-            action = self.screen.getch()
-            if self.handle_menu_keys(action):
+            action = await self.runtime.getch()
+            if await self.handle_menu_keys(action):
                 break
 
         self.screen.clear()
@@ -0,0 +1,159 @@
+from array import array
+from typing import Iterator, Optional, Tuple
+
+from config import TickResult
+from engine import SnakeEngine, MOVES, EMPTY, BODY, FOOD
+
+
+# number of ticks which are kept by default
+default_capacity = 256
+
+
+class TickHistory:
+    def __init__(self, capacity: int = default_capacity, food_capacity: Optional[int] = None) -> None:
+        """ Ring buffer of the changes of the last ticks
+
+        Every field is a preallocated array with one slot per tick (the new
+        food has its own ring since a tick can place several apples), so
+        recording a tick only overwrites numbers and the memory does not
+        grow however long the game runs.
+
+        :param capacity: number of ticks which are kept
+        :param food_capacity: number of new apples which are kept
+            (default: twice the capacity)
+        """
+        self.capacity = capacity
+        self.food_capacity = food_capacity or 2 * capacity
+
+        # per tick: grid index of the head and the freed tail (-1 for
+        # none), the direction, if food was eaten and the new apples as
+        # start and count within the food ring
+        self.heads = array("i", [0]) * capacity
+        self.tails = array("i", [0]) * capacity
+        self.directions = bytearray(capacity)
+        self.ate = bytearray(capacity)
+        self.food_start = array("q", [0]) * capacity
+        self.food_count = array("i", [0]) * capacity
+
+        self.food = array("i", [0]) * self.food_capacity
+
+        self.engine: Optional[SnakeEngine] = None
+        self.clear()
+
+
+    def clear(self) -> None:
+        """ Forgets all ticks (without releasing the buffers) """
+        self.ticks = 0
+        self.slot = 0
+        self.food_total = 0
+
+        # the last tick ran into a wall or the body (it changed no cell)
+        self.crashed = False
+
+
+    def start(self, engine: SnakeEngine) -> None:
+        """ Starts recording the ticks of a new game """
+        self.engine = engine
+        self.max_x = engine.max_x
+        self.clear()
+
+
+    def record(self, result: TickResult) -> None:
+        """ Stores the changes of a tick (the last one may end the game)
+
+        Called on every tick, so it only writes into the preallocated
+        slots and keeps the lookups of attributes to a minimum.
+
+        :param result: changes of the last engine tick
+        """
+        max_x = self.max_x
+        slot = self.slot
+        self.slot = slot + 1 if slot + 1 < self.capacity else 0
+        self.ticks += 1
+
+        head = result["head"]
+        self.heads[slot] = head[0] * max_x + head[1]
+
+        tail = result["tail"]
+        self.tails[slot] = -1 if tail is None else tail[0] * max_x + tail[1]
+
+        self.directions[slot] = self.engine.direction
+        self.ate[slot] = result["ate"]
+
+        new_food = result["new_food"]
+        food_total = self.food_total
+        self.food_start[slot] = food_total
+        self.food_count[slot] = len(new_food)
+
+        if new_food:
+            food = self.food
+            for cell in new_food:
+                food[food_total % self.food_capacity] = cell[0] * max_x + cell[1]
+                food_total += 1
+            self.food_total = food_total
+
+        if not result["alive"]:
+            self.crashed = True
+
+
+    def __len__(self) -> int:
+        """ Returns the number of ticks which can be replayed """
+        first = max(self.ticks - self.capacity, 0)
+
+        # ticks whose apples were overwritten in the food ring are lost
+        while first < self.ticks and self.food_total - self.food_start[first % self.capacity] > self.food_capacity:
+            first += 1
+
+        return self.ticks - first
+
+
+    def _slots(self) -> Iterator[int]:
+        """ Returns the slots of the kept ticks from the oldest on """
+        for tick in range(self.ticks - len(self), self.ticks):
+            yield tick % self.capacity
+
+
+    def rewind(self) -> Tuple[bytearray, int]:
+        """ Computes the board before the oldest kept tick by undoing the
+        kept ticks on the current board of the engine
+
+        :returns the occupancy grid and the grid index of the head
+        """
+        grid = bytearray(self.engine.grid)
+        slots = list(self._slots())
+
+        # the crash left the board as it was
+        undo = slots[:-1] if self.crashed else slots
+
+        for slot in reversed(undo):
+            # the new food was placed last (it may lie on the freed tail)
+            start = self.food_start[slot]
+            for offset in range(self.food_count[slot]):
+                grid[self.food[(start + offset) % self.food_capacity]] = EMPTY
+
+            if self.tails[slot] >= 0:
+                grid[self.tails[slot]] = BODY
+
+            grid[self.heads[slot]] = FOOD if self.ate[slot] else EMPTY
+
+        # the head before the oldest tick is one step behind its head
+        if slots:
+            d_y, d_x = MOVES[self.directions[slots[0]]]
+            head = self.heads[slots[0]] - d_y * self.engine.max_x - d_x
+        else:
+            head = self.engine.index(self.engine.body[0])
+
+        return grid, head
+
+
+    def changes(self) -> Iterator[Tuple[int, int, int, bool, Tuple[int, ...]]]:
+        """ Returns the kept ticks from the oldest on
+
+        :returns (head, direction, freed tail or -1, ate, new food) per tick
+        """
+        for slot in self._slots():
+            start = self.food_start[slot]
+            food = tuple(
+                self.food[(start + offset) % self.food_capacity] for offset in range(self.food_count[slot])
+            )
+            yield self.heads[slot], self.directions[slot], self.tails[slot], bool(self.ate[slot]), food
@@ -0,0 +1,451 @@
+import os
+import copy
+import json
+import heapq
+import pathlib
+import threading
+from typing import Iterator, List, Optional, Tuple
+
+from config import LeaderboardItem
+from rankindex import RankIndex
+from storage import FileLock, GroupCommit
+
+
+# every record (and the header of the snapshot) is one line of this size:
+# time (20 characters), a space, the score (10 digits) and a newline
+record_size = 32
+
+# appended records which trigger a compaction into the snapshot
+compact_after = 1000
+
+
+def format_record(item: LeaderboardItem) -> bytes:
+    """ Returns the fixed size line of a leaderboard item """
+    return f"{item['time']:<20.20} {item['score']:010d}\n".encode()
+
+
+def parse_record(line: bytes) -> Optional[LeaderboardItem]:
+    """ Parses a record line (None if it is broken, e.g. cut off) """
+    if len(line) != record_size or line[-1:] != b"\n":
+        return None
+
+    try:
+        return {"time": line[:20].decode().rstrip(), "score": int(line[21:31])}
+    except ValueError:
+        return None
+
+
+def _records(data: bytes) -> Iterator[LeaderboardItem]:
+    """ Returns the valid records of a block of lines """
+    for start in range(0, len(data) - record_size + 1, record_size):
+        item = parse_record(data[start:start + record_size])
+        if item is not None:
+            yield item
+
+
+class Leaderboard:
+    def __init__(self, directory: str = ".", top_k: int = 10, compact_after: int = compact_after) -> None:
+        """ Append-only leaderboard with the best scores in memory
+
+        A new score is appended as one fixed size line to the log, which
+        costs the same however many games were played. The best `top_k`
+        scores are kept in a heap. Once the log holds `compact_after`
+        records it is renamed to a numbered segment and a background
+        thread merges the segment into the snapshot, which holds all
+        records sorted by score (best first).
+
+        The snapshot starts with a header line with the number of records
+        and the last segment it contains, so segments which were left
+        behind by an interrupted compaction are not counted twice.
+
+        A rank index over all scores answers the place of a score. It is
+        saved next to the snapshot by every compaction, so only the records
+        which are not merged yet are added to it at startup.
+
+        Several game instances can share the directory. Appending holds a
+        shared lock on leaderboard.lock and renaming the log or replacing
+        the snapshot an exclusive one, so no record is appended to a log
+        which is merged already. Compactions exclude each other with
+        leaderboard.compact.lock. Scores which are added at the same time
+        are written with one write and fsync (group commit).
+
+        :param directory: directory of the files
+        :param top_k: number of scores kept in memory
+        :param compact_after: appended records which trigger a compaction
+        """
+        self.directory = pathlib.Path(directory)
+        self.log_path = self.directory / "leaderboard.log"
+        self.snapshot_path = self.directory / "leaderboard.snapshot"
+        self.legacy_path = self.directory / "leaderboard.json"
+        self.index_path = self.directory / "leaderboard.rank"
+        self.lock_path = self.directory / "leaderboard.lock"
+        self.compact_lock_path = self.directory / "leaderboard.compact.lock"
+
+        self.top_k = top_k
+        self.compact_after = compact_after
+        self.log = GroupCommit(self.log_path, self.lock_path)
+
+        # guards the state in memory and is never held while waiting for 
+        # the disk; the commit lock of the log and the lock files are
+        # taken before it
+        self.lock = threading.Lock()
+        self.compaction: Optional[threading.Thread] = None
+
+        # scores added by this instance with their tickets, which are
+        # added again to a state that was read before they were written
+        self.recent: List[Tuple[int, LeaderboardItem]] = []
+
+        self.load()
+
+
+    def _segments(self) -> List[Tuple[int, pathlib.Path]]:
+        """ Returns the numbered log segments which wait for compaction """
+        segments = []
+        for path in self.directory.glob("leaderboard.log.*"):
+            suffix = path.name.rsplit(".", 1)[1]
+            if suffix.isdigit():
+                segments.append((int(suffix), path))
+
+        return sorted(segments)
+
+
+    def read_header(self) -> Tuple[int, int]:
+        """ Returns the number of records and the last merged segment of the snapshot """
+        try:
+            with open(self.snapshot_path, "rb") as source:
+                header = source.read(record_size)
+        except FileNotFoundError:
+            return 0, 0
+
+        _, count, segment = header.split()
+        return int(count), int(segment)
+
+
+    def load(self) -> None:
+        """ Reads the best scores from the snapshot and the pending logs """
+        if self.legacy_path.exists():
+            with FileLock(self.compact_lock_path):
+                self.migrate()
+
+        with FileLock(self.lock_path, shared=True), self.lock:
+            self._load()
+
+
+    def _load(self) -> None:
+        """ Reads the state (the caller holds the lock and the lock file) """
+        self.count, self.segment = self.read_header()
+        self.heap: List[Tuple[int, int, LeaderboardItem]] = []
+
+        # records of the segments and the log in the order they were added
+        self.pending: List[LeaderboardItem] = []
+
+        self.index = RankIndex.load(self.index_path, self.segment)
+        if self.index is None:
+            # missing or older than the snapshot: rebuilt once
+            self.index = RankIndex()
+            self.index.add_all(item["score"] for item in self._stream_snapshot())
+            self.index.save(self.index_path, self.segment)
+
+        # the snapshot is sorted, so only its first records are needed;
+        # equal scores keep the order of the file (newer ones first)
+        for rank, item in enumerate(self.snapshot_records(0, self.top_k)):
+            self._push(item, -rank)
+
+        self.sequence = 0
+        for number, path in self._segments():
+            if number <= self.segment:
+                path.unlink(missing_ok=True)
+                continue
+
+            for item in _records(path.read_bytes()):
+                self._add_loaded(item)
+
+        self.log_records = 0
+        if self.log_path.exists():
+            for item in _records(self.log_path.read_bytes()):
+                self._add_loaded(item)
+                self.log_records += 1
+
+
+    def _add_loaded(self, item: LeaderboardItem) -> None:
+        self.count += 1
+        self.sequence += 1
+        self._push(item, self.sequence)
+
+        self.pending.append(item)
+        self.index.add(item["score"])
+
+
+    def _push(self, item: LeaderboardItem, sequence: int) -> None:
+        """ Adds the item to the top-k heap (newer wins on equal scores) """
+        entry = (item["score"], sequence, item)
+        if len(self.heap) < self.top_k:
+            heapq.heappush(self.heap, entry)
+        elif entry[:2] > self.heap[0][:2]:
+            heapq.heapreplace(self.heap, entry)
+
+
+    def migrate(self) -> None:
+        """ Turns an old leaderboard.json into the snapshot (once) """
+        if not self.legacy_path.exists() or self.snapshot_path.exists():
+            return
+
+        try:
+            with open(self.legacy_path, "r") as source:
+                items = json.load(source)
+        except ValueError:
+            items = []
+
+        # the json file is sorted already (best first)
+        items = sorted(items, key=lambda item: item["score"], reverse=True)
+
+        index = RankIndex()
+        os.replace(self._write_snapshot(iter(items), len(items), 0, index), self.snapshot_path)
+        index.save(self.index_path, 0)
+
+        self.legacy_path.rename(self.legacy_path.with_suffix(".json.migrated"))
+
+
+    def add(self, item: LeaderboardItem, commit: bool = True) -> int:
+        """ Appends a score to the log and updates the best scores 
+
+        :param item: new score
+        :param commit: return once the score is on the disk, otherwise
+            it is written by a later call of commit
+        :returns ticket of the record in the log
+        """
+        # only memory is changed here, a running compaction does not
+        # hold the lock while it writes
+        with self.lock:
+            ticket = self.log.add(format_record(item))
+            self.log_records += 1
+            self._add_loaded(item)
+            self.recent.append((ticket, item))
+
+        if commit:
+            self.commit(ticket)
+
+        return ticket
+
+
+    def commit(self, ticket: Optional[int] = None) -> None:
+        """ Writes the added scores to the log and starts a compaction
+        when the log is long enough
+
+        :param ticket: score which has to be written (default: all)
+        """
+        # a single write to a file opened for appending is not
+        # interleaved with the writes of other instances
+        self.log.commit(self.log.added if ticket is None else ticket)
+
+        with self.lock:
+            start_compaction = self.log_records >= self.compact_after and self.compaction is None
+            if start_compaction:
+                self.compaction = threading.Thread(target=self.compact, daemon=True)
+
+        if start_compaction:
+            self.compaction.start()
+
+
+    def top(self, count: Optional[int] = None) -> List[LeaderboardItem]:
+        """ Returns the best scores (best first) """
+        entries = sorted(self.heap, key=lambda entry: entry[:2], reverse=True)
+        return [item for _, _, item in entries[:count]]
+
+
+    def __len__(self) -> int:
+        """ Returns the number of recorded scores """
+        return self.count
+
+
+    def rank(self, score: int) -> int:
+        """ Returns the place of a score among all recorded scores (1 is the best) """
+        return self.index.rank(score)
+
+
+    def percentile(self, score: int) -> float:
+        """ Returns the percentage of the recorded scores which are lower """
+        return self.index.percentile(score)
+
+
+    def page(self, start: int, count: int) -> List[LeaderboardItem]:
+        """ Returns the records by their place among all scores (0 is the best)
+
+        The snapshot is sorted already and the records which are not
+        merged yet are few, so the position where the page starts is found
+        by a binary search over how many of the first `start` records come
+        from the pending ones (each step reads one snapshot record).
+
+        :param start: place of the first record
+        :param count: number of records
+        """
+        # the snapshot and the records in memory are replaced together
+        with FileLock(self.lock_path, shared=True), self.lock:
+            # newer records first on equal scores, like in the snapshot
+            pending = sorted(reversed(self.pending), key=lambda item: item["score"], reverse=True)
+
+            try:
+                source = open(self.snapshot_path, "rb")
+            except FileNotFoundError:
+                return pending[start:start + count]
+
+            with source:
+                snapshot_count = int(source.read(record_size).split()[1])
+
+                def read(position: int, number: int = 1) -> List[LeaderboardItem]:
+                    source.seek(record_size * (position + 1))
+                    return list(_records(source.read(record_size * number)))
+
+                # a pending record comes first on equal scores
+                low, high = max(0, start - snapshot_count), min(start, len(pending))
+                while low < high:
+                    taken = (low + high) // 2
+                    position = start - taken
+                    if position > 0 and pending[taken]["score"] >= read(position - 1)[0]["score"]:
+                        low = taken + 1
+                    else:
+                        high = taken
+
+                position = start - low
+                return list(heapq.merge(
+                    pending[low:low + count], read(position, count), key=lambda item: item["score"], reverse=True
+                ))[:count]
+
+
+    def snapshot_records(self, start: int, count: int) -> List[LeaderboardItem]:
+        """ Reads records of the snapshot by their position (0 is the best score) """
+        try:
+            with open(self.snapshot_path, "rb") as source:
+                source.seek(record_size * (start + 1))
+                return list(_records(source.read(record_size * count)))
+        except FileNotFoundError:
+            return []
+
+
+    def compact(self) -> None:
+        """ Merges the log into the snapshot
+
+        The log is renamed to the next segment first, so new scores are
+        appended to a new log while the merge runs. Afterwards the state
+        is read again, which includes the scores of other instances.
+
+        The state in memory is only locked to swap in the state which was
+        read, so adding a score never waits for the disk.
+        """
+        try:
+            with FileLock(self.compact_lock_path):
+                rotated = None
+                with self.log.commit_lock, FileLock(self.lock_path):
+                    self.log.write()
+
+                    # another instance may have merged segments meanwhile
+                    count, segment = self.read_header()
+                    number = max([segment] + [number for number, _ in self._segments()])
+                    if self.log_path.exists():
+                        number += 1
+                        self.log_path.rename(self.directory / f"leaderboard.log.{number}")
+                        rotated = self.log.committed
+
+                if rotated is not None:
+                    # the scores added since the rotation are in the new log
+                    with self.lock:
+                        self.log_records = self.log.added - rotated
+
+                # the new segment and the ones an interrupted compaction left
+                segments = [(n, path) for n, path in self._segments() if segment < n <= number]
+                if not segments:
+                    return
+
+                new_items: List[LeaderboardItem] = []
+                for _, path in segments:
+                    new_items.extend(_records(path.read_bytes()))
+
+                # newer records first on equal scores, like in the heap
+                new_items = sorted(reversed(new_items), key=lambda item: item["score"], reverse=True)
+
+                merged = heapq.merge(
+                    new_items, self._stream_snapshot(), key=lambda item: item["score"], reverse=True
+                )
+                index = RankIndex()
+                temp_path = self._write_snapshot(merged, count + len(new_items), number, index)
+
+                with self.log.commit_lock, FileLock(self.lock_path):
+                    self.log.write()
+                    written = self.log.committed
+
+                    os.replace(temp_path, self.snapshot_path)
+                    index.save(self.index_path, number)
+
+                    for _, path in segments:
+                        path.unlink()
+
+                    # read into a copy, the scores in memory stay usable
+                    state = copy.copy(self)
+                    state._load()
+
+                    with self.lock:
+                        self._swap(state, written)
+        finally:
+            self.compaction = None
+
+
+    def _swap(self, state: "Leaderboard", written: int) -> None:
+        """ Takes over a state which was read from the disk (the caller 
+        holds the lock)
+
+        :param state: copy of the leaderboard which read the files
+        :param written: ticket of the last score which is in the files
+        """
+        for field in ("count", "segment", "heap", "pending", "index", "sequence", "log_records"):
+            setattr(self, field, getattr(state, field))
+
+        # scores which were added while the files were read
+        self.recent = [(ticket, item) for ticket, item in self.recent if ticket > written]
+        for _, item in self.recent:
+            self.log_records += 1
+            self._add_loaded(item)
+
+
+    def _stream_snapshot(self, block: int = 4096) -> Iterator[LeaderboardItem]:
+        """ Reads all records of the snapshot in blocks """
+        try:
+            source = open(self.snapshot_path, "rb")
+        except FileNotFoundError:
+            return
+
+        with source:
+            source.seek(record_size)
+            while True:
+                data = source.read(record_size * block)
+                if not data:
+                    return
+
+                yield from _records(data)
+
+
+    def _write_snapshot(
+        self, 
+        items: Iterator[LeaderboardItem], 
+        count: int, 
+        segment: int, 
+        index: RankIndex) -> pathlib.Path:
+        """ Writes the sorted records to a temporary file
+        
+        :param items: records sorted by score (best first)
+        :param count: number of records
+        :param segment: last segment which is contained
+        :param index: rank index the scores are added to
+        :returns the path of the file, which is renamed to the snapshot by the caller
+        """
+        temp_path = self.snapshot_path.with_suffix(f".{os.getpid()}.tmp")
+
+        with open(temp_path, "wb") as target:
+            target.write(f"SNKL {count:013d} {segment:012d}\n".encode())
+            for item in items:
+                target.write(format_record(item))
+                index.add(item["score"])
+
+            target.flush()
+            os.fsync(target.fileno())
+
+        return temp_path
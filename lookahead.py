@@ -0,0 +1,220 @@
+import os
+import time
+import random
+import signal
+from concurrent.futures import ProcessPoolExecutor, wait
+from typing import Dict, List, Optional
+
+from engine import SnakeEngine, OPPOSITE, EMPTY, FOOD
+
+
+# value of a rollout in which the snake dies directly (scaled by how
+# early within the horizon it dies)
+death_penalty = 10.0
+
+# food which is eaten later is worth less (by this factor per tick)
+discount = 0.95
+
+
+def _rollout_move(engine: SnakeEngine, rng: random.Random, greedy: float) -> Optional[int]:
+    """ Picks the next move of a rollout: a random move that does not end
+    the game directly, with the given probability the one closest to food
+    """
+    head = engine.head_pos[0] * engine.max_x + engine.head_pos[1]
+    offsets = (1, -1, -engine.max_x, engine.max_x)
+    reverse = OPPOSITE[engine.direction]
+
+    moves = [
+        direction for direction in range(4)
+        if direction != reverse and engine.grid[head + offsets[direction]] in (EMPTY, FOOD)
+    ]
+    if not moves:
+        return None
+
+    if engine.food and rng.random() < greedy:
+        head_y, head_x = engine.head_pos
+        target_y, target_x = min(engine.food, key=lambda cell: abs(cell[0] - head_y) + abs(cell[1] - head_x))
+
+        def distance(direction: int) -> int:
+            y, x = divmod(head + offsets[direction], engine.max_x)
+            return abs(target_y - y) + abs(target_x - x)
+
+        return min(moves, key=distance)
+
+    return rng.choice(moves)
+
+
+def rollout(engine: SnakeEngine, move: int, horizon: int, rng: random.Random, greedy: float = 0.5) -> float:
+    """ Plays one random continuation of the game after the given move
+
+    :param engine: game to simulate (it is changed)
+    :param move: first direction
+    :param horizon: maximal number of simulated ticks
+    :param rng: random generator of the continuation
+    :param greedy: fraction of the moves which head for the food
+    :returns discounted eaten food minus a penalty if the snake died 
+        within the horizon
+    """
+    value = 0.0
+    weight = 1.0
+    direction: Optional[int] = move
+
+    for tick in range(horizon):
+        result = engine.step(direction)
+
+        if not result["alive"]:
+            return value - death_penalty * (1 - tick / horizon)
+
+        if result["ate"]:
+            value += weight
+
+        if result["won"]:
+            break
+
+        weight *= discount
+        direction = _rollout_move(engine, rng, greedy)
+
+    return value
+
+
+def run_rollouts(snapshot: dict, moves: List[int], budget: float, horizon: int, seed: int, greedy: float = 0.5) -> dict:
+    """ Runs rollouts for the moves in turn until the time budget is used up
+
+    Runs within a worker process of the pool.
+
+    :param snapshot: state of the game (see SnakeEngine.snapshot)
+    :param moves: directions to evaluate
+    :param budget: seconds after which no new rollout is started
+    :param horizon: maximal number of simulated ticks per rollout
+    :param seed: seed of the random generator
+    :param greedy: fraction of the moves which head for the food
+    :returns dict with the number of rollouts and the summed values per move
+    """
+    deadline = time.perf_counter() + budget
+    rng = random.Random(seed)
+    root = SnakeEngine.restore(snapshot, rng)
+
+    counts = [0] * len(moves)
+    totals = [0.0] * len(moves)
+
+    turn = 0
+    while time.perf_counter() < deadline:
+        slot = turn % len(moves)
+        totals[slot] += rollout(root.copy(), moves[slot], horizon, rng, greedy)
+        counts[slot] += 1
+        turn += 1
+
+    return {"moves": moves, "counts": counts, "totals": totals}
+
+
+def _reset_signals() -> None:
+    """ Restores the default signal handling in a worker process
+
+    The workers are forked from the game, whose event loop handles
+    ctrl-z and the continuation (and writes the signals into its wakeup
+    fd). Without the reset a worker would run these handlers for the game
+    instead of being stopped and continued itself.
+    """
+    for name in ("SIGTSTP", "SIGCONT", "SIGINT"):
+        if hasattr(signal, name):
+            signal.signal(getattr(signal, name), signal.SIG_DFL)
+
+    signal.set_wakeup_fd(-1)
+
+
+class RolloutPool:
+    def __init__(self, workers: Optional[int] = None) -> None:
+        """ Worker processes for rollouts which stay alive between ticks
+
+        The processes are started once (and warmed up) so a decision only
+        pays for sending the snapshot. With zero workers the rollouts run
+        within the calling process.
+
+        :param workers: number of processes (default: cpu count)
+        """
+        self.workers = (os.cpu_count() or 1) if workers is None else workers
+        self.executor: Optional[ProcessPoolExecutor] = None
+
+        # seconds a round trip to the workers takes on top of the rollouts
+        self.overhead = 0.0
+
+        if self.workers:
+            self.executor = ProcessPoolExecutor(max_workers=self.workers, initializer=_reset_signals)
+
+            # start every process before the first tick, then measure
+            # the round trip to the running processes
+            wait([self.executor.submit(os.getpid) for _ in range(self.workers)])
+
+            start = time.perf_counter()
+            wait([self.executor.submit(os.getpid) for _ in range(self.workers)])
+            self.overhead = time.perf_counter() - start
+
+
+    def evaluate(
+        self,
+        snapshot: dict,
+        moves: List[int],
+        deadline: float,
+        horizon: int,
+        seed: int,
+        greedy: float = 0.5) -> Dict[int, List[float]]:
+        """ Spreads rollouts of the moves over all workers
+
+        Results which are not back at the deadline are dropped, so the
+        call returns in time even if a worker is late.
+
+        :param snapshot: state of the game (see SnakeEngine.snapshot)
+        :param moves: directions to evaluate
+        :param deadline: time.perf_counter() value by which to return
+        :param horizon: maximal number of simulated ticks per rollout
+        :param seed: seed of this evaluation
+        :param greedy: fraction of the moves which head for the food
+        :returns [rollouts, summed value] per move
+        """
+        stats = {move: [0, 0.0] for move in moves}
+        start = time.perf_counter()
+
+        # keep the time to send the state and collect the results
+        budget = (deadline - start) * 0.95 - self.overhead
+        if budget <= 0:
+            return stats
+
+        if self.executor is None:
+            results = [run_rollouts(snapshot, moves, budget, horizon, seed, greedy)]
+        else:
+            futures = [
+                self.executor.submit(run_rollouts, snapshot, moves, budget, horizon, seed * self.workers + worker, greedy)
+                for worker in range(self.workers)
+            ]
+            done, _ = wait(futures, timeout=max(deadline - time.perf_counter(), 0))
+            results = [future.result() for future in done]
+
+            # moving average of the round trip (late calls count as well)
+            overhead = time.perf_counter() - start - budget
+            self.overhead += 0.2 * (overhead - self.overhead)
+
+        for result in results:
+            for move, count, total in zip(result["moves"], result["counts"], result["totals"]):
+                stats[move][0] += count
+                stats[move][1] += total
+
+        return stats
+
+
+    def close(self) -> None:
+        """ Stops the worker processes """
+        if self.executor is not None:
+            self.executor.shutdown(cancel_futures=True)
+            self.executor = None
+
+
+# pools which are shared by the policies of this process
+_pools: Dict[Optional[int], RolloutPool] = {}
+
+
+def rollout_pool(workers: Optional[int] = None) -> RolloutPool:
+    """ Returns the (warm) pool of this process with the given number of workers """
+    if workers not in _pools:
+        _pools[workers] = RolloutPool(workers)
+
+    return _pools[workers]
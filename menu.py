@@ -1,26 +1,29 @@
 import curses
 
-from typing import List, Tuple
+from typing import Dict, List, Optional, Tuple
 
 import common
 
 from config import Defaults
 from config import GameSettings
-from config import Modes 
 from config import Keys 
-from config import default_settings
+from runtime import Runtime
+from widgets import MenuView
 
 class Menu:
-    def __init__(self, screen, _window) -> None:
+    def __init__(self, screen, _window, runtime: Optional[Runtime] = None, view: Optional[MenuView] = None) -> None:
         """ Constructor for the 
         
         param: screen (_CursesWindow): The screen instance of curses
         param: _window: Information on which winodw is active (e.g. GAME or MENU)
+        param: runtime: event loop of the session which reads the keys
+        param: view: rows which are on the screen (shared by the menus)
         """
 
         self.screen = screen
-        self.screen.nodelay(Modes.MENU.value)
         self.window_state = _window
+        self.runtime = runtime
+        self.view = view if view is not None else MenuView(screen)
 
         # create a state value to track which menu item is selected
         self.menu_state = {"active_menu": "MAIN"}
@@ -38,7 +41,8 @@ class Menu:
     def draw_menu(self, menu_options: Tuple[str], graphics: Tuple[int]) -> None:
         """ Generic function that plots the given menu opitons
         according to the given graphics. (Graphics handles how
-        the items are drawn)
+        the items are drawn) Only the rows which changed since
+        the last call are drawn again
 
         :param menu_options: Items to be displayed
         :param graphics: How the items are displayed (e.g attributes such as color)
@@ -47,20 +51,17 @@ class Menu:
         # check if the two objects are same length
         assert len(menu_options) == len(graphics), f"Menu args have to match in size \n {len(menu_options)} : {len(graphics)}"
 
-        max_y, max_x = self.screen.getmaxyx()
-        offset = len(menu_options) // 2 * (-1)
+        self.view.show(menu_options, graphics)
 
-        for opt_str, attr in zip(menu_options, graphics):
-            self.screen.addstr( 
-                max_y //2 + offset,
-                max_x //2 - len(opt_str)//2,
-                opt_str,
-                attr # color attribute
-            )
 
-            offset += 1
-        
-        self.screen.refresh()
+    def highlight(self, previous: int, active: int) -> None:
+        """ Moves the highlight from the previous to the active option
+
+        :param previous: option which was selected
+        :param active: option which is selected now
+        """
+        self.graphics[previous] = 0
+        self.graphics[active] = curses.A_REVERSE
 
 
     def handle_menu_actions(self, active_opt: int, action: int, graphics: List[int]) -> None:
@@ -88,22 +89,25 @@ class Menu:
         self.state["active_menu"] = value
 
     
-    def __call__(self) -> None:
+    async def __call__(self) -> None:
         
-        main_menu = MainMenu(self.screen, self.menu_state, self.window_state)
-        settings_menu = SettingsMenu(self.screen, self.menu_state, self.window_state)
-        leaderboard_menu = ScoresMenu(self.screen, self.menu_state, self.window_state)
+        # the game drew on the screen meanwhile
+        self.view.invalidate()
+
+        main_menu = MainMenu(self.screen, self.menu_state, self.window_state, self.runtime, self.view)
+        settings_menu = SettingsMenu(self.screen, self.menu_state, self.window_state, self.runtime, self.view)
+        leaderboard_menu = ScoresMenu(self.screen, self.menu_state, self.window_state, self.runtime, self.view)
 
         while True:
             if self.menu_state["active_menu"] == "MAIN":
                 # self.graphics[self.active_option] = curses.A_REVERSE
-                main_menu()
+                await main_menu()
                 
             elif self.menu_state["active_menu"] == "SETTINGS":
-                settings_menu()
+                await settings_menu()
 
             elif self.menu_state["active_menu"] == "SCORES":
-                leaderboard_menu()
+                await leaderboard_menu()
 
             elif self.menu_state["active_menu"] == "GAME":
                 self.update_window("GAME")
@@ -128,15 +132,17 @@ class Menu:
 class MainMenu(Menu):
     options = ("Play", "Settings", "Scores", "Exit")
     
-    def __init__(self, screen, _state: dict, _window: dict) -> None:
+    def __init__(self, screen, _state: dict, _window: dict, runtime: Optional[Runtime] = None, view: Optional[MenuView] = None) -> None:
         """ Initalize class variables
         
         :param screen (_CursesScreen): cureses screen instance
         :param _state: which game subwindow is active
         :param _window: which main window is active (currently: GAME)
         :param _status: information about score
+        :param runtime: event loop of the session which reads the keys
+        :param view: rows which are on the screen (shared by the menus)
         """
-        super().__init__(screen, _window)
+        super().__init__(screen, _window, runtime, view)
 
         self.state = _state 
         self.active_option = 0
@@ -159,76 +165,71 @@ class MainMenu(Menu):
 
             elif active_option == 1:
                 self.update_state("SETTINGS")
-                self.screen.clear()
 
             elif active_option == 2:
                 self.update_state("SCORES")
-                self.screen.clear()
 
             elif active_option == 3:
                 self.update_state("QUIT")
-                self.screen.clear()
 
 
-    def __call__(self) -> None:
+    async def __call__(self) -> None:
         # Main loop for the main Menu        
-        self.screen.clear()
-        
-        # set variables for drawing
-        self.graphics = [0, 0, 0, 0]
-        self.graphics[self.active_option] = curses.A_REVERSE
+        # (only the rows which changed are drawn again)
         self.draw_menu(self.options, self.graphics)
         
         # handle key inputs
-        action = self.screen.getch()
+        action = await self.runtime.getch()
+        previous = self.active_option
         self.active_option = self.handle_menu_actions(self.active_option, action, self.graphics)
+        self.highlight(previous, self.active_option)
         self.handle_submit(self.active_option, action)
 
-        self.screen.clear()
-
 
 
 class SettingsMenu(Menu):
-    def __init__(self, screen, _state: dict, _window: dict) -> None:
+    def __init__(self, screen, _state: dict, _window: dict, runtime: Optional[Runtime] = None, view: Optional[MenuView] = None) -> None:
         """ Initalize class variables
         
         :param screen (_CursesScreen): cureses screen instance
         :param _state: which game subwindow is active
         :param _window: which main window is active (currently: GAME)
         :param _status: information about score
+        :param runtime: event loop of the session which reads the keys
+        :param view: rows which are on the screen (shared by the menus)
         """
-        super().__init__(screen, _window)
+        super().__init__(screen, _window, runtime, view)
         
         self.state = _state
         self.active_option = 0
 
         self.graphics = [0,0,0,0,0,0]
         self.graphics[self.active_option] = curses.A_REVERSE
+
+        # values of the settings the option strings were created from
+        self.rendered_values: Optional[tuple] = None
         self.load_settings()
     
 
     def load_settings(self) -> None:
         """ Simple function that loads the preset settings
-        from a json called settings. If non exists creates one 
-        with values from the config file
+        (the defaults if there is no settings file)
         """
 
-        data: dict = {}
-        data = common.load_settings()
-
-        if not data:
-            common.write_settings(default_settings)
-            data = default_settings
-
-        self.settings: GameSettings = data
+        self.settings: GameSettings = common.load_settings()
 
             
     def create_options(self) -> None:
         """ Given the settings (dict) creates string representations
-        for each of the items
+        for each of the items (only again once a value changed)
         """
 
-        option_list = (
+        values = tuple(self.settings.values())
+        if values == self.rendered_values:
+            return self.options
+
+        self.rendered_values = values
+        self.options = (
             f"Inital snake length: \t\t{self.settings['init_length']}", 
             f"Growth size: \t\t{self.settings['growth_size']}", 
             f"Speed: \t\t\t{self.settings['speed']}", 
@@ -237,7 +238,7 @@ class SettingsMenu(Menu):
             "Back"
         )
 
-        return option_list
+        return self.options
         
 
     def handle_settings(self, action) -> None: 
@@ -290,7 +291,8 @@ class SettingsMenu(Menu):
         else: 
             return
 
-        # write the new settings 
+        # the new settings are written once the keys rest or the
+        # menu is left
         common.write_settings(self.settings)
 
 
@@ -305,61 +307,114 @@ class SettingsMenu(Menu):
 
         if action == Keys.ENTER.value:
             if self.active_option == len(self.graphics) -1:
+                common.get_settings().flush()
                 self.update_state("MAIN")
-                self.screen.clear()
 
-    def __call__(self) -> None:
+    async def __call__(self) -> None:
 
         # Main loop for the main Menu        
-        self.graphics = [0,0,0,0,0,0]
-        self.graphics[self.active_option] = curses.A_REVERSE
-        
         _options = self.create_options()
         self.draw_menu(_options, self.graphics)
 
         # get user inputs and handle them
-        action = self.screen.getch()
+        action = await self.runtime.getch()
+        previous = self.active_option
         self.active_option = self.handle_menu_actions(
             self.active_option, action, self.graphics
         )
+        self.highlight(previous, self.active_option)
         
         self.handle_settings(action)
         self.handle_submit(action)
 
-        self.screen.clear()
-
 
 class ScoresMenu(Menu):
+    # scores per page (less if the terminal is smaller)
+    page_size = 10
     
-    def __init__(self, screen, _state: dict, _window: dict):
+    def __init__(self, screen, _state: dict, _window: dict, runtime: Optional[Runtime] = None, view: Optional[MenuView] = None):
         """ Initalize class variables
         
         :param screen (_CursesScreen): cureses screen instance
         :param _state: which game subwindow is active
         :param _window: which main window is active (currently: GAME)
         :param _status: information about score
+        :param runtime: event loop of the session which reads the keys
+        :param view: rows which are on the screen (shared by the menus)
         """
-        super().__init__(screen, _window)
+        super().__init__(screen, _window, runtime, view)
 
         self.state = _state
+        self.page = 0
+        self.pages = 1
+
+        # rendered rows of the pages by page and page size, made from
+        # `rendered_count` scores (scores are only added, so the number
+        # tells if the leaderboard changed)
+        self.rendered: Dict[Tuple[int, int], List[str]] = {}
+        self.rendered_count = -1
 
     def load_leaderboard(self):
-        """ Loads the leaderboard from its file"""
+        """ Loads the current page of the leaderboard
 
-        # reduce the leaderboard to top 5
-        leaderboard_items = common.read_leaderboard()
-        if len(leaderboard_items) > 5:
-            leaderboard_items = leaderboard_items[:5] 
+        The whole history can be paged through, a page is read by the 
+        place of its first score so its cost does not depend on the page.
+        The rows of a page are reused until the leaderboard changes
+        """
+        leaderboard = common.get_leaderboard()
+        if len(leaderboard) != self.rendered_count:
+            self.rendered.clear()
+            self.rendered_count = len(leaderboard)
+
+        # leave room for the page line, the Back button and the border
+        max_y, _ = self.screen.getmaxyx()
+        page_size = max(1, min(self.page_size, max_y - 6))
+
+        pages = max(1, -(-len(leaderboard) // page_size))
+        self.page = max(0, min(self.page, pages - 1))
+        self.pages = pages
+
+        key = (self.page, page_size)
+        if key in self.rendered:
+            self.options = self.rendered[key]
+            return
+
+        start = self.page * page_size
+        leaderboard_items = leaderboard.page(start, page_size)
 
         # convert leaderboard items to str
         leaderboard_str = [
-            f"{item['time']}: \t\t{item['score']}" for item in leaderboard_items
+            f"#{start + idx + 1} {item['time']}: \t\t{item['score']}" 
+            for idx, item in enumerate(leaderboard_items)
         ]
 
-        # add Back button
-        self.options = leaderboard_str if leaderboard_str else []
+        # add page line and Back button
+        self.options = leaderboard_str
+        if pages > 1:
+            self.options.append(f"< Page {self.page + 1}/{pages} >")
         self.options.append("Back")
 
+        self.rendered[key] = self.options
+
+
+    def handle_page(self, action) -> bool:
+        """ Handles the keys which change the page
+
+        :param action: ascii value of pressed input key
+        :returns if the page changed
+        """
+        page = self.page
+
+        if action in (curses.KEY_LEFT, curses.KEY_PPAGE):
+            self.page -= 1
+        elif action in (curses.KEY_RIGHT, curses.KEY_NPAGE):
+            self.page += 1
+        elif action == curses.KEY_HOME:
+            self.page = 0
+
+        self.page = max(0, min(self.page, self.pages - 1))
+        return self.page != page
+
 
     def handle_submit(self, action) -> None:
         """ Handles a enter key press 
@@ -373,14 +428,13 @@ class ScoresMenu(Menu):
 
         if action == Keys.ENTER.value:
             self.update_state("MAIN")
-            self.screen.clear()
             return True
 
         return False
 
 
-    def __call__(self) -> None:
-        """ Main loop for the leaderboard window"""
+    def draw_page(self) -> None:
+        """ Loads and draws the current page """
 
         # load leaderboard and set up drawing variable
         self.load_leaderboard()
@@ -389,12 +443,21 @@ class ScoresMenu(Menu):
 
         # draw leaderboard
         self.draw_menu(self.options, self.graphics)
+
+
+    async def __call__(self) -> None:
+        """ Main loop for the leaderboard window"""
+
+        self.page = 0
+        self.draw_page()
         
         # listen for the keys
         while True:
-            action = self.screen.getch()
+            action = await self.runtime.getch()
             if self.handle_submit(action):
                 break
-        
-        self.screen.clear()
+
+            # a new size may change the number of scores per page
+            if self.handle_page(action) or action == curses.KEY_RESIZE:
+                self.draw_page()
         
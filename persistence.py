@@ -0,0 +1,178 @@
+import time
+import queue
+import logging
+import threading
+from typing import Callable, Dict, Hashable, List, Optional, Set, Tuple
+
+
+logger = logging.getLogger(__name__)
+
+
+# writes which can wait in the queue before submitting blocks
+queue_limit = 256
+
+
+class WriteError(Exception):
+    def __init__(self, failures: List[Tuple[str, BaseException]]) -> None:
+        """ Writes of the worker which failed (raised by flush)
+
+        :param failures: name of the write (its key) and its exception
+        """
+        self.failures = failures
+        names = ", ".join(sorted({name for name, _ in failures}))
+        super().__init__(f"{len(failures)} write(s) failed: {names} ({failures[-1][1]})")
+
+
+
+class PersistenceWorker:
+    def __init__(self, limit: int = queue_limit) -> None:
+        """ Thread which does the writes of the game in the background
+
+        A write is a function which is run on the worker thread. Writes
+        with a key (e.g. the path of the file) are coalesced: a write
+        which is submitted while an older one with the same key is still
+        waiting replaces it, since only the newest content matters.
+        Writes without a key are all run in order.
+
+        The queue is bounded, so a disk which can not keep up slows the
+        submitting thread down instead of growing the memory.
+
+        A failed write does not stop the following ones. It is logged (with
+        the traceback the first time for each key) and raised as WriteError
+        by the next flush, so scores and settings are not lost silently.
+
+        :param limit: maximal number of waiting writes
+        """
+        self.queue: "queue.Queue[Optional[Hashable]]" = queue.Queue(maxsize=limit)
+
+        # newest write of each key which waits in the queue
+        self.latest: Dict[Hashable, Callable[[], None]] = {}
+        self.lock = threading.Lock()
+
+        # metrics: finished and coalesced writes, failed writes, the
+        # seconds of the last and of the slowest write and their sum
+        self.written = 0
+        self.coalesced = 0
+        self.failed = 0
+        self.last_latency = 0.0
+        self.max_latency = 0.0
+        self.total_latency = 0.0
+
+        # failures which were not raised by flush yet and the keys whose
+        # failure was logged with its traceback
+        self.failures: List[Tuple[str, BaseException]] = []
+        self.logged: Set[str] = set()
+
+        self.thread = threading.Thread(target=self._run, name="persistence", daemon=True)
+        self.thread.start()
+
+
+    def submit(self, write: Callable[[], None], key: Optional[Hashable] = None) -> None:
+        """ Queues a write
+
+        :param write: function which does the write
+        :param key: writes with the same key replace each other
+        """
+        with self.lock:
+            if key is not None and key in self.latest:
+                self.latest[key] = write
+                self.coalesced += 1
+                return
+
+            # writes without a key get a key of their own
+            if key is None:
+                key = object()
+            self.latest[key] = write
+
+        self.queue.put(key)
+
+
+    def _run(self) -> None:
+        while True:
+            key = self.queue.get()
+
+            try:
+                if key is None:
+                    return
+
+                with self.lock:
+                    write = self.latest.pop(key)
+
+                start = time.perf_counter()
+                try:
+                    write()
+                except Exception as error:
+                    # a failed write must not stop the following ones
+                    self._failed(key, write, error)
+
+                latency = time.perf_counter() - start
+                self.written += 1
+                self.last_latency = latency
+                self.max_latency = max(self.max_latency, latency)
+                self.total_latency += latency
+            finally:
+                self.queue.task_done()
+
+
+    def _failed(self, key: Hashable, write: Callable[[], None], error: Exception) -> None:
+        """ Logs a failed write and keeps it for the next flush """
+        # writes without a key are named by their function (e.g. save_replay)
+        name = key if isinstance(key, str) else getattr(write, "__qualname__", repr(write))
+        name = name.replace(".<locals>.<lambda>", "")
+
+        if name in self.logged:
+            logger.error("write %s failed again: %s", name, error)
+        else:
+            logger.error("write %s failed", name, exc_info=error)
+            self.logged.add(name)
+
+        with self.lock:
+            self.failed += 1
+            self.failures.append((name, error))
+
+
+    @property
+    def depth(self) -> int:
+        """ Number of writes which wait in the queue """
+        return self.queue.qsize()
+
+
+    @property
+    def mean_latency(self) -> float:
+        """ Mean seconds of a write """
+        return self.total_latency / self.written if self.written else 0.0
+
+
+    def stats(self) -> dict:
+        """ Returns the metrics of the worker """
+        return {
+            "depth": self.depth,
+            "written": self.written,
+            "coalesced": self.coalesced,
+            "failed": self.failed,
+            "last_latency": self.last_latency,
+            "mean_latency": self.mean_latency,
+            "max_latency": self.max_latency,
+        }
+
+
+    def flush(self) -> None:
+        """ Returns once all queued writes are done
+
+        :raises WriteError: if writes failed since the last flush
+        """
+        if self.thread.is_alive():
+            self.queue.join()
+
+        with self.lock:
+            failures, self.failures = self.failures, []
+
+        if failures:
+            raise WriteError(failures)
+
+
+    def close(self) -> None:
+        """ Does the queued writes and stops the thread """
+        if self.thread.is_alive():
+            self.queue.put(None)
+            self.thread.join()
@@ -0,0 +1,154 @@
+import struct
+import pathlib
+from array import array
+from typing import Iterable, Optional
+
+from storage import atomic_write
+
+
+# header of the index file: magic, segment of the snapshot it belongs
+# to and the number of buckets
+header = struct.Struct("<4sqq")
+magic = b"SNKI"
+
+
+class RankIndex:
+    def __init__(self, size: int = 1024) -> None:
+        """ Order statistics over the scores (Fenwick tree with one bucket per score)
+
+        Inserting a score, the rank of a score and the k-th best score
+        take O(log m) for m buckets, independent of the number of games.
+        The tree grows (doubles) when a larger score is inserted.
+
+        :param size: initial number of buckets (rounded up to a power of two)
+        """
+        self.size = 1
+        while self.size < size:
+            self.size *= 2
+
+        self.counts = array("q", [0]) * self.size
+        self.tree = array("q", [0]) * (self.size + 1)
+        self.total = 0
+
+
+    def _build(self) -> None:
+        """ Builds the tree from the bucket counts in O(m) """
+        self.tree = array("q", [0]) * (self.size + 1)
+        self.total = 0
+
+        for bucket, count in enumerate(self.counts):
+            position = bucket + 1
+            self.tree[position] += count
+            self.total += count
+
+            parent = position + (position & -position)
+            if parent <= self.size:
+                self.tree[parent] += self.tree[position]
+
+
+    def _grow(self, score: int) -> None:
+        size = self.size
+        while size <= score:
+            size *= 2
+
+        self.counts.extend(array("q", [0]) * (size - self.size))
+        self.size = size
+        self._build()
+
+
+    def add(self, score: int, count: int = 1) -> None:
+        """ Inserts a score """
+        if score >= self.size:
+            self._grow(score)
+
+        self.counts[score] += count
+        self.total += count
+
+        position = score + 1
+        while position <= self.size:
+            self.tree[position] += count
+            position += position & -position
+
+
+    def add_all(self, scores: Iterable[int]) -> None:
+        """ Inserts many scores and builds the tree once """
+        for score in scores:
+            if score >= self.size:
+                self._grow(score)
+            self.counts[score] += 1
+
+        self._build()
+
+
+    def at_most(self, score: int) -> int:
+        """ Returns the number of scores which are smaller or equal """
+        position = min(score + 1, self.size)
+        result = 0
+        while position > 0:
+            result += self.tree[position]
+            position -= position & -position
+
+        return result
+
+
+    def rank(self, score: int) -> int:
+        """ Returns the place of a score (1 is the best, equal scores share the place) """
+        return self.total - self.at_most(score) + 1
+
+
+    def percentile(self, score: int) -> float:
+        """ Returns the percentage of the scores which are lower """
+        if not self.total:
+            return 0.0
+
+        return 100 * self.at_most(score - 1) / self.total if score > 0 else 0.0
+
+
+    def kth(self, k: int) -> Optional[int]:
+        """ Returns the k-th best score (k = 1 is the best) """
+        if not 1 <= k <= self.total:
+            return None
+
+        # the k-th best is the (total - k + 1)-th smallest
+        remaining = self.total - k + 1
+        position = 0
+        step = self.size
+        while step:
+            if position + step <= self.size and self.tree[position + step] < remaining:
+                position += step
+                remaining -= self.tree[position]
+            step //= 2
+
+        return position
+
+
+    def save(self, path: pathlib.Path, segment: int) -> None:
+        """ Writes the bucket counts (temporary file and rename)
+
+        :param path: file of the index
+        :param segment: last log segment of the snapshot the index belongs to
+        """
+        atomic_write(path, header.pack(magic, segment, self.size) + self.counts.tobytes())
+
+
+    @classmethod
+    def load(cls, path: pathlib.Path, segment: int) -> Optional["RankIndex"]:
+        """ Reads an index (None if it is missing or belongs to another snapshot) """
+        try:
+            data = path.read_bytes()
+        except FileNotFoundError:
+            return None
+
+        if len(data) < header.size:
+            return None
+
+        file_magic, file_segment, size = header.unpack_from(data)
+        if file_magic != magic or file_segment != segment or len(data) != header.size + 8 * size:
+            return None
+
+        index = cls(size)
+        index.counts = array("q")
+        index.counts.frombytes(data[header.size:])
+        index._build()
+
+        return index
@@ -0,0 +1,260 @@
+import os
+import sys
+import curses
+from typing import Dict, List, Tuple
+
+from config import color_pairs
+
+
+# ANSI numbers of the colors (30 + n: foreground, 40 + n: background)
+ansi_colors = {
+    "BLACK": 0, "RED": 1, "GREEN": 2, "YELLOW": 3, 
+    "BLUE": 4, "MAGENTA": 5, "CYAN": 6, "WHITE": 7,
+}
+
+
+class CursesRenderer:
+    def __init__(self, screen) -> None:
+        """ Renderer which only sends the changed cells to the terminal
+
+        Keeps a shadow copy of what is on the screen, the border and the
+        static text are drawn once per layout and each frame only writes
+        the cells which differ from the shadow. The writes are batched
+        with noutrefresh/doupdate.
+
+        curses decides itself what it sends to the terminal, so this
+        renderer does not count the bytes of a frame. `python benchmark.py
+        render` measures the real output on a pty.
+
+        :param screen (_CursesWindow): The screen instance of curses
+        """
+        self.screen = screen
+        self.max_y, self.max_x = self.screen.getmaxyx()
+
+        self.reset()
+
+
+    def reset(self) -> None:
+        """ Forgets the shadow frame, e.g. after the screen was cleared,
+        such that the next frame draws the layout again
+        """
+        self.shadow: List[Tuple[str, int]] = [(" ", 0)] * (self.max_y * self.max_x)
+        self.dirty: List[int] = []
+
+        self.layout_drawn = False
+        self.score_text = ""
+        self.drawn_score_text = ""
+
+        # cells of the bottom border which show a message
+        self.banner: List[int] = []
+
+
+    def draw_layout(self) -> None:
+        """ Draws the static parts of the frame (the border) """
+        self.screen.border()
+
+        self.layout_drawn = True
+        self.drawn_score_text = ""
+
+
+    def put(self, y: int, x: int, glyph: str, attr: int = 0) -> None:
+        """ Sets the content of a cell for the next frame
+
+        :param y: row of the cell
+        :param x: column of the cell
+        :param glyph: character to draw
+        :param attr: curses attributes of the character
+        """
+        index = y * self.max_x + x
+        if self.shadow[index] == (glyph, attr):
+            return
+
+        self.shadow[index] = (glyph, attr)
+        self.dirty.append(index)
+
+
+    def set_score(self, score: int) -> None:
+        """ Sets the score which is shown in the border """
+        self.score_text = f" Score: {score} "
+
+
+    def set_banner(self, text: str = "") -> None:
+        """ Shows a message in the middle of the bottom border (an empty
+        text restores the border)
+        """
+        row = self.max_y - 1
+        for x in self.banner:
+            self.put(row, x, "\u2500")
+
+        start = max((self.max_x - len(text)) // 2, 1)
+        self.banner = list(range(start, min(start + len(text), self.max_x - 1)))
+        for x, char in zip(self.banner, text):
+            self.put(row, x, char, curses.A_BOLD)
+
+
+    def flush(self) -> None:
+        """ Writes the changed cells and updates the terminal once """
+        if not self.layout_drawn:
+            self.draw_layout()
+
+        # the score is only rewritten when it changed
+        if self.score_text != self.drawn_score_text:
+            self.screen.addstr(0, 1, self.score_text)
+            self.drawn_score_text = self.score_text
+
+        for index in self.dirty:
+            y, x = divmod(index, self.max_x)
+            glyph, attr = self.shadow[index]
+            self.screen.addch(y, x, glyph, attr)
+
+        self.dirty.clear()
+
+        self.screen.move(self.max_y - 1, self.max_x - 1)
+        self.screen.noutrefresh()
+        curses.doupdate()
+
+
+
+class AnsiRenderer(CursesRenderer):
+    def __init__(self, screen, fd: int = None) -> None:
+        """ Renderer which writes raw ANSI escape sequences
+
+        A frame is built within a preallocated buffer, cursor movements 
+        are left out (or shortened) for neighbouring cells and the color
+        is only set when it changes. The whole frame is then sent with
+        a single os.write to the terminal, whose size is counted as the
+        bytes of the frame.
+
+        :param screen (_CursesWindow): The screen instance of curses
+            (only used for the size of the board)
+        :param fd: file descriptor of the terminal (default: stdout)
+        """
+        self.fd = fd if fd is not None else sys.stdout.fileno()
+        self.sgr_cache: Dict[int, bytes] = {}
+
+        # statistics about the written bytes
+        self.frames = 0
+        self.frame_bytes = 0
+        self.total_bytes = 0
+
+        super().__init__(screen)
+
+        # a full redraw of the board fits into the buffer
+        self.buffer = bytearray(self.max_y * self.max_x * 16)
+
+
+    def reset(self) -> None:
+        """ Forgets the shadow frame and the terminal state """
+        super().reset()
+
+        self.pos = 0
+        self.cursor: Tuple[int, int] = (-1, -1)
+        self.attr = -1
+
+
+    def _emit(self, data: bytes) -> None:
+        """ Appends the data to the frame buffer """
+        end = self.pos + len(data)
+        if end > len(self.buffer):
+            self.buffer.extend(bytes(end - len(self.buffer)))
+
+        self.buffer[self.pos:end] = data
+        self.pos = end
+
+
+    def _move(self, y: int, x: int) -> None:
+        """ Moves the cursor with the shortest sequence """
+        cursor_y, cursor_x = self.cursor
+
+        if (y, x) == self.cursor:
+            return
+
+        if y == cursor_y and x > cursor_x:
+            self._emit(b"\x1b[%dC" % (x - cursor_x))
+        else:
+            self._emit(b"\x1b[%d;%dH" % (y + 1, x + 1))
+
+        self.cursor = (y, x)
+
+
+    def _sgr(self, attr: int) -> bytes:
+        """ Returns the SGR sequence of a curses attribute """
+        if attr not in self.sgr_cache:
+            codes = [b"0"]
+            if attr & curses.A_BOLD:
+                codes.append(b"1")
+
+            pair = curses.pair_number(attr)
+            if pair in color_pairs:
+                foreground, background = color_pairs[pair]
+                codes.append(b"%d" % (30 + ansi_colors[foreground]))
+                codes.append(b"%d" % (40 + ansi_colors[background]))
+
+            self.sgr_cache[attr] = b"\x1b[" + b";".join(codes) + b"m"
+
+        return self.sgr_cache[attr]
+
+
+    def _write(self, y: int, x: int, text: str, attr: int = 0) -> None:
+        """ Writes the text at the given position """
+        self._move(y, x)
+
+        if attr != self.attr:
+            self._emit(self._sgr(attr))
+            self.attr = attr
+
+        self._emit(text.encode())
+        self.cursor = (y, x + len(text))
+
+
+    def draw_layout(self) -> None:
+        """ Clears the terminal and draws the border """
+        self._emit(b"\x1b[2J")
+        self.cursor = (-1, -1)
+
+        inner = self.max_x - 2
+        self._write(0, 0, "\u250c" + "\u2500" * inner + "\u2510")
+        for y in range(1, self.max_y - 1):
+            self._write(y, 0, "\u2502")
+            self._write(y, self.max_x - 1, "\u2502")
+
+        # the last cell is left out since writing it scrolls the terminal
+        self._write(self.max_y - 1, 0, "\u2514" + "\u2500" * inner)
+
+        self.layout_drawn = True
+        self.drawn_score_text = ""
+
+
+    def flush(self) -> None:
+        """ Builds the escape sequences of the frame and writes them at once """
+        if not self.layout_drawn:
+            self.draw_layout()
+
+        if self.score_text != self.drawn_score_text:
+            self._write(0, 1, self.score_text)
+            self.drawn_score_text = self.score_text
+
+        # in order of the position such that neighbouring cells form runs
+        for index in sorted(self.dirty):
+            y, x = divmod(index, self.max_x)
+            glyph, attr = self.shadow[index]
+            self._write(y, x, glyph, attr)
+
+        self.dirty.clear()
+        self._move(self.max_y - 1, self.max_x - 1)
+
+        view = memoryview(self.buffer)[:self.pos]
+        while view:
+            written = os.write(self.fd, view)
+            view = view[written:]
+
+        self.frames += 1
+        self.frame_bytes = self.pos
+        self.total_bytes += self.pos
+        self.pos = 0
+
+
+    @property
+    def bytes_per_frame(self) -> float:
+        """ Returns the average number of bytes written per frame """
+        return self.total_bytes / self.frames if self.frames else 0.0
@@ -0,0 +1,415 @@
+import os
+import sys
+import time
+import curses
+import random
+import struct
+import pathlib
+import argparse
+from datetime import datetime
+from typing import Dict, List, Tuple
+
+from config import GameSettings
+from config import TickResult
+from config import color_pairs
+from engine import SnakeEngine
+from renderer import CursesRenderer
+from scheduler import TickScheduler
+
+
+# directory of the recorded games
+replay_dir = pathlib.Path("replays")
+
+# number of replays which are kept in the directory
+replay_limit = 100
+
+# header of a replay file: magic, version, seed, max_y, max_x, the
+# settings, number of ticks and final score (followed by the turns)
+magic = b"SNKR"
+version = 1
+settings_fields = tuple(GameSettings.__annotations__)
+header = struct.Struct(f"<4sBQHH{len(settings_fields)}iIi")
+
+
+def _encode_varint(value: int, target: bytearray) -> None:
+    """ Appends the value with 7 bits per byte (LEB128) """
+    while value >= 0x80:
+        target.append(value & 0x7F | 0x80)
+        value >>= 7
+
+    target.append(value)
+
+
+def _decode_varint(data: bytes, pos: int) -> Tuple[int, int]:
+    """ Reads a LEB128 value
+
+    :returns the value and the position after it
+    """
+    value = 0
+    shift = 0
+    while True:
+        byte = data[pos]
+        pos += 1
+        value |= (byte & 0x7F) << shift
+        shift += 7
+
+        if byte < 0x80:
+            return value, pos
+
+
+class ReplayRecorder:
+    def __init__(self, seed: int, max_y: int, max_x: int, settings: GameSettings) -> None:
+        """ Records what is needed to play a game again
+
+        The engine is created with a random generator of the given seed,
+        so apart from the seed, the board size and the settings only the
+        changes of the direction have to be stored. Most ticks have no
+        turn, every turn is stored as one varint of the ticks since the
+        last turn (run length of the ticks without input) and the direction.
+
+        :param seed: seed of the random generator of the engine
+        :param max_y: number of rows of the board
+        :param max_x: number of columns of the board
+        :param settings: settings of the game
+        """
+        self.seed = seed
+        self.max_y = max_y
+        self.max_x = max_x
+        self.settings = settings
+
+        self.events = bytearray()
+        self.last_tick = 0
+
+
+    def turn(self, tick: int, direction: int) -> None:
+        """ Records a change of the direction before the given tick """
+        _encode_varint((tick - self.last_tick) << 2 | direction, self.events)
+        self.last_tick = tick
+
+
+    def to_bytes(self, ticks: int, score: int) -> bytes:
+        """ Returns the content of the replay file """
+        settings = (self.settings[field] for field in settings_fields)
+        return header.pack(
+            magic, version, self.seed, self.max_y, self.max_x, *settings, ticks, score
+        ) + bytes(self.events)
+
+
+    def save(self, ticks: int, score: int) -> pathlib.Path:
+        """ Writes the replay into the replay directory
+
+        The oldest replays are removed such that at most `replay_limit`
+        files are kept.
+
+        :param ticks: number of ticks the game lasted
+        :param score: final score
+        :returns path of the file
+        """
+        replay_dir.mkdir(parents=True, exist_ok=True)
+
+        name = datetime.now().strftime("%Y%m%d-%H%M%S-%f")
+        path = replay_dir / f"{name}.replay"
+        temp_path = path.with_suffix(".tmp")
+
+        with open(temp_path, "wb") as target:
+            target.write(self.to_bytes(ticks, score))
+        os.replace(temp_path, path)
+
+        for old_path in sorted(replay_dir.glob("*.replay"))[:-replay_limit]:
+            old_path.unlink()
+
+        return path
+
+
+class Replay:
+    def __init__(self, data: bytes, checkpoint_interval: int = 500) -> None:
+        """ Plays a recorded game again
+
+        The game is simulated with the recorded seed and turns. Every
+        `checkpoint_interval` ticks a copy of the engine is kept such that
+        seeking only simulates the ticks from the closest checkpoint.
+
+        :param data: content of a replay file
+        :param checkpoint_interval: ticks between two checkpoints
+        """
+        (
+            file_magic, file_version, self.seed, self.max_y, self.max_x, *settings, self.ticks, self.score
+        ) = header.unpack_from(data)
+
+        if file_magic != magic or file_version != version:
+            raise ValueError("not a replay file of this version")
+
+        self.settings: GameSettings = dict(zip(settings_fields, settings))
+
+        # turns as (tick, direction)
+        self.turns: List[Tuple[int, int]] = []
+        pos = header.size
+        tick = 0
+        while pos < len(data):
+            value, pos = _decode_varint(data, pos)
+            tick += value >> 2
+            self.turns.append((tick, value & 3))
+
+        self.checkpoint_interval = checkpoint_interval
+        self.checkpoints: Dict[int, Tuple[SnakeEngine, int]] = {}
+        self.start()
+
+
+    @classmethod
+    def load(cls, path, checkpoint_interval: int = 500) -> "Replay":
+        """ Reads a replay file """
+        with open(path, "rb") as source:
+            return cls(source.read(), checkpoint_interval)
+
+
+    def start(self) -> None:
+        """ Starts the game from the first tick """
+        self.engine = SnakeEngine(self.max_y, self.max_x, self.settings, random.Random(self.seed))
+        self.cursor = 0
+        self._checkpoint()
+
+
+    def _checkpoint(self) -> None:
+        """ Keeps a copy of the engine at the current tick """
+        self.checkpoints[self.engine.ticks] = (self._copy(self.engine), self.cursor)
+
+
+    def _copy(self, engine: SnakeEngine) -> SnakeEngine:
+        """ Copies the engine including the state of its random generator """
+        rng = random.Random()
+        rng.setstate(engine.rng.getstate())
+
+        return engine.copy(rng)
+
+
+    @property
+    def finished(self) -> bool:
+        """ Returns if the recorded game is over """
+        return not self.engine.alive or self.engine.won or self.engine.ticks >= self.ticks
+
+
+    def step(self) -> TickResult:
+        """ Advances the game by one tick with the recorded turns """
+        engine = self.engine
+        while self.cursor < len(self.turns) and self.turns[self.cursor][0] == engine.ticks:
+            engine.turn(self.turns[self.cursor][1])
+            self.cursor += 1
+
+        result = engine.step()
+        if engine.ticks % self.checkpoint_interval == 0 and engine.ticks not in self.checkpoints:
+            self._checkpoint()
+
+        return result
+
+
+    def seek(self, tick: int) -> None:
+        """ Moves the game to the given tick (or the end of the game) """
+        tick = max(0, min(tick, self.ticks))
+        start = max(checkpoint for checkpoint in self.checkpoints if checkpoint <= tick)
+
+        if tick < self.engine.ticks or start > self.engine.ticks:
+            engine, self.cursor = self.checkpoints[start]
+            self.engine = self._copy(engine)
+
+        while self.engine.ticks < tick and not self.finished:
+            self.step()
+
+
+    def run(self) -> SnakeEngine:
+        """ Simulates the rest of the game as fast as possible """
+        while not self.finished:
+            self.step()
+
+        return self.engine
+
+
+class ReplayView:
+
+    # keys which change the speed and seek
+    faster = (ord("+"), ord("="))
+    slower = (ord("-"),)
+
+    def __init__(self, screen, replay: Replay, speed: float = 1.0) -> None:
+        """ Renders a replay within the terminal
+
+        :param screen (_CursesWindow): The screen instance of curses, it
+            has to be at least as large as the recorded board
+        :param replay: the replay to show
+        :param speed: multiple of the recorded game speed
+        """
+        # imported here since the game imports the recorder of this module
+        from game import GameWindow
+
+        self.screen = screen
+        self.replay = replay
+        self.speed = speed
+        self.paused = False
+        self.status_width = 0
+
+        # the characters are drawn like in the game
+        self.glyphs = GameWindow
+        self.board = screen.derwin(replay.max_y, replay.max_x, 0, 0)
+        self.renderer = CursesRenderer(self.board)
+
+        self.snake_speed = replay.settings["speed"] * replay.settings["acceleration"]
+        self.scheduler = TickScheduler(self.tick_rate())
+
+
+    def tick_rate(self) -> float:
+        """ Returns the ticks per second like GameWindow.tick_rate times the speed """
+        rate = self.snake_speed * self.speed
+        return rate * 2 if self.replay.engine.direction in (0, 1) else rate
+
+
+    def draw_all(self) -> None:
+        """ Draws the whole board (after a seek) """
+        self.board.clear()
+        self.renderer.reset()
+
+        engine = self.replay.engine
+        for cell in engine.food:
+            self.renderer.put(cell[0], cell[1], self.glyphs.food_char, curses.A_BOLD | curses.color_pair(2))
+
+        for cell in list(engine.body)[1:]:
+            self.renderer.put(cell[0], cell[1], self.glyphs.char, curses.color_pair(4))
+
+        self._draw_head()
+
+
+    def _draw_head(self) -> None:
+        head = self.replay.engine.body[0]
+        headchar = self.glyphs.heads[self.replay.engine.direction]
+        self.renderer.put(head[0], head[1], headchar, curses.A_BOLD | curses.color_pair(3))
+
+
+    def draw_tick(self, result: TickResult) -> None:
+        """ Draws the changes of one tick like GameWindow.draw_game """
+        if not result["alive"]:
+            return
+
+        if result["tail"] is not None:
+            self.renderer.put(result["tail"][0], result["tail"][1], " ")
+
+        self._draw_head()
+
+        body = self.replay.engine.body
+        if len(body) > 1:
+            self.renderer.put(body[1][0], body[1][1], self.glyphs.char, curses.color_pair(4))
+
+        for cell in result["new_food"]:
+            self.renderer.put(cell[0], cell[1], self.glyphs.food_char, curses.A_BOLD | curses.color_pair(2))
+
+
+    def handle_key(self, action: int) -> bool:
+        """ Handles the keys of the replay
+
+            - (Q): quits the replay
+            - (Space): pauses the replay
+            - (+/-): doubles or halves the speed
+            - (Left/Right): seeks back or forth by one checkpoint interval
+
+        :returns True if the replay should end
+        """
+        if action in (ord("q"), ord("Q")):
+            return True
+
+        if action == ord(" "):
+            self.paused = not self.paused
+
+        elif action in self.faster:
+            self.speed *= 2
+
+        elif action in self.slower:
+            self.speed /= 2
+
+        elif action in (curses.KEY_LEFT, curses.KEY_RIGHT):
+            step = self.replay.checkpoint_interval
+            tick = self.replay.engine.ticks + (step if action == curses.KEY_RIGHT else -step)
+            self.replay.seek(tick)
+            self.draw_all()
+
+        return False
+
+
+    def __call__(self) -> None:
+        """ Main loop of the replay """
+        self.screen.nodelay(1)
+        self.draw_all()
+
+        while True:
+            if self.handle_key(self.screen.getch()):
+                return
+
+            ticks = self.scheduler.due()
+            if not self.paused:
+                for _ in range(ticks):
+                    if self.replay.finished:
+                        break
+
+                    self.draw_tick(self.replay.step())
+
+            self.scheduler.set_rate(self.tick_rate())
+
+            # the status is padded such that shorter texts cover longer ones
+            engine = self.replay.engine
+            state = "paused" if self.paused else f"x{self.speed:g}"
+            status = f" Score: {engine.score}  Tick: {engine.ticks}/{self.replay.ticks}  {state} "
+            self.status_width = max(self.status_width, len(status))
+
+            self.renderer.score_text = status.ljust(self.status_width)
+            self.renderer.flush()
+
+            self.scheduler.wait()
+
+
+def _show(screen, replay: Replay, speed: float) -> None:
+    """ Runs the replay view within curses.wrapper """
+    curses.start_color()
+    for pair, (foreground, background) in color_pairs.items():
+        curses.init_pair(pair, getattr(curses, f"COLOR_{foreground}"), getattr(curses, f"COLOR_{background}"))
+
+    curses.curs_set(0)
+    screen.keypad(1)
+
+    max_y, max_x = screen.getmaxyx()
+    if max_y < replay.max_y or max_x < replay.max_x:
+        raise SystemExit(f"the terminal has to be at least {replay.max_x}x{replay.max_y}")
+
+    ReplayView(screen, replay, speed)()
+
+
+if __name__ == "__main__":
+
+    parser = argparse.ArgumentParser(description="Plays a recorded game again")
+    parser.add_argument("path", nargs="?", default=None, help="replay file (default: the latest one)")
+    parser.add_argument("--headless", action="store_true", help="simulate as fast as possible and print the result")
+    parser.add_argument("--speed", type=float, default=1.0, help="multiple of the recorded speed")
+    parser.add_argument("--seek", type=int, default=0, help="tick to start from")
+    parser.add_argument("--checkpoint", type=int, default=500, help="ticks between checkpoints")
+    args = parser.parse_args()
+
+    path = args.path
+    if path is None:
+        paths = sorted(replay_dir.glob("*.replay"))
+        if not paths:
+            sys.exit("no replays recorded yet")
+        path = paths[-1]
+
+    replay = Replay.load(path, args.checkpoint)
+
+    if args.headless:
+        start = time.perf_counter()
+        engine = replay.run()
+        elapsed = time.perf_counter() - start
+
+        print(f"replay:   {path}")
+        print(f"board:    {replay.max_y}x{replay.max_x}, seed {replay.seed}")
+        print(f"ticks:    {engine.ticks} (recorded {replay.ticks})")
+        print(f"score:    {engine.score} (recorded {replay.score})")
+        print(f"speed:    {engine.ticks / max(elapsed, 1e-9):,.0f} ticks/s")
+
+        if (engine.ticks, engine.score) != (replay.ticks, replay.score):
+            sys.exit("the replay does not match the recorded game")
+    else:
+        replay.seek(args.seek)
+        curses.wrapper(_show, replay, args.speed)
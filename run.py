@@ -1,5 +1,10 @@
 import os
+import sys
+import argparse
+import logging
 import platform
+from autopilot import policies
+from turns import default_depth
 from window import Window
 
 
@@ -16,6 +21,34 @@ else:
 
 if __name__ == "__main__":
 
+    parser = argparse.ArgumentParser(description="Snake in the terminal")
+    parser.add_argument(
+        "--backend",
+        choices=("curses", "ansi"),
+        default="curses",
+        help="render the game through curses or with raw ANSI sequences"
+    )
+    parser.add_argument(
+        "--autopilot",
+        choices=list(policies),
+        default=None,
+        help="let a policy steer the snake instead of the arrow keys"
+    )
+    parser.add_argument(
+        "--turn-depth",
+        type=int,
+        default=default_depth,
+        help="arrow keys which can wait for their tick, further keys are dropped"
+    )
+    args = parser.parse_args()
+
+    # the terminal belongs to curses, so errors (e.g. failed writes) are logged to a file
+    logging.basicConfig(filename="snake.log", level=logging.WARNING, format="%(asctime)s %(name)s: %(message)s")
+
     # create window instance and run warpped around curses
-    window = Window()
+    window = Window(args.backend, args.autopilot, args.turn_depth)
     curses.wrapper(window.run)
+
+    if window.write_error is not None:
+        print(f"snake: {window.write_error}, see snake.log", file=sys.stderr)
+        sys.exit(1)
@@ -0,0 +1,202 @@
+import os
+import sys
+import time
+import curses
+import signal
+import asyncio
+from typing import Any, Callable, List, Optional, Tuple
+
+
+# keys which are no key presses (above the curses key codes)
+KEY_FOCUS_IN = 0x10001
+KEY_FOCUS_OUT = 0x10002
+KEY_SUSPEND = 0x10003
+KEY_CONTINUE = 0x10004
+
+# terminal sequences which turn the focus reports on and off and the
+# reports (as they are read from curses: escape, "[", "I" or "O")
+focus_on = "\x1b[?1004h"
+focus_off = "\x1b[?1004l"
+focus_reports = {ord("I"): KEY_FOCUS_IN, ord("O"): KEY_FOCUS_OUT}
+
+# windows has no job control (SIGTSTP, SIGCONT) and its event loop can
+# not wait for stdin, so the keys are polled there instead
+job_control = hasattr(signal, "SIGTSTP")
+
+# seconds between two reads of the keys where they are polled
+poll_interval = 0.005
+
+
+class Runtime:
+    def __init__(self, screen) -> None:
+        """ Event loop which runs the menus, the game and its timers of
+        one session on one thread
+
+        The loop wakes up when stdin is readable (loop.add_reader) and
+        moves every available key into a queue, so no state ever blocks
+        in getch and timers are not delayed by waiting for input.
+
+        Losing the focus of the terminal (if it reports it) and being
+        suspended (SIGTSTP) are queued as keys as well, with the time they
+        happened, so the game can pause exactly at that moment.
+
+        Without job control (windows) the keys are read every few
+        milliseconds by a task instead and there is no suspension.
+
+        The writes to the disk stay on the persistence thread (and the
+        settings timer), since they are also used without a loop (e.g. at
+        exit) and fsync blocks anyway. The loop only waits for them
+        (run_blocking).
+
+        :param screen (_CursesWindow): curses screen of the session
+        """
+        self.screen = screen
+        self.loop: Optional[asyncio.AbstractEventLoop] = None
+
+        # keys with the time.perf_counter() when they were read and an
+        # event which is set while keys wait (ends the wait for a tick early)
+        self.keys: Optional["asyncio.Queue[Tuple[int, float]]"] = None
+        self.key_ready: Optional[asyncio.Event] = None
+
+        # task which reads the keys where stdin can not be waited for
+        self.poller: Optional[asyncio.Task] = None
+
+        self.fd = sys.stdin.fileno()
+
+
+    def start(self) -> None:
+        """ Starts reading keys (called within the running loop) """
+        self.loop = asyncio.get_running_loop()
+        self.keys = asyncio.Queue()
+        self.key_ready = asyncio.Event()
+
+        # curses only reads the keys which are there already
+        self.screen.nodelay(1)
+
+        if job_control:
+            self.loop.add_reader(self.fd, self._read_keys)
+            self.loop.add_signal_handler(signal.SIGTSTP, self._suspend)
+            self.loop.add_signal_handler(signal.SIGCONT, self._continue)
+        else:
+            self.poller = self.loop.create_task(self._poll_keys())
+
+        self._report_focus(True)
+
+
+    def stop(self) -> None:
+        """ Stops reading keys """
+        if self.loop is not None:
+            if job_control:
+                self.loop.remove_reader(self.fd)
+                self.loop.remove_signal_handler(signal.SIGTSTP)
+                self.loop.remove_signal_handler(signal.SIGCONT)
+            elif self.poller is not None:
+                self.poller.cancel()
+                self.poller = None
+
+            self._report_focus(False)
+
+
+    def _read_keys(self) -> None:
+        # curses may buffer several keys of one read, so read until empty
+        now = time.perf_counter()
+        keys = []
+        while True:
+            key = self.screen.getch()
+            if key == -1:
+                break
+
+            keys.append(key)
+
+            # a focus report replaces its three characters
+            if keys[-3:-1] == [27, ord("[")] and key in focus_reports:
+                del keys[-3:]
+                keys.append(focus_reports[key])
+
+        for key in keys:
+            self._put(key, now)
+
+
+    async def _poll_keys(self) -> None:
+        """ Reads the keys every few milliseconds (without job control) """
+        while True:
+            self._read_keys()
+            await asyncio.sleep(poll_interval)
+
+
+    def _put(self, key: int, now: float) -> None:
+        self.keys.put_nowait((key, now))
+        self.key_ready.set()
+
+
+    def _taken(self) -> None:
+        """ Clears the key event once the queue is empty """
+        if self.keys.empty():
+            self.key_ready.clear()
+
+
+    def _report_focus(self, enabled: bool) -> None:
+        """ Asks the terminal to report (or no longer report) the focus """
+        sys.stdout.write(focus_on if enabled else focus_off)
+        sys.stdout.flush()
+
+
+    def _suspend(self) -> None:
+        """ Queues the suspension and stops the process (ctrl-z) """
+        self._put(KEY_SUSPEND, time.perf_counter())
+
+        self._report_focus(False)
+        curses.endwin()
+
+        # the handler replaced the default action of SIGTSTP
+        os.kill(os.getpid(), signal.SIGSTOP)
+
+
+    def _continue(self) -> None:
+        """ Draws the screen again after the process was continued
+
+        Also queued as a key, since a renderer which writes to the
+        terminal itself has to draw its frame again.
+        """
+        self._report_focus(True)
+        self.screen.redrawwin()
+        self.screen.refresh()
+
+        self._put(KEY_CONTINUE, time.perf_counter())
+
+
+    async def getch(self) -> int:
+        """ Waits for the next key """
+        key, _ = await self.keys.get()
+        self._taken()
+        return key
+
+
+    def poll(self) -> int:
+        """ Returns the next key which was read already (-1 if none) """
+        try:
+            key = self.keys.get_nowait()[0]
+        except asyncio.QueueEmpty:
+            return -1
+
+        self._taken()
+        return key
+
+
+    def drain(self) -> List[Tuple[int, float]]:
+        """ Returns all keys which were read already with the time they
+        were read (time.perf_counter())
+        """
+        keys = []
+        while not self.keys.empty():
+            keys.append(self.keys.get_nowait())
+
+        self._taken()
+        return keys
+
+
+    async def run_blocking(self, function: Callable[[], Any]) -> Any:
+        """ Runs a blocking function (e.g. waiting for the disk) on a
+        thread, the loop keeps running meanwhile
+        """
+        return await self.loop.run_in_executor(None, function)
@@ -0,0 +1,170 @@
+import time
+import asyncio
+from typing import Optional
+
+
+class TickScheduler:
+    def __init__(self, rate: float, max_catchup: int = 5, spin_time: float = 0.002) -> None:
+        """ Fixed timestep scheduler based on time.perf_counter
+
+        The elapsed time is collected in an accumulator and every full
+        interval within it is one due tick, so the time spent on input,
+        drawing and refreshing does not slow down the game. When the loop
+        falls behind several ticks are due at once and the caller can skip
+        the rendering in between.
+
+        :param rate: target ticks per second
+        :param max_catchup: maximal number of ticks run at once, time beyond
+            that is dropped instead of speeding up the game afterwards
+        :param spin_time: the last part of a wait which is spent busy
+            waiting since sleep is not precise enough for it
+        """
+        self.max_catchup = max_catchup
+        self.spin_time = spin_time
+
+        self.set_rate(rate)
+        self.start()
+
+
+    def set_rate(self, rate: float) -> None:
+        """ Changes the target ticks per second (from the next tick on) """
+        self.interval = 1 / rate
+
+
+    @property
+    def target_rate(self) -> float:
+        """ Returns the current target ticks per second """
+        return 1 / self.interval
+
+
+    def start(self) -> None:
+        """ (Re)starts the scheduler such that the first tick is due directly """
+        self.last = time.perf_counter()
+        self.accumulator = self.interval
+
+        # statistics about the actual tick rate
+        self.window_start = self.last
+        self.window_ticks = 0
+        self.actual_rate = 0.0
+        self.skipped_frames = 0
+
+        # time.perf_counter() when the scheduler was paused
+        self.paused_at: Optional[float] = None
+
+
+    def pause(self, now: Optional[float] = None) -> None:
+        """ Stops the clock of the scheduler, the time until resume does
+        not count towards the next tick
+
+        :param now: time.perf_counter() of the pause (default: now), 
+            e.g. when the key was read
+        """
+        if self.paused_at is None:
+            now = time.perf_counter() if now is None else now
+            self.paused_at = max(now, self.last)
+
+
+    def resume(self) -> None:
+        """ Restarts the clock in the same phase as when it was paused """
+        if self.paused_at is None:
+            return
+
+        paused = time.perf_counter() - self.paused_at
+        self.last += paused
+        self.window_start += paused
+        self.paused_at = None
+
+
+    def due(self) -> int:
+        """ Returns the number of ticks which are due since the last call """
+        now = time.perf_counter()
+        self.accumulator += now - self.last
+        self.last = now
+
+        ticks = int(self.accumulator // self.interval)
+        self.accumulator -= ticks * self.interval
+
+        if ticks > self.max_catchup:
+            ticks = self.max_catchup
+            self.accumulator = 0.0
+
+        if ticks > 1:
+            self.skipped_frames += ticks - 1
+
+        self._count(now, ticks)
+        return ticks
+
+
+    def _count(self, now: float, ticks: int) -> None:
+        """ Updates the measured tick rate once per second
+
+        The ticks which are due at the end of a window count towards the
+        next one, so a window of one second at 10 ticks per second
+        counts 10 ticks and not 11.
+        """
+        elapsed = now - self.window_start
+
+        if elapsed >= 1.0:
+            self.actual_rate = self.window_ticks / elapsed
+            self.window_start = now
+            self.window_ticks = 0
+
+        self.window_ticks += ticks
+
+
+    def stats(self) -> dict:
+        """ Returns the target and the measured ticks per second (over the
+        last full second) and the number of skipped frames
+        """
+        return {
+            "target_rate": self.target_rate,
+            "actual_rate": self.actual_rate,
+            "skipped_frames": self.skipped_frames,
+        }
+
+
+    def remaining(self) -> float:
+        """ Returns the time in seconds until the next tick is due """
+        return self.interval - self.accumulator - (time.perf_counter() - self.last)
+
+
+    def wait(self) -> None:
+        """ Waits until the next tick is due
+
+        Sleeps for the most part and spins for the last `spin_time`
+        seconds, which keeps sub-millisecond intervals exact.
+        """
+        deadline = time.perf_counter() + self.remaining()
+
+        sleep_time = deadline - time.perf_counter() - self.spin_time
+        if sleep_time > 0:
+            time.sleep(sleep_time)
+
+        while time.perf_counter() < deadline:
+            pass
+
+
+    async def sleep(self, wake: Optional[asyncio.Event] = None) -> None:
+        """ Waits until the next tick is due within an event loop
+
+        Other jobs of the loop (e.g. reading keys) run while it sleeps,
+        only the last `spin_time` seconds are spent busy waiting.
+
+        :param wake: event which ends the wait early when it is set
+            (e.g. a key arrived which has to be handled before the tick)
+        """
+        deadline = time.perf_counter() + self.remaining()
+
+        sleep_time = deadline - time.perf_counter() - self.spin_time
+        if sleep_time > 0:
+            if wake is None:
+                await asyncio.sleep(sleep_time)
+            else:
+                try:
+                    await asyncio.wait_for(wake.wait(), sleep_time)
+                    return
+                except asyncio.TimeoutError:
+                    pass
+
+        while time.perf_counter() < deadline:
+            pass
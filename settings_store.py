@@ -0,0 +1,203 @@
+import os
+import json
+import time
+import pathlib
+import threading
+from typing import Callable, Optional, Tuple
+
+from config import GameSettings, default_settings
+from storage import atomic_write
+
+
+# smallest allowed value of every setting
+minimum_settings: GameSettings = {
+    "init_length": 4,
+    "growth_size": 1,
+    "speed": 1,
+    "acceleration": 1,
+    "food_count": 1
+}
+
+# seconds without a change after which changed settings are written
+write_delay = 1.0
+
+
+def validate_settings(data: object) -> GameSettings:
+    """ Returns complete settings from (possibly broken) data of the file
+
+    Missing or invalid values are replaced by the defaults, values below
+    the minimum are raised to it.
+
+    :param data: parsed content of the settings file
+    """
+    data = data if isinstance(data, dict) else {}
+    settings: GameSettings = dict(default_settings)
+
+    for field, minimum in minimum_settings.items():
+        value = data.get(field)
+        if isinstance(value, int) and not isinstance(value, bool):
+            settings[field] = max(value, minimum)
+
+    return settings
+
+
+class SettingsStore:
+    def __init__(
+        self,
+        path: str = "settings.json",
+        submit: Optional[Callable[[Callable[[], None], str], None]] = None,
+        delay: float = write_delay) -> None:
+        """ Validated settings in memory
+
+        The settings file is only parsed again when its modification time
+        or size changed (another instance wrote it). Every setting is an
+        attribute (e.g. `store.speed`), so reading it is no dict lookup.
+
+        Changes are written after `delay` seconds without a further change
+        or by flush (e.g. when the settings menu is left), so holding a key
+        in the menu writes the file once. The file is replaced atomically.
+
+        :param path: settings file
+        :param submit: runs a write in the background, called with the
+            write and its key (default: write on the timer thread)
+        :param delay: seconds without a change before writing
+        """
+        self.path = pathlib.Path(path)
+        self.submit = submit
+        self.delay = delay
+
+        self.lock = threading.Lock()
+        self.timer: Optional[threading.Timer] = None
+
+        # modification time and size of the file when it was read
+        self.stamp: Optional[Tuple[int, int]] = None
+
+        # time of the last change which is not flushed yet (None if none)
+        # and the content which is flushed but not written yet
+        self.changed: Optional[float] = None
+        self.unwritten: Optional[bytes] = None
+
+        self.reads = 0
+        self.writes = 0
+
+        self._apply(dict(default_settings))
+        self.refresh()
+
+
+    def _apply(self, settings: GameSettings) -> None:
+        self.values = settings
+
+        self.init_length = settings["init_length"]
+        self.growth_size = settings["growth_size"]
+        self.speed = settings["speed"]
+        self.acceleration = settings["acceleration"]
+        self.food_count = settings["food_count"]
+
+
+    def _stat(self) -> Optional[Tuple[int, int]]:
+        try:
+            result = os.stat(self.path)
+        except FileNotFoundError:
+            return None
+
+        return result.st_mtime_ns, result.st_size
+
+
+    def refresh(self) -> None:
+        """ Reads the file again if it changed since it was read """
+        stamp = self._stat()
+
+        with self.lock:
+            # changes which are not written yet are newer than the file
+            if stamp == self.stamp or self.changed is not None or self.unwritten is not None:
+                return
+
+            try:
+                data = json.loads(self.path.read_text()) if stamp else {}
+            except (OSError, ValueError):
+                # a broken file keeps the current settings
+                return
+
+            self.stamp = stamp
+            self.reads += 1
+            self._apply(validate_settings(data))
+
+
+    def get(self) -> GameSettings:
+        """ Returns a copy of the current settings (checks the file first) """
+        self.refresh()
+        return dict(self.values)
+
+
+    def update(self, values: dict) -> None:
+        """ Changes settings, which are written after the delay
+
+        :param values: new values (validated)
+        """
+        with self.lock:
+            self._apply(validate_settings({**self.values, **values}))
+            self.changed = time.monotonic()
+
+            if self.timer is None:
+                self._start_timer(self.delay)
+
+
+    def _start_timer(self, delay: float) -> None:
+        self.timer = threading.Timer(delay, self._on_timer)
+        self.timer.daemon = True
+        self.timer.start()
+
+
+    def _on_timer(self) -> None:
+        with self.lock:
+            if self.changed is None:
+                self.timer = None
+                return
+
+            # changed again meanwhile: wait for the rest of the delay
+            remaining = self.changed + self.delay - time.monotonic()
+            if remaining > 0:
+                self._start_timer(remaining)
+                return
+
+            self.timer = None
+
+        self.flush()
+
+
+    def flush(self) -> None:
+        """ Writes the changes now (queued if a submit function is set) """
+        with self.lock:
+            if self.timer is not None:
+                self.timer.cancel()
+                self.timer = None
+
+            if self.changed is None:
+                return
+
+            self.changed = None
+            self.unwritten = json.dumps(self.values, indent=3).encode()
+
+        if self.submit is None:
+            self._write()
+        else:
+            self.submit(self._write, str(self.path))
+
+
+    def _write(self) -> None:
+        """ Writes the newest flushed content """
+        with self.lock:
+            data = self.unwritten
+            if data is None:
+                return
+
+        # readers see the old or the new file, never a partial write
+        atomic_write(self.path, data)
+
+        with self.lock:
+            if self.unwritten is data:
+                self.unwritten = None
+
+            # the own write does not need to be read again
+            self.stamp = self._stat()
+            self.writes += 1
@@ -0,0 +1,155 @@
+import os
+import pathlib
+import tempfile
+import threading
+from typing import List, Optional, Union
+
+# advisory locks are not available on windows, where the game runs
+# as a single instance without them
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+
+PathLike = Union[str, pathlib.Path]
+
+
+class FileLock:
+    def __init__(self, path: PathLike, shared: bool = False) -> None:
+        """ Advisory lock on a lock file (flock), shared by the game
+        instances which use the same directory
+
+        The lock belongs to the open file, so two threads of one process
+        exclude each other as well.
+
+        :param path: path of the lock file (created if missing)
+        :param shared: shared instead of exclusive lock
+        """
+        self.path = pathlib.Path(path)
+        self.shared = shared
+        self.fd: Optional[int] = None
+
+
+    def __enter__(self) -> "FileLock":
+        self.fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+        if fcntl is not None:
+            fcntl.flock(self.fd, fcntl.LOCK_SH if self.shared else fcntl.LOCK_EX)
+
+        return self
+
+
+    def __exit__(self, *_) -> None:
+        # closing the file releases the lock
+        os.close(self.fd)
+        self.fd = None
+
+
+def atomic_write(path: PathLike, data: bytes) -> None:
+    """ Replaces a file with new content (temporary file and rename)
+
+    Readers see either the old or the new content, never a part of it.
+
+    :param path: file to replace
+    :param data: new content
+    """
+    path = pathlib.Path(path)
+    fd, temp_path = tempfile.mkstemp(prefix=f".{path.name}.", suffix=".tmp", dir=path.parent)
+
+    try:
+        with os.fdopen(fd, "wb") as target:
+            target.write(data)
+            target.flush()
+            os.fsync(target.fileno())
+
+        os.replace(temp_path, path)
+    except BaseException:
+        os.unlink(temp_path)
+        raise
+
+
+def append(path: PathLike, data: bytes, sync: bool = True) -> None:
+    """ Appends data to a file with a single write
+
+    :param path: file to append to (created if missing)
+    :param data: data to append
+    :param sync: wait until the data is on the disk
+    """
+    fd = os.open(path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+    try:
+        os.write(fd, data)
+        if sync:
+            os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+class GroupCommit:
+    def __init__(self, path: PathLike, lock_path: PathLike) -> None:
+        """ Appends records to a file with group commit
+
+        Records which are added while another thread writes are collected
+        and written (and synced) together by the next writer, so a burst
+        of records costs one write and one fsync. Appending holds the
+        lock file shared, so it can be excluded by an exclusive lock
+        (e.g. while the file is rotated).
+
+        :param path: file to append to
+        :param lock_path: lock file of the appended file
+        """
+        self.path = pathlib.Path(path)
+        self.lock_path = pathlib.Path(lock_path)
+
+        # records which are not written yet, guarded by the buffer lock;
+        # writing is serialized by the commit lock
+        self.buffer: List[bytes] = []
+        self.buffer_lock = threading.Lock()
+        self.commit_lock = threading.Lock()
+
+        # tickets of the added and the written records
+        self.added = 0
+        self.committed = 0
+
+        # number of writes, to see how many records share one
+        self.commits = 0
+
+
+    def add(self, record: bytes) -> int:
+        """ Buffers a record
+
+        :returns ticket of the record (see commit)
+        """
+        with self.buffer_lock:
+            self.buffer.append(record)
+            self.added += 1
+            return self.added
+
+
+    def commit(self, ticket: int) -> None:
+        """ Returns once the record with the ticket is on the disk
+
+        :param ticket: ticket returned by add
+        """
+        with self.commit_lock:
+            # written by the commit of another thread
+            if self.committed >= ticket:
+                return
+
+            with FileLock(self.lock_path, shared=True):
+                self.write()
+
+
+    def write(self) -> None:
+        """ Writes all buffered records (the caller holds the commit lock
+        and the lock file)
+        """
+        with self.buffer_lock:
+            data = b"".join(self.buffer)
+            self.buffer.clear()
+            ticket = self.added
+
+        if data:
+            append(self.path, data)
+            self.commits += 1
+
+        self.committed = ticket
@@ -0,0 +1,306 @@
+import os
+import json
+import time
+import random
+import argparse
+import pathlib
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import Dict, List, Optional, Set, Tuple
+
+import common
+
+from autopilot import policies
+from config import GameSettings
+from config import default_settings
+from engine import SnakeEngine
+
+
+def play_chunk(
+    policy: str,
+    chunk: int,
+    games: int,
+    seed: int,
+    size: Tuple[int, int],
+    settings: GameSettings,
+    max_ticks: int) -> dict:
+    """ Plays a number of headless games with the given policy
+
+    Runs within a worker process, the random generator is seeded per
+    chunk such that the results do not depend on the scheduling.
+
+    :param policy: name of the policy (see policies)
+    :param chunk: index of the work unit
+    :param games: number of games to play
+    :param seed: base seed of the tournament
+    :param size: (max_y, max_x) of the board
+    :param settings: game settings
+    :param max_ticks: games which last longer are stopped
+    :returns dict with the score and the ticks of every game
+    """
+    rng = random.Random(f"{seed}:{policy}:{chunk}")
+    decide = policies[policy](rng)
+
+    engine = SnakeEngine(size[0], size[1], settings, rng)
+    scores: List[int] = []
+    ticks: List[int] = []
+
+    start = time.perf_counter()
+    for _ in range(games):
+        engine.reset()
+
+        tick = 0
+        while tick < max_ticks:
+            result = engine.step(decide(engine))
+            tick += 1
+
+            if not result["alive"] or result["won"]:
+                break
+
+        scores.append(engine.score)
+        ticks.append(tick)
+
+    return {
+        "policy": policy,
+        "chunk": chunk,
+        "scores": scores,
+        "ticks": ticks,
+        "elapsed": time.perf_counter() - start,
+        "latency_p99": decide.latency_percentiles((0.99,))[0.99],
+    }
+
+
+class Standings:
+    def __init__(self) -> None:
+        """ Merged results of all chunks per policy """
+        self.scores: Dict[str, Counter] = {}
+        self.ticks: Dict[str, int] = {}
+        self.games: Dict[str, int] = {}
+        self.elapsed: Dict[str, float] = {}
+        self.latency: Dict[str, float] = {}
+        self.done: Set[Tuple[str, int]] = set()
+
+
+    def add(self, result: dict) -> None:
+        """ Merges the result of a chunk """
+        policy = result["policy"]
+        self.done.add((policy, result["chunk"]))
+
+        self.scores.setdefault(policy, Counter()).update(result["scores"])
+        self.ticks[policy] = self.ticks.get(policy, 0) + sum(result["ticks"])
+        self.games[policy] = self.games.get(policy, 0) + len(result["scores"])
+        self.elapsed[policy] = self.elapsed.get(policy, 0.0) + result["elapsed"]
+
+        # worst p99 decision latency over all chunks
+        latency = result.get("latency_p99", 0.0)
+        self.latency[policy] = max(self.latency.get(policy, 0.0), latency)
+
+
+    def percentile(self, policy: str, fraction: float) -> int:
+        """ Returns the score below which the given fraction of games lie """
+        rank = fraction * (self.games[policy] - 1)
+        seen = 0
+        for score in sorted(self.scores[policy]):
+            seen += self.scores[policy][score]
+            if seen > rank:
+                return score
+
+        return 0
+
+
+    def summary(self) -> str:
+        """ Returns the standings as a table """
+        lines = [
+            f"{'policy':<10} {'games':>8} {'mean':>8} {'p50':>6} {'p90':>6} {'best':>6} {'survival':>10} {'ticks/s':>12} {'p99 ms':>8}"
+        ]
+
+        for policy in sorted(self.games, key=self.mean_score, reverse=True):
+            games = self.games[policy]
+            lines.append(
+                f"{policy:<10} {games:>8} {self.mean_score(policy):>8.2f} "
+                f"{self.percentile(policy, 0.5):>6} {self.percentile(policy, 0.9):>6} "
+                f"{max(self.scores[policy]):>6} {self.ticks[policy] / games:>10.1f} "
+                f"{self.ticks[policy] / max(self.elapsed[policy], 1e-9):>12,.0f} "
+                f"{self.latency[policy] * 1000:>8.3f}"
+            )
+
+        return "\n".join(lines)
+
+
+    def mean_score(self, policy: str) -> float:
+        """ Returns the average score of the policy """
+        total = sum(score * count for score, count in self.scores[policy].items())
+        return total / self.games[policy]
+
+
+def run_parameters(
+    policy_names: List[str],
+    games: int,
+    chunk_size: int,
+    seed: int,
+    size: Tuple[int, int],
+    settings: GameSettings,
+    max_ticks: int) -> dict:
+    """ Returns the parameters which decide the results of the chunks
+    (as they are stored in the header of a results file)
+    """
+    parameters = {
+        "policies": sorted(policy_names),
+        "games": games,
+        "chunk_size": chunk_size,
+        "seed": seed,
+        "size": list(size),
+        "settings": dict(settings),
+        "max_ticks": max_ticks,
+    }
+
+    # the same types as after reading the header
+    return json.loads(json.dumps(parameters))
+
+
+def load_results(path: pathlib.Path, standings: Standings, parameters: dict) -> int:
+    """ Reads the chunks of a previous (partial) run
+
+    The first line holds the parameters of the run, the chunks of a run
+    with other parameters would be merged into wrong standings. Every 
+    finished chunk is one json line, a last line which was cut off while
+    writing is ignored and played again.
+
+    :param path: results file
+    :param standings: receives the finished chunks
+    :param parameters: parameters of this run (see run_parameters)
+    :returns size of the complete lines in bytes (0 if the file has no
+        header yet), the rest is cut off before appending
+    :raises ValueError: if the file belongs to a run with other parameters
+    """
+    if not path.exists() or path.stat().st_size == 0:
+        return 0
+
+    with open(path, "r") as source:
+        try:
+            header = json.loads(source.readline())["run"]
+        except (json.JSONDecodeError, KeyError, TypeError):
+            raise ValueError(f"{path} has no run header, use another results file")
+
+        changed = sorted(
+            key for key in parameters.keys() | header.keys() if parameters.get(key) != header.get(key)
+        )
+        if changed:
+            raise ValueError(f"{path} belongs to a run with other {', '.join(changed)}, use another results file")
+
+        complete = source.tell()
+        while True:
+            line = source.readline()
+            if not line.endswith("\n"):
+                break
+
+            complete = source.tell()
+            try:
+                standings.add(json.loads(line))
+            except (json.JSONDecodeError, KeyError):
+                continue
+
+    return complete
+
+
+def run_tournament(
+    policy_names: List[str],
+    games: int,
+    chunk_size: int = 50,
+    workers: Optional[int] = None,
+    seed: int = 0,
+    size: Tuple[int, int] = (24, 80),
+    settings: Optional[GameSettings] = None,
+    max_ticks: int = 100_000,
+    results_path: Optional[str] = None) -> Standings:
+    """ Plays the given number of games per policy on a process pool
+
+    :param policy_names: names of the policies (see policies)
+    :param games: number of games per policy
+    :param chunk_size: number of games per work unit
+    :param workers: number of worker processes (default: cpu count)
+    :param seed: base seed of the tournament
+    :param size: (max_y, max_x) of the board
+    :param settings: game settings (default: the settings file)
+    :param max_ticks: games which last longer are stopped
+    :param results_path: file to which every finished chunk is appended,
+        chunks which are already within the file are not played again
+    :returns merged results
+    :raises ValueError: if the results file belongs to another run
+    """
+    settings = settings or common.load_settings() or default_settings
+    standings = Standings()
+
+    results_file = None
+    if results_path:
+        path = pathlib.Path(results_path)
+        parameters = run_parameters(policy_names, games, chunk_size, seed, size, settings, max_ticks)
+        complete = load_results(path, standings, parameters)
+
+        # the next chunk would be appended to a line which was cut off
+        results_file = open(path, "a")
+        results_file.truncate(complete)
+        if not complete:
+            results_file.write(json.dumps({"run": parameters}) + "\n")
+            results_file.flush()
+
+    chunks = []
+    for policy in policy_names:
+        for chunk, first in enumerate(range(0, games, chunk_size)):
+            if (policy, chunk) not in standings.done:
+                chunks.append((policy, chunk, min(chunk_size, games - first)))
+
+    try:
+        with ProcessPoolExecutor(max_workers=workers or os.cpu_count()) as pool:
+            futures = [
+                pool.submit(play_chunk, policy, chunk, count, seed, size, settings, max_ticks)
+                for policy, chunk, count in chunks
+            ]
+
+            # merge the chunks in the order they finish
+            for future in as_completed(futures):
+                result = future.result()
+                standings.add(result)
+
+                if results_file:
+                    results_file.write(json.dumps(result) + "\n")
+                    results_file.flush()
+    finally:
+        if results_file:
+            results_file.close()
+
+    return standings
+
+
+if __name__ == "__main__":
+
+    parser = argparse.ArgumentParser(description="Plays headless games to compare policies")
+    # policies which search until the deadline of a tick are only played when asked for
+    fast_policies = [name for name, policy in policies.items() if not policy.deadline_bound]
+    parser.add_argument("--policies", nargs="+", default=fast_policies, choices=list(policies))
+    parser.add_argument("--games", type=int, default=1000, help="games per policy")
+    parser.add_argument("--chunk", type=int, default=50, help="games per work unit")
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--size", type=int, nargs=2, default=(24, 80), metavar=("Y", "X"))
+    parser.add_argument("--max-ticks", type=int, default=100_000)
+    parser.add_argument("--results", default=None, help="json lines file to resume from")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    try:
+        standings = run_tournament(
+            args.policies,
+            args.games,
+            chunk_size=args.chunk,
+            workers=args.workers,
+            seed=args.seed,
+            size=tuple(args.size),
+            max_ticks=args.max_ticks,
+            results_path=args.results
+        )
+    except ValueError as error:
+        parser.error(str(error))
+
+    print(standings.summary())
+    print(f"finished in {time.perf_counter() - start:.1f}s")
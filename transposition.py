@@ -0,0 +1,217 @@
+import sys
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional
+
+
+class Entry:
+    __slots__ = ("key", "depth", "value", "move", "generation")
+
+    def __init__(self, key: int, depth: int, value: Any, move: Optional[int], generation: int) -> None:
+        """ Stored result of a search
+
+        :param key: zobrist hash of the state
+        :param depth: depth (or number of rollouts) the value is based on
+        :param value: evaluation of the state
+        :param move: best direction found for the state
+        :param generation: search in which the entry was stored
+        """
+        self.key = key
+        self.depth = depth
+        self.value = value
+        self.move = move
+        self.generation = generation
+
+
+class TranspositionTable:
+    def __init__(self, capacity: int) -> None:
+        """ Bounded map from state hashes to search results
+
+        Search policies reach the same state through different move
+        orders, a probe with the zobrist hash of the engine returns the
+        result of an earlier search. Subclasses decide which entry is
+        dropped once the table is full.
+
+        :param capacity: maximum number of entries
+        """
+        self.capacity = capacity
+        self.generation = 0
+
+        # statistics
+        self.probes = 0
+        self.hits = 0
+        self.stores = 0
+        self.evictions = 0
+        self.rejected = 0
+
+
+    def new_search(self) -> None:
+        """ Marks the entries which are stored from now on as the newest """
+        self.generation += 1
+
+
+    def probe(self, key: int, depth: int = 0) -> Optional[Entry]:
+        """ Looks up a state
+
+        :param key: zobrist hash of the state
+        :param depth: minimum depth of the entry
+        :returns the entry or None if the state is unknown (or too shallow)
+        """
+        self.probes += 1
+
+        entry = self._get(key)
+        if entry is None or entry.depth < depth:
+            return None
+
+        self.hits += 1
+        return entry
+
+
+    def store(self, key: int, depth: int, value: Any, move: Optional[int] = None) -> bool:
+        """ Stores the result of a search
+
+        :returns False if the eviction policy kept the existing entry
+        """
+        self.stores += 1
+        return self._put(Entry(key, depth, value, move, self.generation))
+
+
+    def _get(self, key: int) -> Optional[Entry]:
+        raise NotImplementedError
+
+
+    def _put(self, entry: Entry) -> bool:
+        raise NotImplementedError
+
+
+    def __len__(self) -> int:
+        raise NotImplementedError
+
+
+    @property
+    def hit_rate(self) -> float:
+        """ Returns the fraction of the probes which found an entry """
+        return self.hits / self.probes if self.probes else 0.0
+
+
+    def memory_bytes(self) -> int:
+        """ Returns the estimated memory of the table and its entries """
+        entry_size = sys.getsizeof(Entry(0, 0, 0.0, 0, 0)) + sys.getsizeof(1 << 63)
+        return self._container_bytes() + len(self) * entry_size
+
+
+    def _container_bytes(self) -> int:
+        raise NotImplementedError
+
+
+    def stats(self) -> Dict[str, float]:
+        """ Returns the statistics used to size the table """
+        return {
+            "entries": len(self),
+            "capacity": self.capacity,
+            "fill": len(self) / self.capacity,
+            "probes": self.probes,
+            "hit_rate": self.hit_rate,
+            "stores": self.stores,
+            "evictions": self.evictions,
+            "rejected": self.rejected,
+            "memory_bytes": self.memory_bytes(),
+        }
+
+
+class LRUTable(TranspositionTable):
+    def __init__(self, capacity: int) -> None:
+        """ Drops the entry which was not used for the longest time """
+        super().__init__(capacity)
+        self.entries: OrderedDict = OrderedDict()
+
+
+    def _get(self, key: int) -> Optional[Entry]:
+        entry = self.entries.get(key)
+        if entry is not None:
+            self.entries.move_to_end(key)
+
+        return entry
+
+
+    def _put(self, entry: Entry) -> bool:
+        if entry.key in self.entries:
+            self.entries.move_to_end(entry.key)
+        elif len(self.entries) >= self.capacity:
+            self.entries.popitem(last=False)
+            self.evictions += 1
+
+        self.entries[entry.key] = entry
+        return True
+
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+
+    def _container_bytes(self) -> int:
+        # an ordered dict also keeps a linked list node per entry
+        return sys.getsizeof(self.entries) + len(self.entries) * 56
+
+
+class DepthTable(TranspositionTable):
+    def __init__(self, capacity: int) -> None:
+        """ Fixed slots (key modulo capacity) which keep the deeper entry
+
+        An entry of an older search is always replaced, otherwise a new
+        entry only replaces one of the same state or a shallower one.
+        """
+        super().__init__(capacity)
+        self.slots: List[Optional[Entry]] = [None] * capacity
+        self.used = 0
+
+
+    def _get(self, key: int) -> Optional[Entry]:
+        entry = self.slots[key % self.capacity]
+        return entry if entry is not None and entry.key == key else None
+
+
+    def _put(self, entry: Entry) -> bool:
+        slot = entry.key % self.capacity
+        current = self.slots[slot]
+
+        if current is None:
+            self.used += 1
+        elif current.key != entry.key:
+            if current.generation == entry.generation and current.depth > entry.depth:
+                self.rejected += 1
+                return False
+
+            self.evictions += 1
+
+        self.slots[slot] = entry
+        return True
+
+
+    def __len__(self) -> int:
+        return self.used
+
+
+    def _container_bytes(self) -> int:
+        return sys.getsizeof(self.slots)
+
+
+# eviction policies by name
+eviction_policies = {
+    "depth": DepthTable,
+    "lru": LRUTable,
+}
+
+
+# tables which are shared by the policies of this process
+_shared: Dict[str, TranspositionTable] = {}
+
+
+def shared_table(capacity: int = 1 << 20, eviction: str = "depth") -> TranspositionTable:
+    """ Returns the table of this process for the given eviction policy
+
+    The capacity is only used when the table is created.
+    """
+    if eviction not in _shared:
+        _shared[eviction] = eviction_policies[eviction](capacity)
+
+    return _shared[eviction]
@@ -0,0 +1,106 @@
+import time
+from collections import deque
+from typing import Deque, Optional, Tuple
+
+from engine import OPPOSITE
+
+
+# turns which can wait for their tick by default
+default_depth = 3
+
+
+class TurnQueue:
+    def __init__(self, depth: int = default_depth) -> None:
+        """ Bounded queue of the turns which wait for the next ticks
+
+        Every tick applies at most one turn, so a quick double turn (e.g.
+        up and then left within one tick) is applied over two ticks instead
+        of losing the first key. A turn is checked against the direction
+        which is in effect when it runs (the last queued turn), not against
+        the current one. Keys beyond `depth` waiting turns are dropped,
+        so holding a key does not make the snake lag behind.
+
+        :param depth: maximal number of waiting turns
+        """
+        self.depth = depth
+        self.turns: Deque[Tuple[int, float]] = deque()
+
+        # metrics: applied, invalid and dropped turns and the seconds from
+        # reading a key to applying its turn
+        self.applied = 0
+        self.invalid = 0
+        self.dropped = 0
+        self.last_latency = 0.0
+        self.max_latency = 0.0
+        self.total_latency = 0.0
+
+
+    def clear(self) -> None:
+        """ Drops the waiting turns (e.g. for a new game) """
+        self.turns.clear()
+
+
+    def push(self, direction: int, current: int, pressed: Optional[float] = None) -> bool:
+        """ Queues a turn
+
+        :param direction: new direction (right: 0, left: 1, up: 2, down: 3)
+        :param current: direction of the snake now
+        :param pressed: time.perf_counter() when the key was read
+        :returns if the turn was queued
+        """
+        effective = self.turns[-1][0] if self.turns else current
+
+        # no change or reversing into the own body
+        if direction == effective or direction == OPPOSITE[effective]:
+            self.invalid += 1
+            return False
+
+        if len(self.turns) >= self.depth:
+            self.dropped += 1
+            return False
+
+        self.turns.append((direction, time.perf_counter() if pressed is None else pressed))
+        return True
+
+
+    def pop(self, now: Optional[float] = None) -> Optional[int]:
+        """ Returns the turn of this tick (None if there is none)
+
+        :param now: time.perf_counter() of the tick (default: now)
+        """
+        if not self.turns:
+            return None
+
+        direction, pressed = self.turns.popleft()
+
+        latency = (time.perf_counter() if now is None else now) - pressed
+        self.applied += 1
+        self.last_latency = latency
+        self.max_latency = max(self.max_latency, latency)
+        self.total_latency += latency
+
+        return direction
+
+
+    def __len__(self) -> int:
+        """ Returns the number of waiting turns """
+        return len(self.turns)
+
+
+    @property
+    def mean_latency(self) -> float:
+        """ Mean seconds from reading a key to applying its turn """
+        return self.total_latency / self.applied if self.applied else 0.0
+
+
+    def stats(self) -> dict:
+        """ Returns the metrics of the queue """
+        return {
+            "waiting": len(self),
+            "applied": self.applied,
+            "invalid": self.invalid,
+            "dropped": self.dropped,
+            "last_latency": self.last_latency,
+            "mean_latency": self.mean_latency,
+            "max_latency": self.max_latency,
+        }
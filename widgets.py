@@ -0,0 +1,86 @@
+import curses
+from typing import List, Optional, Sequence, Tuple
+
+
+class MenuView:
+    def __init__(self, screen) -> None:
+        """ Retained-mode list of centered menu rows
+
+        Keeps what the rows on the screen show, so showing the menu again
+        only writes the rows whose text or attribute changed (e.g. the two
+        rows of a moved highlight or a changed value) instead of clearing
+        and drawing the whole screen. The rows are placed once per terminal
+        size and number of rows, a new size lays them out again.
+
+        The menus share one view, as it stands for what is on the screen.
+
+        :param screen (_CursesWindow): The screen instance of curses
+        """
+        self.screen = screen
+
+        # terminal size and first row of the layout (None if there is none)
+        self.size: Optional[Tuple[int, int]] = None
+        self.top = 0
+
+        # text and attribute of every drawn row (None if it is not drawn)
+        self.rows: List[Tuple[Optional[str], int]] = []
+
+        # statistics about the layouts and the written rows
+        self.layouts = 0
+        self.rows_drawn = 0
+
+
+    def invalidate(self) -> None:
+        """ Forgets the drawn rows, e.g. after something else drew on the
+        screen, such that the next show draws the whole menu
+        """
+        self.size = None
+        self.rows = []
+
+
+    def show(self, options: Sequence[str], graphics: Sequence[int]) -> None:
+        """ Draws the rows which changed since the last show
+
+        :param options: text of every row
+        :param graphics: attribute of every row (e.g. curses.A_REVERSE)
+        """
+        size = self.screen.getmaxyx()
+        if size != self.size or len(options) != len(self.rows):
+            self._layout(size, len(options))
+
+        for index, row in enumerate(zip(options, graphics)):
+            if row != self.rows[index]:
+                self._draw_row(index, *row)
+                self.rows[index] = row
+
+        self.screen.noutrefresh()
+        curses.doupdate()
+
+
+    def _layout(self, size: Tuple[int, int], count: int) -> None:
+        """ Places the rows in the middle of the screen and erases it """
+        self.screen.erase()
+
+        self.size = size
+        self.top = size[0] // 2 - count // 2
+        self.rows = [(None, 0)] * count
+        self.layouts += 1
+
+
+    def _draw_row(self, index: int, text: str, attr: int) -> None:
+        """ Replaces a row with the text centered in it """
+        max_y, max_x = self.size
+        y = self.top + index
+        if not 0 <= y < max_y:
+            return
+
+        self.screen.move(y, 0)
+        self.screen.clrtoeol()
+
+        try:
+            self.screen.addstr(y, max(max_x // 2 - len(text) // 2, 0), text, attr)
+        except curses.error:
+            # text which does not fit into a small terminal is cut off
+            pass
+
+        self.rows_drawn += 1
@@ -1,17 +1,36 @@
 import curses
+import asyncio
+from typing import Optional
 
+import common
+from config import color_pairs
 from game import Game
 from menu import Menu
+from persistence import WriteError
+from runtime import Runtime
+from turns import default_depth
 
 
 class Window:
-    def __init__(self) -> None:
-        """ Initalize class variables"""
+    def __init__(
+        self, backend: str = "curses", autopilot: Optional[str] = None, turn_depth: int = default_depth) -> None:
+        """ Initalize class variables
+        
+        :param backend: how the game is rendered ("curses" or "ansi")
+        :param autopilot: name of the policy which steers the snake
+        :param turn_depth: turns which can wait for their tick
+        """
         self.game_state = "settings"
         self.loaded = False
+        self.backend = backend
+        self.autopilot = autopilot
+        self.turn_depth = turn_depth
 
         self.window_state = {"active_window": "MENU"}
 
+        # writes which failed when the game quit (reported after curses)
+        self.write_error: Optional[WriteError] = None
+
 
     def init_screen(self) -> None:
         """ Initalize curses screen and other variables"""
@@ -21,41 +40,61 @@ class Window:
         curses.start_color()
         
         # set colors: Default: 1, Food: 2, Head: 3, Body: 4
-        curses.init_pair(1, curses.COLOR_WHITE, curses.COLOR_BLACK)  
-        curses.init_pair(2, curses.COLOR_YELLOW, curses.COLOR_BLACK) 
-        curses.init_pair(3, curses.COLOR_RED, curses.COLOR_BLACK)    
-        curses.init_pair(4, curses.COLOR_GREEN, curses.COLOR_BLACK)  
+        for pair, (foreground, background) in color_pairs.items():
+            curses.init_pair(
+                pair, 
+                getattr(curses, f"COLOR_{foreground}"), 
+                getattr(curses, f"COLOR_{background}")
+            )
 
         self.screen.keypad(1)
         curses.noecho()
 
 
     def run(self, screen):
-        """ Main Loop of the Game Window """
+        """ Runs the session within an event loop (see runtime.Runtime) """
         
         del screen
         if not self.loaded:
             self.init_screen()
 
+        asyncio.run(self.main())
+
+
+    async def main(self) -> None:
+        """ Main Loop of the Game Window """
+        runtime = Runtime(self.screen)
+        runtime.start()
+
         # create the Game instances
-        menu_window = Menu(self.screen, self.window_state)
-        game_window = Game(self.screen, self.window_state)
-        
+        menu_window = Menu(self.screen, self.window_state, runtime)
+        game_window = Game(
+            self.screen, self.window_state, self.backend, self.autopilot, runtime, self.turn_depth
+        )
         
-        while True:
-            
-            # Handles the active Windows
-            if self.window_state["active_window"] == "MENU":
-                menu_window()
-                self.screen.clear()
-                continue 
-
-            elif self.window_state["active_window"] == "GAME":
-                game_window()
-                self.screen.clear()
-                continue 
-
-            elif self.window_state["active_window"] == "QUIT":
-                curses.endwin()
-                self.screen.clear()
-                return 
+        try:
+            while True:
+                
+                # Handles the active Windows
+                if self.window_state["active_window"] == "MENU":
+                    await menu_window()
+                    self.screen.clear()
+                    continue 
+
+                elif self.window_state["active_window"] == "GAME":
+                    await game_window()
+                    self.screen.clear()
+                    continue 
+
+                elif self.window_state["active_window"] == "QUIT":
+                    curses.endwin()
+
+                    # the queued scores and settings are written before exiting
+                    try:
+                        await runtime.run_blocking(common.flush_writes)
+                    except WriteError as error:
+                        self.write_error = error
+                    self.screen.clear()
+                    return 
+        finally:
+            runtime.stop()
@@ -0,0 +1,54 @@
+import random
+from typing import Dict, List
+
+
+# seed of the keys, fixed such that hashes are equal across processes
+zobrist_seed = 0x5EED
+
+# pending growth above this value shares one key
+growth_limit = 64
+
+
+class ZobristKeys:
+    def __init__(self, size: int, seed: int = zobrist_seed) -> None:
+        """ Random 64 bit keys for every feature of a game state
+
+        The hash of a state is the xor of the keys of its features, so
+        a feature which appears or disappears changes the hash with a
+        single xor.
+
+        :param size: number of cells of the board (max_y * max_x)
+        :param seed: seed of the keys
+        """
+        rng = random.Random(f"{seed}:{size}")
+
+        def keys(count: int) -> List[int]:
+            return [rng.getrandbits(64) for _ in range(count)]
+
+        self.size = size
+        self.body = keys(size)
+        self.head = keys(size)
+        self.tail = keys(size)
+        self.food = keys(size)
+        self.direction = keys(4)
+        self.growth = keys(growth_limit + 1)
+
+        # direction from a body cell to the next cell towards the head
+        # (index * 4 + direction), which orders the body cells
+        self.link = keys(size * 4)
+
+        # combined keys of the cells the head enters and the tail leaves
+        self.enter = [head ^ body for head, body in zip(self.head, self.body)]
+        self.leave = [tail ^ body for tail, body in zip(self.tail, self.body)]
+
+
+# keys which were already created by this process
+_keys: Dict[int, ZobristKeys] = {}
+
+
+def zobrist_keys(size: int) -> ZobristKeys:
+    """ Returns the (shared) keys for a board with the given number of cells """
+    if size not in _keys:
+        _keys[size] = ZobristKeys(size)
+
+    return _keys[size]